@@ -0,0 +1,67 @@
+// Renders the quote card in the browser from the small record the server puts in quote-store.
+// This replaces building the whole card as nested html.Div components on the server.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    quotes: {
+        render_card: function(record) {
+            if (!record) {
+                return null;
+            }
+
+            function el(type, className, children) {
+                return {
+                    type: type,
+                    namespace: 'dash_html_components',
+                    props: {className: className, children: children}
+                };
+            }
+
+            function tile(label, value, variant) {
+                return el('Div', 'quote-tile quote-tile--' + variant, [
+                    el('Span', 'quote-tile-label', label),
+                    el('Div', 'quote-tile-value', value)
+                ]);
+            }
+
+            function price(value) {
+                return value === null || value === undefined ? '$N/A' : '$' + value;
+            }
+
+            var symbol = record.symbol.toUpperCase();
+
+            if (record.error) {
+                return el('Div', 'quote-error', [
+                    el('H3', 'quote-error-symbol', symbol),
+                    el('P', 'quote-error-message', record.error)
+                ]);
+            }
+
+            var header = [
+                el('H3', 'quote-symbol', symbol),
+                el('P', 'quote-date', record.date)
+            ];
+            if (record.fallback) {
+                header.push(el('P', 'quote-notice',
+                    'No data available for the requested date. Showing most recent data.'));
+            }
+
+            var volume = record.volume === null || record.volume === undefined
+                ? 'N/A' : Number(record.volume).toLocaleString('en-US');
+
+            return el('Div', 'quote-card', [
+                el('Div', 'quote-header', header),
+                el('Div', null, [
+                    el('Div', 'quote-row', [
+                        tile('Open', price(record.open), 'open'),
+                        tile('High', price(record.high), 'high')
+                    ]),
+                    el('Div', 'quote-row', [
+                        tile('Low', price(record.low), 'low'),
+                        tile('Close', price(record.close), 'close')
+                    ]),
+                    tile('Volume', volume, 'volume')
+                ])
+            ]);
+        }
+    }
+});
@@ -0,0 +1,693 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file times parts of the project against the simpler way of doing the same work.
+
+Run one benchmark by name, e.g.
+    python benchmark.py indicators --sessions 5000
+    python benchmark.py startup --starts 10
+    python benchmark.py stream --stream-symbols 200 --stream-channel T
+    python benchmark.py intraday --intraday-tickers 20 --intraday-sessions 500
+    python benchmark.py suite --latency-ms 50 --throttle-rate 0.01
+
+Everything except indicators, startup and stream runs against mock_polygon.py in a background
+thread, with the caches, rate limit state and database in a temporary directory. Nothing
+needs an API key or network access, and the real cache files are never touched.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+#Random-walk daily bars, the same every run for a given seed
+def synthetic_bars(sessions, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, sessions)))
+    spread = np.abs(rng.normal(0, 0.01, sessions))
+
+    return pd.DataFrame({
+        'date': pd.bdate_range('2000-01-03', periods=sessions),
+        'open': close * (1 + rng.normal(0, 0.005, sessions)),
+        'high': close * (1 + spread),
+        'low': close * (1 - spread),
+        'close': close,
+        'volume': rng.integers(100000, 5000000, sessions),
+        'vwap': close * (1 + rng.normal(0, 0.002, sessions)),
+    })
+
+
+#Best of repeat runs of fn, in seconds
+def best_time(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+#The same indicators written the usual way with pandas rolling windows
+def pandas_indicators(df):
+    close = df['close']
+    change = close.diff()
+    average_gain = change.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    average_loss = (-change.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean()
+    traded = df['vwap'] * df['volume']
+
+    return pd.DataFrame({
+        'sma_20': close.rolling(20).mean(),
+        'ema_20': close.ewm(span=20, adjust=False).mean(),
+        'rsi_14': 100 - 100 / (1 + average_gain / average_loss),
+        'bb_upper_20': close.rolling(20).mean() + 2 * close.rolling(20).std(ddof=0),
+        'vwap_20': traded.rolling(20).sum() / df['volume'].rolling(20).sum(),
+    })
+
+
+INDICATOR_PARAMS = [('sma', 20), ('ema', 20), ('rsi', 14), ('bollinger', 20), ('vwap', 20)]
+
+
+def engine_indicators(engine, ticker, df):
+    return [engine.compute(ticker, name, df, period) for name, period in INDICATOR_PARAMS]
+
+
+#Full computation, then adding sessions one at a time as a live dashboard would
+def benchmark_indicators(args):
+    from indicators import IndicatorEngine, make_indicator
+
+    df = synthetic_bars(args.sessions)
+    appended = args.appends
+    history = df.iloc[:-appended]
+
+    print(f"Indicators over {args.sessions} sessions, {appended} appended one by one")
+
+    full_pandas = best_time(lambda: pandas_indicators(df))
+    full_engine = best_time(lambda: engine_indicators(IndicatorEngine(), "BENCH", df))
+    print(f"  full series      pandas rolling {full_pandas * 1000:9.2f} ms   engine {full_engine * 1000:9.2f} ms")
+
+    # Naive: every new session recomputes every window over the whole history
+    def naive_appends():
+        for end in range(len(history) + 1, len(df) + 1):
+            pandas_indicators(df.iloc[:end])
+
+    # Engine: the history is computed once, each new session only updates the rolling state
+    def engine_appends():
+        engine = IndicatorEngine()
+        engine_indicators(engine, "BENCH", history)
+        start = time.perf_counter()
+        for end in range(len(history) + 1, len(df) + 1):
+            engine_indicators(engine, "BENCH", df.iloc[:end])
+        return time.perf_counter() - start
+
+    # The rolling state update alone, without looking up the memo or building the result
+    def state_updates():
+        indicators = [make_indicator(name, period) for name, period in INDICATOR_PARAMS]
+        for indicator in indicators:
+            indicator.compute(history)
+        bars = df.iloc[len(history):].to_dict('records')
+        start = time.perf_counter()
+        for bar in bars:
+            for indicator in indicators:
+                indicator.update(bar)
+        return time.perf_counter() - start
+
+    naive = best_time(naive_appends, repeat=1)
+    incremental = engine_appends()
+    updates = state_updates()
+    print(f"  per appended bar pandas rolling {naive / appended * 1000:9.3f} ms   engine {incremental / appended * 1000:9.3f} ms"
+          f"   (state update only {updates / appended * 1000:.3f} ms)")
+
+    # Incremental updates have to land on the same values as a full computation
+    engine = IndicatorEngine()
+    engine_indicators(engine, "CHECK", history)
+    for end in range(len(history) + 1, len(df) + 1):
+        engine_indicators(engine, "CHECK", df.iloc[:end])
+    updated = engine_indicators(engine, "CHECK", df)
+    fresh = engine_indicators(IndicatorEngine(), "CHECK", df)
+
+    difference = max(
+        np.nanmax(np.abs(a[column].to_numpy() - b[column].to_numpy()))
+        for a, b in zip(updated, fresh) for column in a if column != 'date'
+    )
+    print(f"  largest difference between incremental and full results: {difference:.2e}")
+
+
+#Latencies in seconds summarized as count, p50, p99 and throughput over elapsed seconds
+def report(name, latencies, elapsed, unit="requests"):
+    latencies = np.sort(np.asarray(latencies, dtype=np.float64)) * 1000
+    if not len(latencies):
+        print(f"  {name:<28} no samples")
+        return
+
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"  {name:<28} {len(latencies):6d} {unit:<8} p50 {p50:9.2f} ms   p99 {p99:9.2f} ms"
+          f"   {len(latencies) / elapsed:9.1f}/s")
+
+
+#Records the wall time of every HTTP request made through requests, inside the block
+@contextlib.contextmanager
+def upstream_latencies():
+    import requests
+
+    latencies = []
+    lock = threading.Lock()
+    send = requests.Session.send
+
+    def timed_send(self, request, **kwargs):
+        start = time.perf_counter()
+        try:
+            return send(self, request, **kwargs)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    requests.Session.send = timed_send
+    try:
+        yield latencies
+    finally:
+        requests.Session.send = send
+
+
+#Runs fn(item) for every item on concurrency threads, returns (latencies, elapsed)
+def run_concurrently(fn, items, concurrency):
+    def timed(item):
+        start = time.perf_counter()
+        fn(item)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, items))
+    return latencies, time.perf_counter() - start
+
+
+# Run in a fresh interpreter: prints the seconds spent importing the dashboard and whether
+# the modules it is meant to load lazily were loaded anyway
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import dash_app
+print(time.perf_counter() - start, *[name for name in ('pandas', 'numpy', 'pyarrow') if name in sys.modules])
+"""
+
+# Run in a fresh interpreter: the production app (wsgi.py) behind a threaded WSGI server
+SERVE_SCRIPT = """
+import sys
+from werkzeug.serving import make_server
+import wsgi
+make_server('127.0.0.1', int(sys.argv[1]), wsgi.server, threaded=True).serve_forever()
+"""
+
+
+#Payload the browser sends for every keystroke in the ticker dropdown
+def search_payload(text):
+    return {
+        "output": "input-stock.options",
+        "outputs": {"id": "input-stock", "property": "options"},
+        "inputs": [{"id": "input-stock", "property": "search_value", "value": text}],
+        "changedPropIds": ["input-stock.search_value"],
+        "state": [{"id": "input-stock", "property": "value", "value": None}],
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+#Cold starts of new worker processes: import time, then time until the page and the
+#first ticker search are answered
+def benchmark_startup(args):
+    import requests
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    scratch = tempfile.mkdtemp(prefix="dashboard-bench-")
+    environment = dict(
+        os.environ,
+        cache_path=os.path.join(scratch, "quote_cache.db"),
+        snapshot_path=os.path.join(scratch, "market_snapshots"),
+        polygon_base_url="http://127.0.0.1:9",
+    )
+    environment["rate_limit_path"] = ""
+    environment.pop("metrics_path", None)
+
+    print(f"Startup, {args.starts} fresh processes each")
+
+    imports = []
+    loaded = set()
+    for _ in range(args.starts):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], cwd=root, env=environment,
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        imports.append(float(output[0]))
+        loaded.update(output[1:])
+    report("import dash_app", imports, sum(imports), "starts")
+    print(f"  {'heavy modules at import':<28} {', '.join(sorted(loaded)) or 'none'}")
+
+    first_page, first_search = [], []
+    try:
+        for _ in range(args.starts):
+            port = free_port()
+            began = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, "-c", SERVE_SCRIPT, str(port)], cwd=root, env=environment,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                url = f"http://127.0.0.1:{port}"
+                while True:
+                    try:
+                        if requests.get(f"{url}/_dash-layout", timeout=5).status_code == 200:
+                            break
+                    except requests.ConnectionError:
+                        if process.poll() is not None or time.perf_counter() - began > 60:
+                            raise RuntimeError("Dashboard process did not start")
+                        time.sleep(0.005)
+                first_page.append(time.perf_counter() - began)
+
+                searched = time.perf_counter()
+                response = requests.post(f"{url}/_dash-update-component", json=search_payload("AAP"), timeout=30)
+                if response.status_code != 200:
+                    raise RuntimeError(f"Search failed with {response.status_code}")
+                first_search.append(time.perf_counter() - searched)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report("start to first page", first_page, sum(first_page), "starts")
+    report("first ticker search", first_search, sum(first_search), "starts")
+
+
+#Payload the browser sends on every tick of the live chart's interval
+def live_payload(symbol, cursor, n_intervals):
+    return {
+        "output": "..live-chart.figure...live-chart.extendData...live-cursor.data..",
+        "outputs": [
+            {"id": "live-chart", "property": "figure"},
+            {"id": "live-chart", "property": "extendData"},
+            {"id": "live-cursor", "property": "data"},
+        ],
+        "inputs": [{"id": "live-interval", "property": "n_intervals", "value": n_intervals}],
+        "changedPropIds": ["live-interval.n_intervals"],
+        "state": [
+            {"id": "input-stock", "property": "value", "value": symbol},
+            {"id": "live-cursor", "property": "data", "value": cursor},
+        ],
+    }
+
+
+#Websocket ingest from mock_stream.py into the ring buffers, then the live chart's polls
+#with and without a cursor (new points only against the whole series every time)
+def benchmark_stream(args):
+    from mock_stream import MockStream, Synthetic, serve_in_thread
+    from streaming import StreamClient, StreamStore
+
+    scratch = tempfile.mkdtemp(prefix="dashboard-bench-")
+    os.environ["cache_path"] = os.path.join(scratch, "quote_cache.db")
+    os.environ["rate_limit_path"] = ""
+
+    symbols = [f"S{i:04d}" for i in range(args.stream_symbols)]
+    events = Synthetic(symbols, seed=5)
+    subscriptions = {(args.stream_channel, symbol) for symbol in symbols}
+    batches = [events.next(None, subscriptions) for _ in range(max(1, 100000 // len(symbols)))]
+
+    print(f"Stream ingest, {args.stream_channel} channel, {len(symbols)} tickers")
+
+    # Appending to the ring buffers on their own, without the websocket
+    store = StreamStore(args.stream_channel, args.stream_buffer)
+    for symbol in symbols:
+        store.add(symbol)
+    began = time.perf_counter()
+    for batch in batches:
+        store.ingest(batch)
+    elapsed = time.perf_counter() - began
+    count = sum(len(batch) for batch in batches)
+    print(f"  {'ring buffer append':<28} {count:6d} events   {count / elapsed:12.0f}/s   {elapsed / count * 1e6:6.2f} us/event")
+
+    # The whole path from the mock feed through the client thread
+    mock = MockStream(symbols, rate=args.stream_rate)
+    server, url = serve_in_thread(mock)
+    client = StreamClient(StreamStore(args.stream_channel, args.stream_buffer), url=url, api_key="benchmark",
+                          max_symbols=len(symbols))
+    for symbol in symbols:
+        client.subscribe(symbol)
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.start()
+            client.connected.wait(10)
+            began = time.perf_counter()
+            time.sleep(args.stream_seconds)
+            stats, elapsed = client.stats(), time.perf_counter() - began
+        print(f"  {'websocket ingest':<28} {stats['kept']:6d} events   {stats['kept'] / elapsed:12.0f}/s"
+              f"   {mock.stats()['events']} sent by the mock")
+
+        from dash_app import Dashboard
+        from get_data import StockMarketPipeline
+
+        pipeline = StockMarketPipeline()
+        dashboard = Dashboard(pipeline, stream=client)
+        http = dashboard.app.server.test_client()
+        symbol = symbols[0]
+
+        def poll(cursor, n):
+            start = time.perf_counter()
+            response = http.post("/_dash-update-component", json=live_payload(symbol, cursor, n))
+            latency = time.perf_counter() - start
+            if response.status_code == 204:
+                return cursor, latency, 0
+            if response.status_code != 200:
+                raise RuntimeError(f"Live callback failed with {response.status_code}")
+            body = response.get_json()
+            return body["response"]["live-cursor"]["data"], latency, len(response.data)
+
+        full, full_sizes, delta, delta_sizes = [], [], [], []
+        cursor = None
+        began = time.perf_counter()
+        for n in range(args.requests):
+            _, latency, size = poll(None, n)
+            full.append(latency)
+            full_sizes.append(size)
+
+            cursor, latency, size = poll(cursor, n)
+            delta.append(latency)
+            delta_sizes.append(size)
+            time.sleep(1.0 / args.stream_rate)
+        elapsed = time.perf_counter() - began
+
+        report("poll, whole series", full, elapsed, "polls")
+        report("poll, new points only", delta, elapsed, "polls")
+        print(f"  {'response size':<28} {np.mean(full_sizes):9.0f} bytes whole   {np.mean(delta_sizes):9.0f} bytes new only")
+        pipeline.close()
+    finally:
+        client.close()
+        server.shutdown()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+#Starts the mock API and points every part of the project at it and at a scratch directory
+#Has to run before the project's modules create their shared limiter, caches and database
+def start_mock(args):
+    from mock_polygon import MockConfig, load_tickers, serve_in_thread
+
+    scratch = tempfile.mkdtemp(prefix="dashboard-bench-")
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        page_size=args.page_size,
+    )
+    tickers = load_tickers(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tickers.json"))
+    server, base_url = serve_in_thread(config, tickers)
+
+    os.environ.update({
+        "polygon_base_url": base_url,
+        "polygon_api_key": "benchmark",
+        # The mock is the only limit being measured, the client's own limiter stays out of the way
+        "polygon_calls_per_minute": str(args.client_calls_per_minute),
+        "cache_path": os.path.join(scratch, "quote_cache.db"),
+        "snapshot_path": os.path.join(scratch, "market_snapshots"),
+        "columnar_store_path": os.path.join(scratch, "price_store"),
+        "intraday_store_path": os.path.join(scratch, "intraday_store"),
+        "database_url": f"sqlite:///{os.path.join(scratch, 'stock_prices.db')}",
+    })
+    os.environ["rate_limit_path"] = ""
+
+    print(f"Mock Polygon at {base_url}")
+    print(f"  latency {args.latency_ms} ms ± {args.jitter_ms} ms, 429 rate {args.throttle_rate}, error rate {args.error_rate}")
+    return server, tickers, scratch
+
+
+#Payload the browser sends when the Get Stock Data button is clicked
+def submit_payload(symbol, day):
+    return {
+        "output": "..quote-store.data...date-picker-container.style..",
+        "outputs": [
+            {"id": "quote-store", "property": "data"},
+            {"id": "date-picker-container", "property": "style"},
+        ],
+        "inputs": [
+            {"id": "submit-button", "property": "n_clicks", "value": 1},
+            {"id": "calendar-button", "property": "n_clicks", "value": None},
+        ],
+        "changedPropIds": ["submit-button.n_clicks"],
+        "state": [
+            {"id": "input-stock", "property": "value", "value": symbol},
+            {"id": "input-date", "property": "date", "value": day},
+            {"id": "date-picker-container", "property": "style", "value": {"display": "none"}},
+        ],
+    }
+
+
+def lookup_keys(tickers, count, seed=11):
+    from trading_calendar import get_trading_calendar
+
+    rng = np.random.default_rng(seed)
+    sessions = get_trading_calendar().sessions_between("2021-01-01", "2024-12-31")
+    symbols = rng.choice(tickers, count)
+    days = rng.choice(len(sessions), count)
+    return [(symbol, sessions[day].isoformat()) for symbol, day in zip(symbols, days)]
+
+
+#The quote lookup callback through Dash's HTTP endpoint, first cold and then from the cache
+def benchmark_process_input(args, tickers):
+    from dash_app import Dashboard
+    from get_data import StockMarketPipeline
+
+    pipeline = StockMarketPipeline()
+    dashboard = Dashboard(pipeline)
+    server = dashboard.app.server
+    clients = threading.local()
+
+    def submit(key):
+        if not hasattr(clients, "client"):
+            clients.client = server.test_client()
+        response = clients.client.post("/_dash-update-component", json=submit_payload(*key))
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"Callback failed with {response.status_code}")
+
+    keys = lookup_keys(tickers, args.requests)
+    print(f"process_input callback, {len(keys)} lookups on {args.concurrency} threads")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with upstream_latencies() as upstream:
+            latencies, elapsed = run_concurrently(submit, keys, args.concurrency)
+    report("cold (upstream call)", latencies, elapsed)
+    report("  upstream requests", upstream, elapsed)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies, elapsed = run_concurrently(submit, keys, args.concurrency)
+    report("warm (quote cache)", latencies, elapsed)
+
+    pipeline.close()
+
+
+#The quote cache on its own, from the in-process LRU and from the SQLite file
+def benchmark_cache(args, tickers):
+    from get_data import StockMarketPipeline
+
+    pipeline = StockMarketPipeline()
+    keys = lookup_keys(tickers, args.requests, seed=12)
+    print(f"Cache hit path, {len(keys)} lookups on {args.concurrency} threads")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_concurrently(lambda key: pipeline.get_daily_data(*key), keys, args.concurrency)
+
+    latencies, elapsed = run_concurrently(lambda key: pipeline.get_daily_data(*key), keys, args.concurrency)
+    report("memory tier", latencies, elapsed)
+
+    # Emptying the LRU leaves every lookup to the SQLite file
+    def disk_lookup(key):
+        with pipeline.cache.lock:
+            pipeline.cache.memory.clear()
+        pipeline.get_daily_data(*key)
+
+    latencies, elapsed = run_concurrently(disk_lookup, keys, args.concurrency)
+    report("disk tier", latencies, elapsed)
+
+    pipeline.close()
+
+
+#Bulk historical load into the database through the fetch engine
+def benchmark_backfill(args, tickers):
+    from datetime import date
+    import data_base
+
+    symbols = list(np.random.default_rng(13).choice(tickers, args.backfill_tickers, replace=False))
+    start, end = date(2024 - args.years, 1, 1), date(2024, 12, 31)
+    print(f"Backfill of {len(symbols)} tickers from {start} to {end}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data_base.create_table()
+        with upstream_latencies() as upstream:
+            began = time.perf_counter()
+            data_base.backfill(symbols, start, end)
+            elapsed = time.perf_counter() - began
+
+        with data_base.get_database().transaction() as tx:
+            rows = tx.execute("SELECT COUNT(*) FROM stock_prices;").fetchone()[0]
+
+    report("upstream requests", upstream, elapsed)
+    print(f"  {'rows written':<28} {rows:6d} rows     in {elapsed:.2f} s   {rows / elapsed:9.1f}/s")
+
+
+#Full ticker list refresh, every page of every ticker type
+def benchmark_tickers(args, tickers):
+    import fetch_tickers
+
+    print("Ticker refresh")
+    scratch = os.path.dirname(os.environ["cache_path"])
+    cwd = os.getcwd()
+
+    # fetch_tickers writes tickers.json into the working directory
+    os.chdir(scratch)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            with upstream_latencies() as upstream:
+                began = time.perf_counter()
+                fetch_tickers.fetch_all_tickers()
+                elapsed = time.perf_counter() - began
+    finally:
+        os.chdir(cwd)
+
+    report("page requests", upstream, elapsed)
+    print(f"  {'total':<28} {elapsed * 1000:9.2f} ms")
+
+
+#Minute bars backfilled into the intraday store, then its size and day and week reads
+def benchmark_intraday(args, tickers):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from get_data import StockMarketPipeline
+    from intraday_store import IntradayStore
+    from trading_calendar import get_trading_calendar
+
+    symbols = list(np.random.default_rng(17).choice(tickers, args.intraday_tickers, replace=False))
+    sessions = get_trading_calendar().sessions_between("2021-01-01", "2024-12-31")[-args.intraday_sessions:]
+    print(f"Intraday store, {len(symbols)} tickers with {len(sessions)} sessions of minute bars")
+
+    pipeline = StockMarketPipeline()
+    store = IntradayStore()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with upstream_latencies() as upstream:
+            began = time.perf_counter()
+            store.backfill(pipeline, symbols, sessions[0], sessions[-1])
+            elapsed = time.perf_counter() - began
+    pipeline.close()
+
+    stats = store.stats()['1m']
+    report("upstream requests", upstream, elapsed)
+    print(f"  {'bars written':<28} {stats['bars']:6d} bars     in {elapsed:.2f} s   {stats['bars'] / elapsed:9.1f}/s")
+
+    # The same bars as a zstd Parquet file per ticker, and as eight plain 8-byte columns
+    parquet = 0
+    for symbol in symbols:
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(store.read(symbol), preserve_index=False), buffer, compression="zstd")
+        parquet += buffer.tell()
+    print(f"  {'bytes per bar':<28} store {stats['bytes_per_bar']:6.2f}   parquet zstd {parquet / stats['bars']:6.2f}   raw 64.00")
+
+    rng = np.random.default_rng(19)
+    for name, length in [("one day", 1), ("one week", 5)]:
+        latencies, blocks = [], []
+        began = time.perf_counter()
+        for _ in range(args.requests):
+            first = rng.integers(0, len(sessions) - length + 1)
+            symbol = symbols[rng.integers(0, len(symbols))]
+            start = time.perf_counter()
+            _, touched = store.read_arrays(symbol, sessions[first], sessions[first + length - 1])
+            latencies.append(time.perf_counter() - start)
+            blocks.append(touched)
+        report(f"read {name}", latencies, time.perf_counter() - began, "queries")
+        print(f"  {'':<28} {np.mean(blocks):.1f} blocks read on average")
+
+    # Ten years of the regular session for every ticker in tickers.json at the measured size
+    projected = stats['bytes_per_bar'] * 390 * 252 * 10 * len(tickers)
+    print(f"  {'10 years, all tickers':<28} {len(tickers)} tickers   {projected / 1e9:.1f} GB")
+
+
+MOCK_BENCHMARKS = {
+    "process_input": benchmark_process_input,
+    "cache": benchmark_cache,
+    "backfill": benchmark_backfill,
+    "tickers": benchmark_tickers,
+    "intraday": benchmark_intraday,
+}
+
+
+#Every benchmark that runs against the mock, sharing one server and scratch directory
+def benchmark_mock(args):
+    server, tickers, scratch = start_mock(args)
+    names = list(MOCK_BENCHMARKS) if args.benchmark == "suite" else [args.benchmark]
+
+    try:
+        for name in names:
+            print()
+            MOCK_BENCHMARKS[name](args, tickers)
+    finally:
+        server.shutdown()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "indicators": benchmark_indicators,
+    "startup": benchmark_startup,
+    "stream": benchmark_stream,
+    "suite": benchmark_mock,
+}
+BENCHMARKS.update({name: benchmark_mock for name in MOCK_BENCHMARKS})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock Market Dashboard benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--sessions", type=int, default=5000, help="bars in the synthetic series")
+    parser.add_argument("--appends", type=int, default=250, help="sessions added one at a time")
+
+    parser.add_argument("--starts", type=int, default=5, help="fresh processes started by the startup benchmark")
+
+    parser.add_argument("--requests", type=int, default=500, help="lookups per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads sending lookups")
+    parser.add_argument("--backfill-tickers", type=int, default=20)
+    parser.add_argument("--years", type=int, default=5, help="years of history to backfill")
+    parser.add_argument("--client-calls-per-minute", type=float, default=1e9,
+                        help="the client's own rate limit, unlimited unless measuring the limiter")
+
+    parser.add_argument("--intraday-tickers", type=int, default=10, help="tickers backfilled with minute bars")
+    parser.add_argument("--intraday-sessions", type=int, default=250, help="sessions of minute bars per ticker")
+
+    parser.add_argument("--stream-symbols", type=int, default=50, help="tickers subscribed by the stream benchmark")
+    parser.add_argument("--stream-rate", type=float, default=20.0, help="mock feed messages per second")
+    parser.add_argument("--stream-seconds", type=float, default=3.0, help="how long to ingest the mock feed")
+    parser.add_argument("--stream-channel", default="AM", choices=["AM", "A", "T"])
+    parser.add_argument("--stream-buffer", type=int, default=2048, help="rows kept per ticker")
+
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every mock response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of mock responses that are 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock responses that are 500")
+    parser.add_argument("--page-size", type=int, default=None, help="paginate mock results at this size")
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
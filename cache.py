@@ -0,0 +1,295 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file caches daily bars so the same (symbol, date) is only requested from the API once.
+
+There are two tiers: a small in-process LRU in front of a SQLite file that survives restarts.
+Bars for past dates never change, so they are kept forever. Today's bar is still forming,
+so it expires after a short TTL.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from trading_calendar import get_trading_calendar
+
+
+#Class that holds daily bars in memory and on disk
+class QuoteCache():
+    def __init__(self, path=None, max_entries=1024, today_ttl=300):
+        self.path = path or os.getenv("cache_path", "quote_cache.db")
+        self.max_entries = max_entries
+        self.today_ttl = today_ttl
+
+        # (symbol, date) -> (data, expires_at), most recently used last
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+        # WAL lets several worker processes read and write the same file concurrently
+        self.conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS quotes (
+                symbol TEXT NOT NULL,
+                date TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (symbol, date)
+            );
+        """)
+        self.conn.commit()
+
+    def make_key(self, symbol, date_str):
+        return (symbol.upper(), date_str)
+
+    # Past bars are immutable, today's is too once the session has closed, anything else gets a TTL
+    def expiry_for(self, date_str):
+        if date_str < date.today().strftime('%Y-%m-%d') or get_trading_calendar().is_settled(date_str):
+            return None
+        return time.time() + self.today_ttl
+
+    def is_expired(self, expires_at):
+        return expires_at is not None and expires_at <= time.time()
+
+    def get(self, symbol, date_str):
+        key = self.make_key(symbol, date_str)
+
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                data, expires_at = entry
+                if not self.is_expired(expires_at):
+                    self.memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return data
+                del self.memory[key]
+                self.counters["expired"] += 1
+
+            row = self.conn.execute(
+                "SELECT payload, expires_at FROM quotes WHERE symbol = ? AND date = ?;",
+                key
+            ).fetchone()
+
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+
+            payload, expires_at = row
+            if self.is_expired(expires_at):
+                self.conn.execute("DELETE FROM quotes WHERE symbol = ? AND date = ?;", key)
+                self.conn.commit()
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+
+            data = json.loads(payload)
+            self.remember(key, data, expires_at)
+            self.counters["disk_hits"] += 1
+            return data
+
+    def put(self, symbol, date_str, data):
+        key = self.make_key(symbol, date_str)
+        expires_at = self.expiry_for(date_str)
+
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO quotes (symbol, date, payload, expires_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (symbol, date) DO UPDATE
+                SET payload = excluded.payload, expires_at = excluded.expires_at;
+            """, key + (json.dumps(data), expires_at))
+            self.conn.commit()
+            self.remember(key, data, expires_at)
+
+    # Stores many bars of one symbol in a single transaction, data_by_date maps date -> bar
+    def put_many(self, symbol, data_by_date):
+        self.put_entries((symbol, date_str, data) for date_str, data in data_by_date.items())
+
+    # Stores (symbol, date, bar) entries of any symbols in a single transaction
+    def put_entries(self, entries):
+        rows = [
+            (symbol.upper(), date_str, json.dumps(data), self.expiry_for(date_str))
+            for symbol, date_str, data in entries
+        ]
+
+        with self.lock:
+            self.conn.executemany("""
+                INSERT INTO quotes (symbol, date, payload, expires_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (symbol, date) DO UPDATE
+                SET payload = excluded.payload, expires_at = excluded.expires_at;
+            """, rows)
+            self.conn.commit()
+
+            # Bulk writes skip the memory tier so they do not evict hot entries, drop stale copies instead
+            for row in rows:
+                self.memory.pop(row[:2], None)
+
+    # Every stored bar for a symbol between two dates, read from disk in one query
+    def get_range(self, symbol, start, end):
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT payload FROM quotes
+                WHERE symbol = ? AND date BETWEEN ? AND ?
+                AND (expires_at IS NULL OR expires_at > ?)
+                ORDER BY date;
+            """, (symbol.upper(), start, end, time.time())).fetchall()
+
+        return [json.loads(payload) for (payload,) in rows]
+
+    # Adds an entry to the memory tier, evicting the least recently used ones past the limit
+    # Caller must hold self.lock
+    def remember(self, key, data, expires_at):
+        self.memory[key] = (data, expires_at)
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.conn.execute("DELETE FROM quotes;")
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self.memory)
+
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+#Class that remembers requests which came back empty, so they are not repeated
+#Entries only live on disk, which lets another process (fetch_tickers.py) invalidate them
+class NegativeCache():
+    def __init__(self, path=None, past_ttl=30 * 24 * 3600, recent_ttl=300, symbol_ttl=24 * 3600):
+        self.path = path or os.getenv("cache_path", "quote_cache.db")
+
+        # A past date with no bar will almost certainly stay empty, today's bar may still arrive
+        self.past_ttl = past_ttl
+        self.recent_ttl = recent_ttl
+        self.symbol_ttl = symbol_ttl
+
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+        # WAL lets several worker processes read and write the same file concurrently
+        self.conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS empty_results (
+                symbol TEXT NOT NULL,
+                date TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (symbol, date)
+            );
+        """)
+        self.conn.commit()
+
+    # Symbol-wide entries are stored with an empty date
+    def is_empty(self, symbol, date_str):
+        now = time.time()
+
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT 1 FROM empty_results
+                WHERE symbol = ? AND date IN (?, '') AND expires_at > ?
+                LIMIT 1;
+            """, (symbol.upper(), date_str, now)).fetchone()
+
+            if row is None:
+                self.counters["misses"] += 1
+                return False
+
+            self.counters["hits"] += 1
+            return True
+
+    def is_invalid_symbol(self, symbol):
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT 1 FROM empty_results
+                WHERE symbol = ? AND date = '' AND expires_at > ?;
+            """, (symbol.upper(), time.time())).fetchone()
+            return row is not None
+
+    # Dates between start and end already known to have no bar for the symbol
+    def empty_dates(self, symbol, start, end):
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT date FROM empty_results
+                WHERE symbol = ? AND date BETWEEN ? AND ? AND expires_at > ?;
+            """, (symbol.upper(), start, end, time.time())).fetchall()
+
+        return {day for (day,) in rows}
+
+    def put_empty(self, symbol, date_str):
+        self.put_empty_dates(symbol, [date_str])
+
+    # ttl overrides the usual lifetime of every entry, in seconds
+    def put_empty_dates(self, symbol, date_strs, ttl=None):
+        today = date.today().strftime('%Y-%m-%d')
+        now = time.time()
+        self.store([
+            (symbol.upper(), date_str, now + (ttl if ttl is not None else self.past_ttl if date_str < today else self.recent_ttl))
+            for date_str in date_strs
+        ])
+
+    def put_invalid_symbol(self, symbol):
+        self.store([(symbol.upper(), '', time.time() + self.symbol_ttl)])
+
+    def store(self, rows):
+        with self.lock:
+            self.conn.executemany("""
+                INSERT INTO empty_results (symbol, date, expires_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT (symbol, date) DO UPDATE SET expires_at = excluded.expires_at;
+            """, rows)
+            self.conn.commit()
+
+    # Bulk invalidation, e.g. after tickers.json was refreshed
+    # With no symbols given every entry is dropped
+    def invalidate(self, symbols=None):
+        with self.lock:
+            if symbols is None:
+                self.conn.execute("DELETE FROM empty_results;")
+            else:
+                self.conn.executemany(
+                    "DELETE FROM empty_results WHERE symbol = ?;",
+                    [(symbol.upper(),) for symbol in symbols]
+                )
+            self.conn.commit()
+
+    def purge_expired(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM empty_results WHERE expires_at <= ?;", (time.time(),))
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
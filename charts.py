@@ -0,0 +1,107 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file builds the price and volume chart.
+
+Series are downsampled on the server to the chart's point budget before they are sent, so
+the figure stays the same size whether it shows a month or twenty years.
+"""
+
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from downsample import downsample_line, downsample_ohlc
+
+
+OVERLAY_COLORS = ['#f39c12', '#16a085', '#2c3e50', '#d35400', '#7f8c8d', '#c0392b']
+
+
+#Candlesticks over volume bars for the bars in df, at most max_points of each
+#indicators is an optional DataFrame with a date column and one column per overlay line,
+#RSI columns get their own panel under the volume because they are not in price units
+def build_price_figure(symbol, df, max_points=500, indicators=None):
+    oscillators = [] if indicators is None else [column for column in indicators if column.startswith('rsi_')]
+
+    if oscillators:
+        figure = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.03, row_heights=[0.6, 0.2, 0.2])
+    else:
+        figure = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.03, row_heights=[0.75, 0.25])
+
+    if df is None or df.empty:
+        figure.add_annotation(text="No data for this range", showarrow=False, xref="paper", yref="paper", x=0.5, y=0.5)
+        candles = df
+    else:
+        candles = downsample_ohlc(df, max_points)
+
+        figure.add_trace(go.Candlestick(
+            x=candles['date'],
+            open=candles['open'],
+            high=candles['high'],
+            low=candles['low'],
+            close=candles['close'],
+            name=symbol.upper(),
+            increasing_line_color='#27ae60',
+            decreasing_line_color='#e74c3c'
+        ), row=1, col=1)
+
+        # The close line keeps the shape of the full series through LTTB, hidden until toggled
+        line_dates, line_values = downsample_line(df['date'], df['close'], max_points)
+        figure.add_trace(go.Scattergl(
+            x=line_dates,
+            y=line_values,
+            mode='lines',
+            name='Close',
+            line={'color': '#3498db', 'width': 1.5},
+            visible='legendonly'
+        ), row=1, col=1)
+
+        figure.add_trace(go.Bar(
+            x=candles['date'],
+            y=candles['volume'],
+            name='Volume',
+            marker_color='#8e44ad',
+            opacity=0.6
+        ), row=2, col=1)
+
+        if indicators is not None and not indicators.empty:
+            add_overlays(figure, indicators, oscillators, max_points)
+
+    figure.update_layout(
+        # Keeps the user's zoom when the figure is replaced with a more detailed one
+        uirevision=symbol.upper(),
+        margin={'l': 40, 'r': 20, 't': 30, 'b': 30},
+        height=520,
+        showlegend=True,
+        legend={'orientation': 'h', 'y': 1.05},
+        xaxis_rangeslider_visible=False,
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+    figure.update_yaxes(gridcolor='#ecf0f1')
+
+    return figure
+
+
+#Indicator lines on top of the candles, each downsampled with LTTB like the close line
+def add_overlays(figure, indicators, oscillators, max_points):
+    columns = [column for column in indicators if column != 'date']
+
+    for number, column in enumerate(columns):
+        # The warm-up period of an indicator has no values
+        values = indicators[['date', column]].dropna()
+        if values.empty:
+            continue
+
+        line_dates, line_values = downsample_line(values['date'], values[column], max_points)
+        row = 3 if column in oscillators else 1
+
+        figure.add_trace(go.Scattergl(
+            x=line_dates,
+            y=line_values,
+            mode='lines',
+            name=column.replace('_', ' ').upper(),
+            line={'color': OVERLAY_COLORS[number % len(OVERLAY_COLORS)], 'width': 1.2}
+        ), row=row, col=1)
+
+    if oscillators:
+        figure.update_yaxes(range=[0, 100], row=3, col=1)
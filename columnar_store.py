@@ -0,0 +1,193 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file keeps daily bars in Parquet files for fast reads without a database server.
+
+Files are partitioned by ticker and year (price_store/ticker=AAPL/year=2024/part-....parquet).
+Appends only ever add new part files, compact() merges a partition back into one sorted file,
+and reads memory-map the files and only open the partitions and row groups that can hold
+the requested dates.
+"""
+
+import os
+import shutil
+import time
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs
+import pyarrow.parquet as pq
+
+SCHEMA = pa.schema([
+    ('date', pa.timestamp('ms')),
+    ('open', pa.float64()),
+    ('high', pa.float64()),
+    ('low', pa.float64()),
+    ('close', pa.float64()),
+    ('volume', pa.int64()),
+])
+
+# Small enough that a date filter skips most of a multi-year file, large enough to compress well
+ROW_GROUP_SIZE = 64
+
+
+def to_timestamp(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d')
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return pd.Timestamp(value)
+
+
+#Class that stores OHLCV bars as Parquet files partitioned by ticker and year
+class ColumnarStore():
+    def __init__(self, root=None):
+        self.root = root or os.getenv("columnar_store_path", "price_store")
+        os.makedirs(self.root, exist_ok=True)
+
+    def partition_dir(self, ticker, year):
+        return os.path.join(self.root, f"ticker={ticker.upper()}", f"year={year}")
+
+    # Writes to a temporary name first so readers never see a half-written file
+    def write_file(self, table, directory, name):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        temporary = path + ".tmp"
+
+        pq.write_table(table, temporary, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+        os.replace(temporary, path)
+        return path
+
+    # Adds bars (date, open, high, low, close, volume) for one ticker as new part files
+    def append(self, ticker, df):
+        if df.empty:
+            return 0
+
+        df = df[list(SCHEMA.names)].copy()
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values('date')
+
+        # Part names sort by write time, so the newest copy of a date wins on read
+        name = f"part-{time.time_ns()}.parquet"
+
+        for year, rows in df.groupby(df['date'].dt.year):
+            table = pa.Table.from_pandas(rows, schema=SCHEMA, preserve_index=False)
+            self.write_file(table, self.partition_dir(ticker, year), name)
+
+        return len(df)
+
+    def part_files(self, directory):
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.endswith(".parquet")
+        )
+
+    # Part files that can hold dates between start and end, only the years in range are listed
+    def files_for(self, ticker, start=None, end=None):
+        ticker_dir = os.path.join(self.root, f"ticker={ticker.upper()}")
+        if not os.path.isdir(ticker_dir):
+            return []
+
+        files = []
+        for entry in sorted(os.listdir(ticker_dir)):
+            if not entry.startswith("year="):
+                continue
+            year = int(entry[len("year="):])
+            if start is not None and year < start.year:
+                continue
+            if end is not None and year > end.year:
+                continue
+            files.extend(self.part_files(os.path.join(ticker_dir, entry)))
+
+        return files
+
+    # Bars for one ticker between start and end (both optional and inclusive), oldest first
+    def read(self, ticker, start=None, end=None, columns=None):
+        start = to_timestamp(start) if start is not None else None
+        end = to_timestamp(end) if end is not None else None
+        columns = list(columns or SCHEMA.names)
+        if 'date' not in columns:
+            columns = ['date'] + columns
+
+        files = self.files_for(ticker, start, end)
+        if not files:
+            return SCHEMA.empty_table().select(columns).to_pandas()
+
+        # The date filter is checked against row group statistics, so whole groups are skipped
+        condition = None
+        if start is not None:
+            condition = ds.field('date') >= pa.scalar(start, pa.timestamp('ms'))
+        if end is not None:
+            upper = ds.field('date') <= pa.scalar(end, pa.timestamp('ms'))
+            condition = upper if condition is None else condition & upper
+
+        fragment_format = ds.ParquetFileFormat(
+            default_fragment_scan_options=ds.ParquetFragmentScanOptions(pre_buffer=False)
+        )
+        dataset = ds.dataset(
+            files,
+            schema=SCHEMA,
+            format=fragment_format,
+            filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True)
+        )
+
+        # Reading file by file keeps track of which part each row came from
+        tables = []
+        for order, fragment in enumerate(dataset.get_fragments()):
+            table = fragment.to_table(columns=columns, filter=condition, schema=SCHEMA)
+            tables.append(table.append_column('part', pa.array([order] * table.num_rows, pa.int32())))
+
+        df = pa.concat_tables(tables).to_pandas()
+
+        # Overlapping appends leave several copies of a date until compaction, the newest wins
+        df = df.sort_values(['date', 'part']).drop_duplicates('date', keep='last')
+        return df.drop(columns='part').reset_index(drop=True)
+
+    # Rewrites each partition of a ticker (or every ticker) as one sorted, de-duplicated file
+    def compact(self, ticker=None):
+        tickers = [ticker] if ticker else self.tickers()
+
+        for symbol in tickers:
+            ticker_dir = os.path.join(self.root, f"ticker={symbol.upper()}")
+
+            for entry in sorted(os.listdir(ticker_dir)):
+                directory = os.path.join(ticker_dir, entry)
+                files = self.part_files(directory)
+                if len(files) < 2:
+                    continue
+
+                year = int(entry[len("year="):])
+                df = self.read(symbol, date(year, 1, 1), date(year, 12, 31))
+                table = pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+                # The merged file gets a newer name than every part it replaces
+                self.write_file(table, directory, f"part-{time.time_ns()}.parquet")
+                for path in files:
+                    os.remove(path)
+
+    def tickers(self):
+        return sorted(
+            entry[len("ticker="):] for entry in os.listdir(self.root)
+            if entry.startswith("ticker=")
+        )
+
+    def delete(self, ticker):
+        shutil.rmtree(os.path.join(self.root, f"ticker={ticker.upper()}"), ignore_errors=True)
+
+    # Copies the stock_prices table into the store, one ticker at a time
+    def import_from_database(self, tickers=None, chunk_size=100000):
+        import data_base
+
+        total = 0
+        for ticker in tickers or data_base.get_all_tickers():
+            for chunk in data_base.iter_range(ticker, chunk_size=chunk_size):
+                total += self.append(ticker, chunk)
+            self.compact(ticker)
+            print(f"Imported {ticker}")
+
+        print(f"Imported {total} rows into {self.root}")
+        return total
@@ -5,214 +5,460 @@ This file displays the dashboard on the web with dash.
 
 """
 
-from datetime import datetime, timedelta, date
+from datetime import date, datetime, timedelta
+import os
+import threading
 import dash
-from dash import Dash, html, dash_table, dcc, Input, Output, State
-import pandas as pd
-from get_data import *
-import json
-from dash.dependencies import ALL
-import time
+from dash import Dash, html, dash_table, dcc, Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
+from dotenv import load_dotenv
+from get_data import StockMarketPipeline
+from ticker_index import TickerUniverse
+from trading_calendar import MARKET_TIMEZONE
+from prefetch import PrefetchScheduler
+from metrics import CALLBACK_SECONDS, FALLBACK_PROBES, get_registry, timed
+from flask import Response
+
+# pandas, the chart code, the indicator engine and the market snapshots (with NumPy and
+# pyarrow) are imported the first time a callback needs them, so a new worker can bind
+# and serve the page without loading them (python benchmark.py startup)
     
 #This is the class responsible for the dasboard
 class Dashboard ():
-    def __init__(self, pipeline):
-        self.app = Dash()
+    def __init__(self, pipeline, prefetcher=None, stream=None):
+        self.app = Dash(__name__)
         self.pipeline = pipeline
+
+        # counts lookups so the most popular tickers are kept cached in the background
+        self.prefetcher = prefetcher
+
+        # websocket feed (streaming.StreamClient) behind the live chart, None to hide it
+        self.stream = stream
+        # how often the browser asks for new live points
+        self.live_interval_ms = 1000
         self.user_stock = None
         self.user_date = None
-        self.df_daily = None
 
-        # caching tickers list to avoid multiple API calls
-        self.cached_tickers = None
+        # ticker list and names, reloaded when fetch_tickers.py writes a new index
+        self.universe = TickerUniverse()
+
+        # number of matches sent to the dropdown for each keystroke
+        self.search_results = 20
+
+        # most candles sent to the chart, about one per two pixels of its width
+        self.chart_points = 500
+
+        # indicator lines the chart can show, values are "name:period"
+        self.indicator_choices = [
+            {'label': 'SMA 20', 'value': 'sma:20'},
+            {'label': 'SMA 50', 'value': 'sma:50'},
+            {'label': 'EMA 20', 'value': 'ema:20'},
+            {'label': 'Bollinger 20', 'value': 'bollinger:20'},
+            {'label': 'VWAP 20', 'value': 'vwap:20'},
+            {'label': 'RSI 14', 'value': 'rsi:14'},
+        ]
+
+        # computed indicators are kept per ticker and only extended when new sessions arrive,
+        # created by get_indicator_engine
+        self.indicators = None
+
+        # whole-market bars, one grouped API call per session, created by get_snapshot_store
+        self.snapshots = None
+        self.lazy_lock = threading.Lock()
+        self.movers_count = 10
 
         self.layout()
         self.input_callback()
+        self.render_callback()
+        self.search_callback()
+        self.chart_callback()
+        self.market_callback()
+        self.live_callback()
+        self.metrics_route()
     
     def get_daily_data(self, stock, date):
-        #Using get_daily_data method and converting to pandas dataframe
+        #Using get_daily_data method, the bar as a dict
 
         data = self.pipeline.get_daily_data(stock, date)
 
-        # Return empty DataFrame on error
+        # Return None on error
         if data is None or data.get('status') == 'ERROR':
-            return pd.DataFrame()  
+            return None
 
-        self.df_daily = pd.DataFrame([data])
-        return self.df_daily
+        return data
 
     def get_most_recent_data(self, stock, requested_date):
         #Fallback to get the most recent available data before the requested date
 
-        requested_dt = datetime.strptime(requested_date, '%Y-%m-%d')
+        calendar = self.pipeline.calendar
+        session = calendar.previous_session(requested_date)
+
+        #Going straight to the last trading session, which is usually already cached
+        row = None
+        if session is not None:
+            data = self.get_daily_data(stock, session.strftime('%Y-%m-%d'))
+            if data is not None and data.get('open') is not None:
+                row = data
+                FALLBACK_PROBES.inc(result="previous_session")
+
+            #No bar for that session yet (market still open, halted symbol), so fetching the
+            #previous 7 sessions in a single range request and keeping the newest bar
+            else:
+                start_date_str = calendar.sessions_back(session, 7).strftime('%Y-%m-%d')
+                bars = self.pipeline.get_range_data(stock, start_date_str, session.strftime('%Y-%m-%d'))
+                if bars is not None and not bars.empty:
+                    row = self.pipeline.frame_to_records(stock, bars.tail(1))[0]
+                FALLBACK_PROBES.inc(result="range" if row is not None else "none")
+
+        if row is not None:
+            return self.quote_record(stock, row, row['from'], fallback=True)
+
+        return {
+            'symbol': stock.upper(),
+            'error': f"No data found for {requested_date} or the previous 7 trading days."
+        }
+
+    def quote_record(self, stock, row, default_date, fallback=False):
+        #Small record the browser turns into the quote card (see assets/quote_card.js)
+
+        return {
+            'symbol': stock.upper(),
+            'date': row.get('from', default_date),
+            'open': row.get('open'),
+            'high': row.get('high'),
+            'low': row.get('low'),
+            'close': row.get('close'),
+            'volume': row.get('volume'),
+            'fallback': fallback
+        }
 
-        #Trying up to 7 days back
-        for days_back in range(0, 8):
-            fallback_date = requested_dt - timedelta(days=days_back)
-            fallback_date_str = fallback_date.strftime('%Y-%m-%d')
-        
-            df = self.get_daily_data(stock, fallback_date_str)
-        
-            if not df.empty and df.iloc[0].get('open') is not None:
-                row = df.iloc[0].to_dict()
-            
-                formatted_data = html.Div([
-                    html.Div([
-                        html.H3(f"{stock.upper()}", style={
-                            'color': '#2c3e50',
-                            'marginBottom': '5px',
-                            'fontSize': '28px',
-                            'fontWeight': '600'
-                        }),
-                        html.P(f"{row.get('from', fallback_date_str)}", style={
-                            'color': '#7f8c8d',
-                            'marginTop': '0',
-                            'fontSize': '16px',
-                            'marginBottom': '15px'
-                        }),
-                        html.Div([
-                            html.P("No data available for the requested date. Showing most recent data.", style={
-                                'color': '#e67e22',
-                                'fontSize': '14px',
-                                'backgroundColor': '#fef5e7',
-                                'padding': '10px',
-                                'borderRadius': '5px',
-                                'marginBottom': '20px',
-                                'border': '1px solid #f9e79f'
-                            })
-                        ]),
-                    ], style={'borderBottom': '2px solid #3498db', 'paddingBottom': '15px', 'marginBottom': '20px'}),
-                    
-                    html.Div([
-                        html.Div([
-                            html.Div([
-                                html.Span("Open", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                                html.Div(f"${row.get('open', 'N/A')}", style={
-                                    'fontSize': '20px',
-                                    'fontWeight': '600',
-                                    'color': '#2c3e50',
-                                    'marginTop': '5px'
-                                })
-                            ], style={
-                                'backgroundColor': '#ecf0f1',
-                                'padding': '15px',
-                                'borderRadius': '8px',
-                                'flex': '1',
-                                'margin': '5px'
-                            }),
-                            html.Div([
-                                html.Span("High", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                                html.Div(f"${row.get('high', 'N/A')}", style={
-                                    'fontSize': '20px',
-                                    'fontWeight': '600',
-                                    'color': '#27ae60',
-                                    'marginTop': '5px'
-                                })
-                            ], style={
-                                'backgroundColor': '#eafaf1',
-                                'padding': '15px',
-                                'borderRadius': '8px',
-                                'flex': '1',
-                                'margin': '5px'
-                            }),
-                        ], style={'display': 'flex', 'marginBottom': '10px'}),
-                        
-                        html.Div([
-                            html.Div([
-                                html.Span("Low", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                                html.Div(f"${row.get('low', 'N/A')}", style={
-                                    'fontSize': '20px',
-                                    'fontWeight': '600',
-                                    'color': '#e74c3c',
-                                    'marginTop': '5px'
-                                })
-                            ], style={
-                                'backgroundColor': '#fadbd8',
-                                'padding': '15px',
-                                'borderRadius': '8px',
-                                'flex': '1',
-                                'margin': '5px'
-                            }),
-                            html.Div([
-                                html.Span("Close", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                                html.Div(f"${row.get('close', 'N/A')}", style={
-                                    'fontSize': '20px',
-                                    'fontWeight': '600',
-                                    'color': '#2c3e50',
-                                    'marginTop': '5px'
-                                })
-                            ], style={
-                                'backgroundColor': '#ecf0f1',
-                                'padding': '15px',
-                                'borderRadius': '8px',
-                                'flex': '1',
-                                'margin': '5px'
-                            }),
-                        ], style={'display': 'flex', 'marginBottom': '10px'}),
-                        
-                        html.Div([
-                            html.Span("Volume", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                            html.Div(f"{row.get('volume', 'N/A'):,}", style={
-                                'fontSize': '20px',
-                                'fontWeight': '600',
-                                'color': '#8e44ad',
-                                'marginTop': '5px'
-                            })
-                        ], style={
-                            'backgroundColor': '#f4ecf7',
-                            'padding': '15px',
-                            'borderRadius': '8px',
-                            'margin': '5px'
-                        }),
-                    ])
-                ], style={
-                    'backgroundColor': 'white',
-                    'padding': '25px',
-                    'borderRadius': '10px',
-                    'boxShadow': '0 2px 8px rgba(0,0,0,0.1)'
+    def fetch_polygon_tickers(self):
+        # loads tickers from the index file, again whenever it is refreshed
+
+        return self.universe.current().tickers
+
+    def get_ticker_index(self):
+        # search index for the current ticker list
+
+        return self.universe.index()
+
+    def search_callback(self):
+        #sending only the best matches for what was typed instead of every ticker
+
+        @self.app.callback(
+            Output("input-stock", "options"),
+            Input("input-stock", "search_value"),
+            State("input-stock", "value")
+            )
+        @timed(CALLBACK_SECONDS, callback="search")
+        def update_ticker_options(search_value, current_value):
+            if not search_value:
+                # keeping the selected ticker as an option so it stays displayed
+                if current_value:
+                    return [{'label': current_value, 'value': current_value}]
+                raise PreventUpdate
+
+            matches = self.get_ticker_index().search(search_value, self.search_results)
+
+            # the dropdown still filters options in the browser, so each option also carries
+            # the typed text to keep close spellings from being hidden
+            options = []
+            for ticker in matches:
+                name = self.universe.name(ticker)
+                options.append({
+                    'label': f"{ticker} - {name}" if name else ticker,
+                    'value': ticker,
+                    'search': f"{ticker} {search_value}",
                 })
-                return formatted_data
+            return options
+
+    def get_chart_data(self, stock, start, end):
+        #bars for the chart, served from the cache once the range has been fetched
+
+        import pandas as pd
+
+        bars = self.pipeline.get_range_data(stock, start, end)
+        if bars is None:
+            return pd.DataFrame()
+        return bars
+
+    def get_indicator_engine(self):
+        # builds the indicator engine the first time a chart needs it
+
+        with self.lazy_lock:
+            if self.indicators is None:
+                from indicators import IndicatorEngine
+                self.indicators = IndicatorEngine()
+            return self.indicators
+
+    def get_snapshot_store(self):
+        # builds the snapshot store the first time the market panel is opened
+
+        with self.lazy_lock:
+            if self.snapshots is None:
+                from market_snapshot import SnapshotStore
+                self.snapshots = SnapshotStore(self.pipeline)
+            return self.snapshots
+
+    def get_chart_indicators(self, stock, df, selected):
+        #indicator columns for the bars in df, one set of columns per selected choice
+
+        import pandas as pd
+
+        engine = self.get_indicator_engine()
+        result = pd.DataFrame({'date': pd.to_datetime(df['date'])})
+        for choice in selected or []:
+            name, period = choice.split(':')
+            values = engine.compute(stock, name, df, int(period))
+            result = result.merge(values, on='date', how='left')
+        return result
+
+    def visible_window(self, relayout, full_window):
+        #date range the user zoomed to, or the full range when the zoom was reset
+
+        if not relayout or any(key.endswith('autorange') for key in relayout):
+            return full_window
+
+        for axis in ('xaxis', 'xaxis2'):
+            if f'{axis}.range[0]' in relayout:
+                start = relayout[f'{axis}.range[0]'][:10]
+                end = relayout[f'{axis}.range[1]'][:10]
+                return [max(start, full_window[0]), min(end, full_window[1])]
+
+        return None
+
+    def chart_callback(self):
+        #price and volume chart for the selected range, re-queried for the visible window on zoom
+
+        @self.app.callback(
+            [Output("price-chart", "figure"),
+             Output("chart-window", "data")],
+            [Input("submit-button", "n_clicks"),
+             Input("price-chart", "relayoutData"),
+             Input("chart-indicators", "value")],
+            [State("input-stock", "value"),
+             State("chart-range", "start_date"),
+             State("chart-range", "end_date"),
+             State("input-date", "date"),
+             State("chart-window", "data")]
+            )
+        @timed(CALLBACK_SECONDS, callback="chart")
+        def update_chart(submit_clicks, relayout, selected, input_stock, range_start, range_end, input_date, chart_window):
+            ctx = dash.callback_context
+            button_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
+
+            if button_id == "submit-button":
+                if not input_stock:
+                    raise PreventUpdate
+
+                end = range_end or input_date or date.today().strftime('%Y-%m-%d')
+                start = range_start or (date.fromisoformat(end) - timedelta(days=365)).strftime('%Y-%m-%d')
+                chart_window = {'symbol': input_stock, 'start': start, 'end': end}
+                window = [start, end]
+
+            elif button_id == "price-chart" and chart_window:
+                window = self.visible_window(relayout, [chart_window['start'], chart_window['end']])
+                if window is None:
+                    raise PreventUpdate
+
+            elif button_id == "chart-indicators" and chart_window:
+                window = self.visible_window(relayout, [chart_window['start'], chart_window['end']])
+                window = window or [chart_window['start'], chart_window['end']]
+
+            else:
+                raise PreventUpdate
+
+            from charts import build_price_figure
+
+            # indicators run over the whole selected range so zooming in keeps their warm-up,
+            # then both are cut down to the visible window
+            df = self.get_chart_data(chart_window['symbol'], chart_window['start'], chart_window['end'])
+            overlays = None
+            if not df.empty:
+                overlays = self.get_chart_indicators(chart_window['symbol'], df, selected)
+                visible = (df['date'] >= window[0]) & (df['date'] <= window[1])
+                df = df[visible.to_numpy()]
+                overlays = overlays[visible.to_numpy()]
+
+            figure = build_price_figure(chart_window['symbol'], df, self.chart_points, overlays)
+            return figure, chart_window
+
+    def movers_table(self, title, rows):
+        #one list of movers, prices rounded for display
+
+        rows = rows.round({'close': 2, 'change': 2, 'change_pct': 2})
         return html.Div([
-            html.Div([
-                html.H3(f"{stock.upper()}", style={
-                    'color': '#2c3e50',
-                    'marginBottom': '10px'
-                }),
-                html.P(f"No data found for {requested_date} or the previous 7 days.", style={
-                    'color': '#e74c3c',
-                    'fontSize': '16px'
-                })
-            ], style={
-                'backgroundColor': '#fadbd8',
-                'padding': '20px',
-                'borderRadius': '10px',
-                'border': '1px solid #e74c3c'
-            })
-        ])
+            html.H4(title, style={'color': '#2c3e50', 'marginBottom': '8px'}),
+            dash_table.DataTable(
+                data=rows.to_dict('records'),
+                columns=[
+                    {'name': 'Symbol', 'id': 'symbol'},
+                    {'name': 'Close', 'id': 'close'},
+                    {'name': 'Change %', 'id': 'change_pct'},
+                    {'name': 'Volume', 'id': 'volume'},
+                ],
+                style_cell={'fontSize': '13px', 'padding': '4px 8px', 'textAlign': 'right'},
+                style_header={'fontWeight': '600', 'backgroundColor': '#f5f6fa'},
+                style_as_list_view=True
+            )
+        ], style={'flex': '1', 'minWidth': '250px', 'margin': '0 10px'})
 
-    def fetch_polygon_tickers(self):
-        # loads tickers from JSON file
+    def market_callback(self):
+        #top movers and breadth of the whole market for the selected date
 
-        if self.cached_tickers:
-            return self.cached_tickers
-    
-        try:
-            with open('tickers.json', 'r') as f:
-                self.cached_tickers = json.load(f)
-                return self.cached_tickers
-        
-        except FileNotFoundError:
-            print("tickers.json not found. Make sure to run fetch_tickers.py first.")
-            return []
-        
-        return self.cached_tickers  
+        @self.app.callback(
+            Output("market-panel", "children"),
+            Input("market-button", "n_clicks"),
+            State("input-date", "date")
+            )
+        @timed(CALLBACK_SECONDS, callback="market")
+        def update_market(n_clicks, input_date):
+            if not n_clicks:
+                raise PreventUpdate
+
+            snapshot = self.get_snapshot_store().snapshot(input_date)
+            if snapshot is None or not len(snapshot):
+                return html.P("No market data available for that date.", style={'color': '#e74c3c'})
+
+            breadth = snapshot.breadth().iloc[0]
+            summary = (
+                f"{snapshot.session.isoformat()}: {breadth['advancers']} advancing, "
+                f"{breadth['decliners']} declining, {breadth['unchanged']} unchanged "
+                f"across {len(snapshot)} symbols"
+            )
+
+            return html.Div([
+                html.P(summary, style={'color': '#7f8c8d', 'marginTop': '0'}),
+                html.Div([
+                    self.movers_table("Top gainers", snapshot.top_gainers(self.movers_count)),
+                    self.movers_table("Top losers", snapshot.top_losers(self.movers_count)),
+                    self.movers_table("Volume leaders", snapshot.volume_leaders(self.movers_count)),
+                ], style={'display': 'flex', 'flexWrap': 'wrap', 'margin': '0 -10px'})
+            ])
+
+    def live_points(self, rows):
+        #x and y of live rows, times shown in New York time
+
+        times = rows['t']
+        if len(times):
+            # one offset for the batch, a daylight saving change never falls inside a session
+            offset = datetime.fromtimestamp(times[-1] / 1000, MARKET_TIMEZONE).utcoffset()
+            times = times + int(offset.total_seconds() * 1000)
+        x = times.astype('datetime64[ms]').astype(str).tolist()
+        return x, rows[self.stream.store.price_field].tolist()
+
+    def live_figure(self, symbol, rows):
+        #whole live series, sent when a ticker is first shown or the browser fell behind
+
+        x, y = self.live_points(rows)
+        return {
+            'data': [{'type': 'scatter', 'mode': 'lines', 'name': symbol, 'x': x, 'y': y,
+                      'line': {'color': '#2c3e50', 'width': 1.5}}],
+            'layout': {
+                'title': {'text': f"{symbol} live"},
+                'xaxis': {'type': 'date'},
+                'yaxis': {'title': {'text': 'Price'}},
+                'margin': {'l': 50, 'r': 20, 't': 40, 'b': 40},
+                'uirevision': symbol,
+            },
+        }
+
+    def live_callback(self):
+        #new live points since the last poll, appended in the browser with extendData
+
+        @self.app.callback(
+            [Output("live-chart", "figure"),
+             Output("live-chart", "extendData"),
+             Output("live-cursor", "data")],
+            Input("live-interval", "n_intervals"),
+            [State("input-stock", "value"),
+             State("live-cursor", "data")],
+            prevent_initial_call=True
+            )
+        @timed(CALLBACK_SECONDS, callback="live")
+        def update_live(n_intervals, input_stock, cursor):
+            if self.stream is None or not input_stock:
+                raise PreventUpdate
+
+            symbol = input_stock.upper()
+            buffer = self.stream.subscribe(symbol)
+
+            # the browser has this ticker up to cursor's sequence number, so only newer rows go out
+            if cursor and cursor.get('symbol') == symbol:
+                rows, seq, missed = buffer.since(cursor['seq'])
+                if not missed:
+                    if not len(rows):
+                        raise PreventUpdate
+                    x, y = self.live_points(rows)
+                    extend = [{'x': [x], 'y': [y]}, [0], buffer.capacity]
+                    return dash.no_update, extend, {'symbol': symbol, 'seq': seq}
+
+            rows, seq, _ = buffer.since(-1)
+            return self.live_figure(symbol, rows), dash.no_update, {'symbol': symbol, 'seq': seq}
+
+    def metrics_route(self):
+        #Prometheus text on /metrics, the numbers read from other objects are registered here
+
+        registry = get_registry()
+        pipeline = self.pipeline
+
+        registry.callback(
+            "quote_cache_hits_total", "Quote cache hits by tier", "counter",
+            lambda: {(tier,): pipeline.cache.stats()[f"{tier}_hits"] for tier in ("memory", "disk")},
+            ["tier"]
+        )
+        registry.callback(
+            "quote_cache_misses_total", "Quote cache lookups that found nothing", "counter",
+            lambda: pipeline.cache.stats()["misses"]
+        )
+        registry.callback(
+            "quote_cache_evictions_total", "Entries dropped from the in-memory tier", "counter",
+            lambda: pipeline.cache.stats()["evictions"]
+        )
+        registry.callback(
+            "negative_cache_lookups_total", "Negative cache lookups by result", "counter",
+            lambda: {(result,): count for result, count in pipeline.negative_cache.stats().items()},
+            ["result"]
+        )
+        registry.callback(
+            "single_flight_calls_total", "Requests through single-flight by outcome", "counter",
+            lambda: {(outcome,): count for outcome, count in pipeline.flights.stats().items()},
+            ["outcome"]
+        )
+        registry.callback(
+            "rate_limiter_queue_depth", "Callers waiting for a rate limiter token", "gauge",
+            pipeline.limiter.queue_depth
+        )
+
+        if self.prefetcher is not None:
+            prefetcher = self.prefetcher
+            registry.callback(
+                "prefetch_lookups_total", "Dashboard lookups seen by the prefetcher", "counter",
+                lambda: prefetcher.stats()["lookups"]
+            )
+            registry.callback(
+                "prefetch_hits_total", "Lookups of a ticker that had been prefetched", "counter",
+                lambda: prefetcher.stats()["prefetch_hits"]
+            )
+
+        @self.app.server.route("/metrics")
+        def metrics():
+            return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    def render_callback(self):
+        #the quote card is drawn in the browser from the record in quote-store
 
+        self.app.clientside_callback(
+            ClientsideFunction(namespace="quotes", function_name="render_card"),
+            Output("output-data", "children"),
+            Input("quote-store", "data")
+        )
 
     def input_callback(self):
         #getting input and output
 
         @self.app.callback(
-            [Output("output-data", "children"),
+            [Output("quote-store", "data"),
              Output("date-picker-container", "style")],
             [Input("submit-button", "n_clicks"),
              Input("calendar-button", "n_clicks")],
@@ -222,11 +468,12 @@ class Dashboard ():
             )
         
         #processing input and putting into get_daily_data method
+        @timed(CALLBACK_SECONDS, callback="process_input")
         def process_input(submit_clicks, calendar_clicks, input_stock, input_date, current_style):
             ctx = dash.callback_context
 
             if not ctx.triggered:
-                return html.Div("", id="no-input"), {'display': 'none'}
+                return None, {'display': 'none'}
             
             button_id = ctx.triggered[0]['prop_id'].split('.')[0]
 
@@ -249,133 +496,32 @@ class Dashboard ():
 
             if button_id == "submit-button" and input_stock:   
 
+                if self.prefetcher is not None:
+                    self.prefetcher.record_lookup(input_stock)
+
                 # If no date selected, use today's date and get most recent data
                 if not input_date:
                     today = date.today().strftime('%Y-%m-%d')
                     return self.get_most_recent_data(input_stock, today), current_style
 
+                # Markets were closed that day, go straight to the previous session
+                if not self.pipeline.calendar.is_trading_day(input_date):
+                    return self.get_most_recent_data(input_stock, input_date), current_style
+
                 # Date was selected, try to get data for that specific date
-                df = self.get_daily_data(input_stock, input_date)
+                row = self.get_daily_data(input_stock, input_date)
 
-                if df.empty or df.iloc[0].get('open') is None:  
+                if row is None or row.get('open') is None:
                     return self.get_most_recent_data(input_stock, input_date), current_style
 
-                row = df.iloc[0].to_dict()
+                return self.quote_record(input_stock, row, input_date), current_style
 
-                formatted_data = html.Div([
-                    html.Div([
-                        html.H3(f"{input_stock.upper()}", style={
-                            'color': '#2c3e50',
-                            'marginBottom': '5px',
-                            'fontSize': '28px',
-                            'fontWeight': '600'
-                        }),
-                        html.P(f"{row.get('from', input_date)}", style={
-                            'color': '#7f8c8d',
-                            'marginTop': '0',
-                            'fontSize': '16px',
-                            'marginBottom': '0'
-                        }),
-                    ], style={'borderBottom': '2px solid #3498db', 'paddingBottom': '15px', 'marginBottom': '20px'}),
-                    
-                    html.Div([
-                        html.Div([
-                            html.Div([
-                                html.Span("Open", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                                html.Div(f"${row.get('open', 'N/A')}", style={
-                                    'fontSize': '20px',
-                                    'fontWeight': '600',
-                                    'color': '#2c3e50',
-                                    'marginTop': '5px'
-                                })
-                            ], style={
-                                'backgroundColor': '#ecf0f1',
-                                'padding': '15px',
-                                'borderRadius': '8px',
-                                'flex': '1',
-                                'margin': '5px'
-                            }),
-                            html.Div([
-                                html.Span("High", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                                html.Div(f"${row.get('high', 'N/A')}", style={
-                                    'fontSize': '20px',
-                                    'fontWeight': '600',
-                                    'color': '#27ae60',
-                                    'marginTop': '5px'
-                                })
-                            ], style={
-                                'backgroundColor': '#eafaf1',
-                                'padding': '15px',
-                                'borderRadius': '8px',
-                                'flex': '1',
-                                'margin': '5px'
-                            }),
-                        ], style={'display': 'flex', 'marginBottom': '10px'}),
-                        
-                        html.Div([
-                            html.Div([
-                                html.Span("Low", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                                html.Div(f"${row.get('low', 'N/A')}", style={
-                                    'fontSize': '20px',
-                                    'fontWeight': '600',
-                                    'color': '#e74c3c',
-                                    'marginTop': '5px'
-                                })
-                            ], style={
-                                'backgroundColor': '#fadbd8',
-                                'padding': '15px',
-                                'borderRadius': '8px',
-                                'flex': '1',
-                                'margin': '5px'
-                            }),
-                            html.Div([
-                                html.Span("Close", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                                html.Div(f"${row.get('close', 'N/A')}", style={
-                                    'fontSize': '20px',
-                                    'fontWeight': '600',
-                                    'color': '#2c3e50',
-                                    'marginTop': '5px'
-                                })
-                            ], style={
-                                'backgroundColor': '#ecf0f1',
-                                'padding': '15px',
-                                'borderRadius': '8px',
-                                'flex': '1',
-                                'margin': '5px'
-                            }),
-                        ], style={'display': 'flex', 'marginBottom': '10px'}),
-                        
-                        html.Div([
-                            html.Span("Volume", style={'color': '#7f8c8d', 'fontSize': '14px'}),
-                            html.Div(f"{row.get('volume', 'N/A'):,}", style={
-                                'fontSize': '20px',
-                                'fontWeight': '600',
-                                'color': '#8e44ad',
-                                'marginTop': '5px'
-                            })
-                        ], style={
-                            'backgroundColor': '#f4ecf7',
-                            'padding': '15px',
-                            'borderRadius': '8px',
-                            'margin': '5px'
-                        }),
-                    ])
-                ], style={
-                    'backgroundColor': 'white',
-                    'padding': '25px',
-                    'borderRadius': '10px',
-                    'boxShadow': '0 2px 8px rgba(0,0,0,0.1)'
-                })
-                return formatted_data, current_style
-
-            return html.Div("", id="no-valid-input"), current_style
+            return None, current_style
  
     def layout(self):
         #dashboard layout
 
-        available_tickers = self.fetch_polygon_tickers()
-        ticker_options = [{'label': ticker, 'value': ticker} for ticker in available_tickers]
- 
+        # options are filled in by search_callback as the user types
         self.app.layout = html.Div([
             # Header container
             html.Div([
@@ -408,7 +554,7 @@ class Dashboard ():
                 html.Div([
                     dcc.Dropdown(
                         id="input-stock",
-                        options=ticker_options,
+                        options=[],
                         placeholder="Enter stock ticker (e.g., AAPL, VOO, MSFT)",
                         searchable=True,
                         clearable=True,
@@ -483,8 +629,74 @@ class Dashboard ():
                 'marginBottom': '30px'
             }),
             
-            # Output data container
+            # Latest lookup result and the card rendered from it
+            dcc.Store(id="quote-store"),
             html.Div(id="output-data"),
+
+            # Price and volume chart
+            html.Div([
+                dcc.DatePickerRange(
+                    id="chart-range",
+                    display_format='YYYY-MM-DD',
+                    start_date_placeholder_text="Chart start",
+                    end_date_placeholder_text="Chart end",
+                ),
+                dcc.Checklist(
+                    id="chart-indicators",
+                    options=self.indicator_choices,
+                    value=[],
+                    inline=True,
+                    inputStyle={'marginRight': '4px'},
+                    labelStyle={'marginLeft': '15px'}
+                ),
+                dcc.Store(id="chart-window"),
+                dcc.Graph(id="price-chart", config={'displaylogo': False}),
+            ], style={
+                'backgroundColor': 'white',
+                'padding': '25px',
+                'borderRadius': '10px',
+                'boxShadow': '0 2px 8px rgba(0,0,0,0.1)',
+                'marginTop': '30px'
+            }),
+
+            # Live prices from the websocket feed, each poll only carries the points added since the last
+            html.Div([
+                dcc.Interval(id="live-interval", interval=self.live_interval_ms, disabled=self.stream is None),
+                dcc.Store(id="live-cursor"),
+                dcc.Graph(id="live-chart", config={'displaylogo': False}),
+            ], style={
+                'display': 'block' if self.stream is not None else 'none',
+                'backgroundColor': 'white',
+                'padding': '25px',
+                'borderRadius': '10px',
+                'boxShadow': '0 2px 8px rgba(0,0,0,0.1)',
+                'marginTop': '30px'
+            }),
+
+            # Whole-market movers for the selected date
+            html.Div([
+                html.Button('Market snapshot',
+                    id="market-button",
+                    style={
+                        'backgroundColor': '#60e4b8',
+                        'color': 'white',
+                        'border': 'none',
+                        'padding': '10px 20px',
+                        'borderRadius': '6px',
+                        'fontSize': '15px',
+                        'fontWeight': '600',
+                        'cursor': 'pointer',
+                        'marginBottom': '15px'
+                    }
+                ),
+                dcc.Loading(html.Div(id="market-panel")),
+            ], style={
+                'backgroundColor': 'white',
+                'padding': '25px',
+                'borderRadius': '10px',
+                'boxShadow': '0 2px 8px rgba(0,0,0,0.1)',
+                'marginTop': '30px'
+            }),
             
         ], style={
             'fontFamily': '-apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif',
@@ -496,14 +708,31 @@ class Dashboard ():
         })
 
 
-    def run(self):
-        self.app.run(debug=True)
+    def run(self, debug=True):
+        # Flask development server, see wsgi.py for running with several workers
+        # The reloader would run main() again in a child process, with a second prefetcher and
+        # a second feed connection that Polygon drops the first one for
+        self.app.run(debug=debug, use_reloader=False)
 
 def main():
 
+    load_dotenv()
     pipeline = StockMarketPipeline()
-    dashboard = Dashboard(pipeline)
-    dashboard.run()
+    prefetcher = PrefetchScheduler(pipeline).start()
+
+    # live chart when a feed channel is configured (AM minute bars, A second bars, T trades)
+    stream = None
+    if os.getenv("stream_channel"):
+        from streaming import StreamClient
+        stream = StreamClient().start()
+
+    dashboard = Dashboard(pipeline, prefetcher, stream)
+    try:
+        dashboard.run()
+    finally:
+        prefetcher.close()
+        if stream is not None:
+            stream.close()
    
 if __name__ == "__main__":
     main()
@@ -6,123 +6,398 @@ This file handles the interaction with the database.
 This file is no longer used for the current version of the project.
 """
 
-import os
-from dotenv import load_dotenv
-import psycopg2
+from db import SqliteDatabase, get_database
 from get_data import StockMarketPipeline
+from fetch_engine import FetchEngine, RangeJob
+from rate_limiter import BACKFILL
+from trading_calendar import get_trading_calendar
 from datetime import date, timedelta
-import time
+import numpy as np
+import pandas as pd
 
-load_dotenv()
+# Columns that query_range can return, with the SQL that reads each one as a plain number
+QUERY_COLUMNS = {
+    'date': "date",
+    'open': "CAST(open_price AS DOUBLE PRECISION)",
+    'high': "CAST(high_price AS DOUBLE PRECISION)",
+    'low': "CAST(low_price AS DOUBLE PRECISION)",
+    'close': "CAST(close_price AS DOUBLE PRECISION)",
+    'volume': "volume",
+}
+
+# Column types of stock_prices, tables created before they were widened are altered to match
+# Share classes like CWEN.A are longer than five characters, five-letter symbols like ABLLL are
+# at the limit, and prices below a cent or over $100,000,000 do not fit DECIMAL(10, 2)
+STOCK_PRICES_TYPES = {
+    'ticker': ("VARCHAR(16)", 16, None, None),
+    'open_price': ("DECIMAL(18, 4)", None, 18, 4),
+    'high_price': ("DECIMAL(18, 4)", None, 18, 4),
+    'low_price': ("DECIMAL(18, 4)", None, 18, 4),
+    'close_price': ("DECIMAL(18, 4)", None, 18, 4),
+}
+
+# Stored sessions sync_database() may request again to join two missing spans into one call
+# A joined range costs one call instead of two but re-downloads and rewrites the stored rows
+# between the spans. Two weeks keeps that to a handful of rows per call, a wider gap saves
+# calls only for tickers with many small holes at the cost of rewriting months of rows
+SYNC_MERGE_GAP = 10
 
-def get_connection():
-    database_url = os.getenv("database_url")
-    conn = psycopg2.connect(database_url)
-    return conn
-                        
 def create_table():
-    conn = get_connection()
-    cursor = conn.cursor()
+    with get_database().transaction() as tx:
+        create_tables(tx)
+    print ("Table created successfully")
 
-    cursor.execute("""
+
+def create_tables(tx):
+    tx.execute("""
         CREATE TABLE IF NOT EXISTS stock_prices (
             id SERIAL PRIMARY KEY,
-            ticker VARCHAR(5),
+            ticker VARCHAR(16),
             date DATE,
-            open_price DECIMAL(10, 2),
-            high_price DECIMAL(10, 2),
-            low_price DECIMAL(10, 2),
-            close_price DECIMAL(10,2),
+            open_price DECIMAL(18, 4),
+            high_price DECIMAL(18, 4),
+            low_price DECIMAL(18, 4),
+            close_price DECIMAL(18, 4),
             volume BIGINT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             UNIQUE(ticker, date)
         );
     """)
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print ("Table created successfully")
+    widen_stock_prices(tx)
 
+    # Date-only scans across every ticker, (ticker, date) lookups already use the UNIQUE index
+    tx.execute("CREATE INDEX IF NOT EXISTS stock_prices_date_idx ON stock_prices (date);")
 
-def populate_database(ticker, pastDays):
-    conn = get_connection()
-    cursor = conn.cursor()
+    # One row per ticker, so listing tickers does not scan every price row
+    tx.execute("""
+        CREATE TABLE IF NOT EXISTS tickers (
+            ticker VARCHAR(16) PRIMARY KEY,
+            first_date DATE,
+            last_date DATE
+        );
+    """)
+    tx.execute("""
+        INSERT INTO tickers (ticker, first_date, last_date)
+        SELECT ticker, MIN(date), MAX(date) FROM stock_prices GROUP BY ticker
+        ON CONFLICT (ticker) DO NOTHING;
+    """)
 
-    pipeline = StockMarketPipeline()
+    # Remembers how far each backfill got, so an interrupted run can resume
+    tx.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            ticker VARCHAR(16),
+            start_date DATE,
+            end_date DATE,
+            last_date DATE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (ticker, start_date, end_date)
+        );
+    """)
 
-    endDate = date.today()
-    currentDate = endDate - timedelta(days=1)
 
-    for day in range(pastDays):
-        
-        dateString = currentDate.strftime('%Y-%m-%d')
-    
-        api_data = pipeline.get_daily_data(ticker, dateString)
+# Alters the stock_prices columns that are narrower than STOCK_PRICES_TYPES
+# SQLite does not enforce declared lengths or precision, so only Postgres needs it
+def widen_stock_prices(tx):
+    if isinstance(tx.database, SqliteDatabase):
+        return
 
-        if api_data.get('open') is None:
-            print(f"No data available for {ticker} on {dateString}")
-            currentDate = currentDate - timedelta(days=1)
-            time.sleep(13)
+    tx.execute("""
+        SELECT column_name, character_maximum_length, numeric_precision, numeric_scale
+        FROM information_schema.columns
+        WHERE table_name = 'stock_prices' AND table_schema = current_schema();
+    """)
+    current = {row[0]: row[1:] for row in tx.fetchall()}
+
+    for column, (sql_type, length, precision, scale) in STOCK_PRICES_TYPES.items():
+        if column not in current:
             continue
+        # A NULL length or precision is TEXT or unconstrained NUMERIC, already wide enough
+        old_length, old_precision, old_scale = current[column]
+        if (length is not None and old_length is not None and old_length < length) or (
+            precision is not None and old_precision is not None and (old_precision < precision or old_scale < scale)
+        ):
+            print(f"Widening stock_prices.{column} to {sql_type}")
+            tx.execute(f"ALTER TABLE stock_prices ALTER COLUMN {column} TYPE {sql_type};")
+
+
+def populate_database(ticker, pastDays, incremental=False):
+    endDate = date.today() - timedelta(days=1)
+    startDate = endDate - timedelta(days=pastDays - 1)
+
+    # Incremental mode only requests the sessions that are not in the table yet
+    if incremental:
+        sync_database([ticker], startDate, endDate)
+    else:
+        backfill([ticker], startDate, endDate)
+
+
+# Splits start..end into windows of chunk_days, each one is a single range request and a single commit
+def backfill_chunks(start, end, chunk_days):
+    chunks = []
+    chunk_start = start
 
-        cursor.execute("""
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+
+    return chunks
+
+
+def load_checkpoints(tx, tickers, start, end):
+    tx.execute(f"""
+        SELECT ticker, last_date FROM backfill_checkpoints
+        WHERE ticker IN {tx.in_list(tickers)} AND start_date = %s AND end_date = %s;
+    """, (*tickers, start, end))
+
+    return dict(tx.fetchall())
+
+
+# Bulk insert of a range of bars, returns how many rows were sent
+def insert_bars(tx, ticker, bars):
+    rows = [
+        (ticker, day.date(), float(open_), float(high), float(low), float(close), int(volume))
+        for day, open_, high, low, close, volume in zip(
+            bars['date'], bars['open'], bars['high'], bars['low'], bars['close'], bars['volume']
+        )
+    ]
+
+    if rows:
+        tx.execute_many("""
             INSERT INTO stock_prices (ticker, date, open_price, high_price, low_price, close_price, volume)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)  
-            ON CONFLICT (ticker, date) DO NOTHING;   
-        """, (
-            ticker, 
-            currentDate, 
-            api_data.get('open'), 
-            api_data.get('high'), 
-            api_data.get('low'), 
-            api_data.get('close'), 
-            api_data.get('volume') 
-        ))
+            VALUES %s
+            ON CONFLICT (ticker, date) DO NOTHING;
+        """, rows)
 
-        print("Data inserted for date:", currentDate)
+        first_date = min(row[1] for row in rows)
+        last_date = max(row[1] for row in rows)
+        tx.execute("""
+            INSERT INTO tickers (ticker, first_date, last_date)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (ticker) DO UPDATE SET
+                first_date = CASE WHEN excluded.first_date < tickers.first_date
+                    THEN excluded.first_date ELSE tickers.first_date END,
+                last_date = CASE WHEN excluded.last_date > tickers.last_date
+                    THEN excluded.last_date ELSE tickers.last_date END;
+        """, (ticker, first_date, last_date))
 
-        currentDate = currentDate - timedelta(days=1)
+    return len(rows)
 
-        #API limit is 5 requests per minute
-        time.sleep(13) 
 
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print ("Data added successfully")
+# Writes one chunk of bars and moves the checkpoint forward in the same transaction
+def write_chunk(database, ticker, bars, start, end, chunk_end):
+    with database.transaction() as tx:
+        inserted = insert_bars(tx, ticker, bars)
 
+        tx.execute("""
+            INSERT INTO backfill_checkpoints (ticker, start_date, end_date, last_date)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (ticker, start_date, end_date) DO UPDATE
+            SET last_date = excluded.last_date, updated_at = CURRENT_TIMESTAMP;
+        """, (ticker, start, end, chunk_end))
 
-def query_database(ticker):
-    conn = get_connection()
-    cursor = conn.cursor()
+    return inserted
+
+
+# Loads daily bars for many tickers between start and end (both inclusive)
+# Tickers are fetched concurrently within the API budget, each commits chunk by chunk
+# and a rerun of the same backfill continues after the last committed chunk
+def backfill(tickers, start, end, chunk_days=365, max_workers=None):
+    pipeline = StockMarketPipeline()
+    calendar = get_trading_calendar()
+
+    database = get_database()
+    with database.transaction() as tx:
+        checkpoints = load_checkpoints(tx, tickers, start, end)
+
+    # Chunks that still have to be loaded for each ticker, oldest first
+    pending = {}
+    for ticker in tickers:
+        done_until = checkpoints.get(ticker)
+        chunks = [
+            (chunk_start, chunk_end) for chunk_start, chunk_end in backfill_chunks(start, end, chunk_days)
+            if (done_until is None or chunk_end > done_until)
+            and calendar.sessions_between(chunk_start, chunk_end)
+        ]
+        if done_until is not None:
+            print(f"Resuming {ticker} after {done_until}")
+        if chunks:
+            pending[ticker] = chunks
+
+    total_rows = 0
+
+    with FetchEngine(pipeline, max_workers) as engine:
+        # Every round fetches the next chunk of each ticker at the same time
+        while pending:
+            jobs = {
+                RangeJob(ticker, chunks[0][0].strftime('%Y-%m-%d'), chunks[0][1].strftime('%Y-%m-%d')): ticker
+                for ticker, chunks in pending.items()
+            }
+
+            for job, bars in engine.stream(jobs, BACKFILL):
+                ticker = jobs[job]
+
+                if bars is None or isinstance(bars, Exception):
+                    # The checkpoint stays where it is so the next run retries this chunk
+                    print(f"Backfill of {ticker} stopped at {job.start}, rerun to resume")
+                    del pending[ticker]
+                    continue
 
-    cursor.execute("""
-        SELECT * FROM stock_prices
-        WHERE ticker = %s
-        ORDER BY date DESC;
+                chunk_start, chunk_end = pending[ticker].pop(0)
+                inserted = write_chunk(database, ticker, bars, start, end, chunk_end)
+                total_rows += inserted
+                print(f"Data inserted for {ticker} from {chunk_start} to {chunk_end}: {inserted} rows")
+
+                if not pending[ticker]:
+                    del pending[ticker]
+
+    pipeline.close()
+    print(f"Data added successfully ({total_rows} rows)")
+
+
+# Sessions between start and end that each ticker is missing in stock_prices
+# The lookup is answered from the UNIQUE (ticker, date) index
+def find_missing_sessions(tx, tickers, start, end):
+    sessions = get_trading_calendar().sessions_between(start, end)
+
+    tx.execute(f"""
+        SELECT ticker, date FROM stock_prices
+        WHERE ticker IN {tx.in_list(tickers)} AND date BETWEEN %s AND %s;
+    """, (*tickers, start, end))
+
+    present = {}
+    for ticker, day in tx.fetchall():
+        present.setdefault(ticker, set()).add(day)
+
+    return {
+        ticker: [day for day in sessions if day not in present.get(ticker, ())]
+        for ticker in tickers
+    }
+
+
+# Groups missing sessions into (start, end) ranges to request
+# Runs of missing sessions separated by at most merge_gap stored sessions become one range,
+# re-requesting a few stored rows is cheaper than spending another API call (see SYNC_MERGE_GAP)
+def merge_missing_sessions(missing, sessions, merge_gap):
+    position = {day: index for index, day in enumerate(sessions)}
+    ranges = []
+
+    for day in missing:
+        if ranges and position[day] - position[ranges[-1][1]] - 1 <= merge_gap:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+
+    return [(first, last) for first, last in ranges]
+
+
+# Requests only the sessions each ticker is missing between start and end (both inclusive)
+# A nightly run over up-to-date tickers costs about one request per ticker
+# Missing spans at most merge_gap stored sessions apart are requested together, see SYNC_MERGE_GAP
+def sync_database(tickers, start, end, merge_gap=SYNC_MERGE_GAP, max_workers=None):
+    pipeline = StockMarketPipeline()
+    sessions = get_trading_calendar().sessions_between(start, end)
+
+    database = get_database()
+    with database.transaction() as tx:
+        missing = find_missing_sessions(tx, tickers, start, end)
+
+    jobs = [
+        RangeJob(ticker, first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d'))
+        for ticker, days in missing.items()
+        for first, last in merge_missing_sessions(days, sessions, merge_gap)
+    ]
+
+    print(f"{sum(len(days) for days in missing.values())} missing sessions, {len(jobs)} requests")
+
+    total_rows = 0
+
+    with FetchEngine(pipeline, max_workers) as engine:
+        for job, bars in engine.stream(jobs, BACKFILL):
+            if bars is None or isinstance(bars, Exception):
+                print(f"Sync of {job.symbol} from {job.start} to {job.end} failed, rerun to retry")
+                continue
+
+            with database.transaction() as tx:
+                total_rows += insert_bars(tx, job.symbol, bars)
+
+    pipeline.close()
+    print(f"Data synced successfully ({total_rows} rows)")
+
+
+def query_database(ticker):
+    with get_database().transaction() as tx:
+        tx.execute_prepared("query_ticker", """
+            SELECT * FROM stock_prices
+            WHERE ticker = %s
+            ORDER BY date DESC
         """, (ticker,))
-    
-    stock_data = cursor.fetchall()
-    cursor.close()
-    conn.close()  
-    return stock_data
+        return tx.fetchall()
 
-def get_all_tickers():
-    conn = get_connection()
-    cursor = conn.cursor()
+# Turns rows of (date, numbers...) into typed columns
+def rows_to_frame(rows, columns):
+    df = pd.DataFrame.from_records(rows, columns=columns)
+
+    for name in columns:
+        if name == 'date':
+            df[name] = pd.to_datetime(df[name])
+        elif name == 'volume':
+            df[name] = df[name].astype(np.int64)
+        else:
+            df[name] = df[name].astype(np.float64)
+
+    return df
 
-    cursor.execute("SELECT DISTINCT ticker FROM stock_prices;")
 
-    tickers = [row[0] for row in cursor.fetchall()]
+# Yields DataFrames of at most chunk_size rows for one ticker, oldest first
+# start and end are optional bounds (both inclusive), columns picks from QUERY_COLUMNS
+def iter_range(ticker, start=None, end=None, columns=None, chunk_size=10000):
+    columns = list(columns or QUERY_COLUMNS)
+    unknown = [name for name in columns if name not in QUERY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {unknown}")
 
-    cursor.close()
-    conn.close()
-    return tickers
+    conditions = ["ticker = %s"]
+    params = [ticker]
+    if start is not None:
+        conditions.append("date >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("date <= %s")
+        params.append(end)
+
+    sql = f"""
+        SELECT {", ".join(QUERY_COLUMNS[name] for name in columns)}
+        FROM stock_prices
+        WHERE {" AND ".join(conditions)}
+        ORDER BY date;
+    """
+
+    with get_database().transaction() as tx:
+        for rows in tx.stream(sql, params, chunk_size):
+            yield rows_to_frame(rows, columns)
+
+
+# Same as iter_range but returns a single DataFrame
+def query_range(ticker, start=None, end=None, columns=None, chunk_size=10000):
+    columns = list(columns or QUERY_COLUMNS)
+    chunks = list(iter_range(ticker, start, end, columns, chunk_size))
+
+    if not chunks:
+        return rows_to_frame([], columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def get_all_tickers():
+    with get_database().transaction() as tx:
+        tx.execute("SELECT ticker FROM tickers ORDER BY ticker;")
+        return [row[0] for row in tx.fetchall()]
 
 if __name__ == "__main__":
-    get_connection()
+    get_database()
     #create_table()
+    #backfill(["AAPL", "MSFT", "GOOG", "META", "NVDA"], date(2020, 1, 1), date.today() - timedelta(days=1))
+    #sync_database(["AAPL", "MSFT", "GOOG", "META", "NVDA"], date(2020, 1, 1), date.today() - timedelta(days=1))
     #populate_database("AAPL", 30)
     #populate_database("MSFT", 30)
     #populate_database("GOOG", 30)
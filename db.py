@@ -0,0 +1,299 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file gives the rest of the project pooled access to the database.
+
+Connections are opened once and reused from a bounded pool, each block of work runs in a
+transaction that commits or rolls back on its own, and the hot queries are prepared once
+per connection. database_url picks the backend: a postgres:// URL uses psycopg2, a
+sqlite:///path URL uses a local file, so everything can run without a Postgres server.
+"""
+
+import asyncio
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from queue import Empty, LifoQueue
+
+from dotenv import load_dotenv
+
+from metrics import DB_QUERY_SECONDS, DB_TRANSACTION_SECONDS
+
+load_dotenv()
+
+
+#Raised when no connection became free in time
+class PoolTimeout(Exception):
+    pass
+
+
+#Fixed-size pool, callers block until a connection is returned
+class ConnectionPool():
+    def __init__(self, connect, max_connections, timeout=30):
+        self.connect = connect
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        # Most recently returned connection first, it is the least likely to have gone stale
+        self.idle = LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_connections)
+
+    def get(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection free after {self.timeout}s")
+
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            pass
+
+        try:
+            conn = self.connect()
+        except Exception:
+            self.slots.release()
+            raise
+
+        with self.lock:
+            self.opened += 1
+        return conn
+
+    def put(self, conn, broken=False):
+        if broken:
+            try:
+                conn.close()
+            finally:
+                with self.lock:
+                    self.opened -= 1
+        else:
+            self.idle.put(conn)
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Empty:
+                break
+        with self.lock:
+            self.opened = 0
+
+
+#One transaction on a pooled connection, queries use %s placeholders on every backend
+class Transaction():
+    def __init__(self, database, conn):
+        self.database = database
+        self.conn = conn
+        self.cursor = conn.cursor()
+
+    def execute(self, sql, params=()):
+        with DB_QUERY_SECONDS.time(statement=statement_kind(sql)):
+            self.cursor.execute(self.database.convert(sql), params)
+        return self
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    # Bulk insert, sql has a single "VALUES %s" for the rows
+    def execute_many(self, sql, rows, page_size=1000):
+        if rows:
+            with DB_QUERY_SECONDS.time(statement="bulk_insert"):
+                self.database.execute_many(self.cursor, sql, rows, page_size)
+
+    # Runs one of the hot queries through a statement prepared once per connection
+    def execute_prepared(self, name, sql, params=()):
+        with DB_QUERY_SECONDS.time(statement=name):
+            self.database.execute_prepared(self, name, sql, params)
+        return self
+
+    # Yields lists of at most chunk_size rows without loading the whole result first
+    def stream(self, sql, params=(), chunk_size=10000):
+        cursor = self.database.streaming_cursor(self.conn, chunk_size)
+
+        # Only the time spent in the database counts, not the caller's work between chunks
+        spent = 0.0
+        try:
+            start = time.perf_counter()
+            cursor.execute(self.database.convert(sql), params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                spent += time.perf_counter() - start
+                if not rows:
+                    break
+                yield rows
+                start = time.perf_counter()
+        finally:
+            cursor.close()
+            DB_QUERY_SECONDS.observe(spent, statement="stream")
+
+    # "(%s, %s, %s)" for IN clauses, SQLite has no arrays to use with ANY
+    def in_list(self, values):
+        return "(" + ", ".join(["%s"] * len(values)) + ")"
+
+    def close(self):
+        self.cursor.close()
+
+
+# First keyword of a statement, used to label its timings
+def statement_kind(sql):
+    words = sql.split(None, 1)
+    return words[0].upper() if words else "EMPTY"
+
+
+#Common part of both backends
+class Database():
+    def __init__(self, pool):
+        self.pool = pool
+
+        # Names of the statements already prepared on each connection
+        self.prepared = {}
+
+    # Converts %s placeholders to the backend's own style
+    def convert(self, sql):
+        return sql
+
+    # Commits when the block finishes and rolls back if it raises
+    @contextmanager
+    def transaction(self):
+        with DB_TRANSACTION_SECONDS.time():
+            with self.run_transaction() as tx:
+                yield tx
+
+    @contextmanager
+    def run_transaction(self):
+        conn = self.pool.get()
+        tx = Transaction(self, conn)
+        broken = False
+
+        try:
+            yield tx
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            try:
+                tx.close()
+            except Exception:
+                broken = True
+            if broken:
+                self.prepared.pop(id(conn), None)
+            self.pool.put(conn, broken)
+
+    # Runs fn(tx) in a transaction on a worker thread so async code can await it
+    async def run_async(self, fn, *args):
+        def run():
+            with self.transaction() as tx:
+                return fn(tx, *args)
+        return await asyncio.to_thread(run)
+
+    def close(self):
+        self.pool.close()
+        self.prepared.clear()
+
+
+class PostgresDatabase(Database):
+    def __init__(self, url, max_connections=10):
+        import psycopg2
+        super().__init__(ConnectionPool(lambda: psycopg2.connect(url), max_connections))
+        self.cursor_names = itertools.count(1)
+
+    # A named cursor lives on the server and sends rows over in batches as they are read
+    def streaming_cursor(self, conn, chunk_size):
+        cursor = conn.cursor(name=f"stream_{next(self.cursor_names)}")
+        cursor.itersize = chunk_size
+        return cursor
+
+    def execute_many(self, cursor, sql, rows, page_size):
+        from psycopg2.extras import execute_values
+        execute_values(cursor, sql, rows, page_size=page_size)
+
+    # PREPARE turns the query into a server-side plan that is reused by EXECUTE
+    def execute_prepared(self, tx, name, sql, params):
+        names = self.prepared.setdefault(id(tx.conn), set())
+
+        if name not in names:
+            counter = iter(range(1, len(params) + 1))
+            numbered = re.sub(r"%s", lambda match: f"${next(counter)}", sql)
+            tx.cursor.execute(f"PREPARE {name} AS {numbered}")
+            names.add(name)
+
+        arguments = ", ".join(["%s"] * len(params))
+        tx.cursor.execute(f"EXECUTE {name} ({arguments})" if params else f"EXECUTE {name}", params)
+
+
+# Explicit conversions for the DATE and TIMESTAMP columns, sqlite3's built-in ones are deprecated
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+
+class SqliteDatabase(Database):
+    def __init__(self, path, max_connections=4):
+        def connect():
+            conn = sqlite3.connect(
+                path,
+                timeout=30,
+                check_same_thread=False,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                cached_statements=256
+            )
+            conn.execute("PRAGMA journal_mode=WAL;")
+            return conn
+
+        super().__init__(ConnectionPool(connect, max_connections))
+
+    def convert(self, sql):
+        sql = sql.replace("%s", "?")
+        # Postgres types in the shared schema that SQLite spells differently
+        return sql.replace("SERIAL PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+
+    # SQLite already steps through results one row at a time
+    def streaming_cursor(self, conn, chunk_size):
+        return conn.cursor()
+
+    def execute_many(self, cursor, sql, rows, page_size):
+        values = "(" + ", ".join(["?"] * len(rows[0])) + ")"
+        cursor.executemany(self.convert(sql.replace("VALUES %s", f"VALUES {values}")), rows)
+
+    # sqlite3 keeps compiled statements in a per-connection cache, so this is a plain execute
+    def execute_prepared(self, tx, name, sql, params):
+        tx.cursor.execute(self.convert(sql), params)
+
+
+#Picks the backend from a database URL
+def connect_database(url, max_connections=None):
+    if url.startswith("sqlite:///"):
+        return SqliteDatabase(url[len("sqlite:///"):], max_connections or 4)
+    return PostgresDatabase(url, max_connections or 10)
+
+
+_shared_database = None
+_shared_lock = threading.Lock()
+
+
+#Returns the database shared by the whole process, configured by database_url
+def get_database():
+    global _shared_database
+
+    with _shared_lock:
+        if _shared_database is None:
+            max_connections = os.getenv("database_max_connections")
+            _shared_database = connect_database(
+                os.getenv("database_url"),
+                int(max_connections) if max_connections else None
+            )
+        return _shared_database
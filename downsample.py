@@ -0,0 +1,78 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file shrinks long price series to about as many points as the chart has pixels.
+
+Line series use Largest-Triangle-Three-Buckets (LTTB), which keeps the points that shape the
+line. Candles are merged per bucket (first open, highest high, lowest low, last close, summed
+volume), so spikes never disappear from the chart.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+#Indices of the threshold points that best keep the shape of the line y(x)
+def lttb(x, y, threshold):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # First and last points are always kept, the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start = end
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+
+        # Average of the next bucket is the third corner of the triangle
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+
+    return indices
+
+
+#LTTB for a pandas series indexed by date
+def downsample_line(dates, values, max_points):
+    dates = pd.to_datetime(pd.Series(dates)).reset_index(drop=True)
+    values = pd.Series(values).reset_index(drop=True)
+
+    keep = lttb(dates.astype('int64').to_numpy(), values.to_numpy(), max_points)
+    return dates.iloc[keep], values.iloc[keep]
+
+
+#Merges consecutive bars so that at most max_points are left
+#df has date, open, high, low, close and volume columns, sorted by date
+def downsample_ohlc(df, max_points):
+    n = len(df)
+    if n <= max_points:
+        return df.reset_index(drop=True)
+
+    # Bucket number of every bar, then the first bar of each bucket
+    buckets = np.arange(n) * max_points // n
+    starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    ends = np.append(starts[1:], n) - 1
+
+    return pd.DataFrame({
+        'date': df['date'].to_numpy()[starts],
+        'open': df['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+        'volume': np.add.reduceat(df['volume'].to_numpy(), starts),
+    })
@@ -0,0 +1,70 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file fetches many tickers at once.
+
+A batch of daily or range jobs is spread over a thread pool that shares the pipeline's
+keep-alive connections, rate limiter and caches. Results are handed back as soon as each
+job finishes, so the total time follows the API's concurrency rather than its latency.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from rate_limiter import INTERACTIVE
+
+# One bar for a symbol on a date
+DailyJob = namedtuple('DailyJob', ['symbol', 'date'])
+
+# Every bar for a symbol between two dates, both inclusive
+RangeJob = namedtuple('RangeJob', ['symbol', 'start', 'end'])
+
+
+#Class that runs batches of fetch jobs concurrently
+class FetchEngine():
+    def __init__(self, pipeline, max_workers=None):
+        self.pipeline = pipeline
+
+        # More workers than pooled connections would only queue on the connection pool
+        if max_workers is None:
+            max_workers = int(os.getenv("polygon_max_concurrency", 4))
+        self.max_workers = min(max_workers, pipeline.max_connections)
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch")
+
+    def run_job(self, job, priority):
+        if isinstance(job, RangeJob):
+            return self.pipeline.get_range_data(job.symbol, job.start, job.end, priority)
+        return self.pipeline.get_daily_data(job.symbol, job.date, priority)
+
+    # Yields (job, result) pairs in the order the jobs finish
+    # A job that raised yields the exception as its result
+    def stream(self, jobs, priority=INTERACTIVE):
+        futures = {self.executor.submit(self.run_job, job, priority): job for job in jobs}
+
+        try:
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    yield job, future.result()
+                except Exception as e:
+                    print(f"Fetch failed for {job}: {e}")
+                    yield job, e
+        finally:
+            # Jobs that have not started yet are dropped if the caller stops early
+            for future in futures:
+                future.cancel()
+
+    # Blocking wrapper for callers that want every result at once
+    def fetch_all(self, jobs, priority=INTERACTIVE):
+        return dict(self.stream(jobs, priority))
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
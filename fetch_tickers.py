@@ -1,16 +1,31 @@
-# This script is used to fetch a JSON list of ticker symbols from the Polygon API.
+# This script is used to fetch the ticker universe with its metadata from the Polygon API.
+# Ticker types are fetched at the same time, sharing the rate limiter with the dashboard.
+# The result is compared with the previous index and written to ticker_index.json, and the
+# plain symbol list in tickers.json is kept for older readers.
 
 import requests
 import json
-import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from rate_limiter import REFRESH, get_rate_limiter, retry_after_seconds
+from cache import NegativeCache
+from metrics import upstream_call
+from ticker_index import FIELDS, TickerUniverse, diff_universe, load_index, write_atomic, write_index
 
 
 load_dotenv()
 
+TICKER_TYPES = ["CS", "ETF"]
+
+# Tries per page before a server error or dropped connection fails the refresh
+MAX_ATTEMPTS = 3
+
 def fetch_by_type(ticker_type):
-    url = "https://api.polygon.io/v3/reference/tickers"
+    # Returns ticker -> metadata for every active ticker of the type, None if a page failed
+    # A partial list would make every ticker on the missing pages look delisted
+
+    url = os.getenv("polygon_base_url", "https://api.polygon.io").rstrip("/") + "/v3/reference/tickers"
 
     params = {
         "apiKey": os.getenv("polygon_api_key"),
@@ -20,70 +35,109 @@ def fetch_by_type(ticker_type):
         "limit": 1000
     }
 
-    tickers = []
+    records = {}
     page = 1
+    attempts = 0
 
-    try:   
-        while url:
-            print(f"  Page {page} - Requesting: {url[:80]}...")
+    # Shared with the dashboard, which is always served first
+    limiter = get_rate_limiter()
 
-            if page > 1:
-                response = requests.get(url, params={ "apiKey": os.getenv("polygon_api_key") })
-            else:
-                response = requests.get(url, params=params)
-
-            data = response.json()
-            print(f"  Status: {response.status_code}")
+    # One connection per type, reused for every page
+    with requests.Session() as session:
+        while url:
+            print(f"  {ticker_type} page {page} - Requesting: {url[:80]}...")
+
+            limiter.acquire(REFRESH)
+            attempts += 1
+
+            try:
+                with upstream_call(url) as call:
+                    if page > 1:
+                        response = session.get(url, params={ "apiKey": os.getenv("polygon_api_key") })
+                    else:
+                        response = session.get(url, params=params)
+                    call["status"] = response.status_code
+                data = response.json()
+
+            except (requests.RequestException, ValueError) as e:
+                print(f"  Error fetching {ticker_type} page {page}: {e}")
+                if attempts >= MAX_ATTEMPTS:
+                    return None
+                continue
 
             if response.status_code == 200 and 'results' in data:
-
-                batch_count = len(data.get('results', []))
-                print(f"  Fetched {batch_count} tickers on page {page}")
+                print(f"  Fetched {len(data['results'])} {ticker_type} tickers on page {page}")
 
                 for ticker_data in data['results']:
-                    ticker = ticker_data['ticker']
-                    tickers.append(ticker)
+                    records[ticker_data['ticker']] = {
+                        field: ticker_data.get(field) for field in FIELDS
+                    }
 
                 url = data.get('next_url')
+                page += 1
+                attempts = 0
 
-                if url:
-                    print(f"  Next page available, waiting 13s...")
-                    page += 1
-                    time.sleep(13)
-                else:
-                    print(f"  No more pages for {ticker_type}")
-            
             elif response.status_code == 429:
-                print(f"  Rate limited! Waiting 60 seconds...")
-                time.sleep(60)
+                wait = retry_after_seconds(response)
+                print(f"  Rate limited! Waiting {wait:.0f} seconds...")
+                limiter.backoff(wait)
+                attempts = 0
+
+            elif response.status_code >= 500 and attempts < MAX_ATTEMPTS:
+                print(f"  Server error {response.status_code} for {ticker_type}, retrying")
 
             else:
                 print(f"API Error for {ticker_type}: {data.get('error', 'Unknown')}")
-                break
-            
-    except Exception as e:
-        print(f"Error fetching {ticker_type} tickers: {e}")
-        
-    return tickers
+                return None
+
+    print(f"  No more pages for {ticker_type}")
+    return records
+
+def fetch_all_tickers(path=None, legacy_path="tickers.json"):
+    # Refreshes the index, returns the changes or None if the refresh failed
+
+    with ThreadPoolExecutor(max_workers=len(TICKER_TYPES)) as pool:
+        fetched = dict(zip(TICKER_TYPES, pool.map(fetch_by_type, TICKER_TYPES)))
+
+    failed = [ticker_type for ticker_type, records in fetched.items() if records is None]
+    if failed:
+        print(f"Could not fetch {', '.join(failed)} tickers, keeping the previous index")
+        return None
+
+    records = {}
+    for ticker_type in TICKER_TYPES:
+        print(f"Total {ticker_type} tickers fetched:", len(fetched[ticker_type]))
+        records.update(fetched[ticker_type])
 
-def fetch_all_tickers():
-    
-    all_tickers = []
+    previous = load_index(path)
+    if previous is None:
+        version, changes = 1, None
+    else:
+        version = previous[0] + 1
+        changes = diff_universe(previous[1], records)
 
-    cs_tickers = fetch_by_type("CS")
-    print("Total CS tickers fetched:", len(cs_tickers))
+    write_index(records, version, changes, path)
+    write_atomic(legacy_path, json.dumps(sorted(records)))
 
-    time.sleep(13)
+    # Loading it once writes the binary snapshot, so dashboard workers do not each build it
+    TickerUniverse(path, legacy_path).reload()
 
-    etf_tickers = fetch_by_type("ETF")
-    print("Total ETF tickers fetched:", len(etf_tickers))
+    # Symbols that were unknown or empty before may be listed now
+    negative_cache = NegativeCache()
+    if changes is None:
+        negative_cache.invalidate()
+    else:
+        negative_cache.invalidate(changes['added'] + [new for _, new in changes['renamed']])
+    negative_cache.close()
 
-    all_tickers = sorted(list(set(cs_tickers + etf_tickers)))
+    print("Total tickers fetched:", len(records))
+    if changes is not None:
+        print(f"Index version {version}: {len(changes['added'])} added, "
+              f"{len(changes['delisted'])} delisted, {len(changes['renamed'])} renamed")
+        for old, new in changes['renamed']:
+            print(f"  {old} -> {new}")
 
-    with open('tickers.json', 'w') as f:
-        json.dump(all_tickers, f)
-    
-    print("Total tickers fetched:", len(all_tickers))
+    return changes
 
 if __name__ == "__main__":
-    fetch_all_tickers()
\ No newline at end of file
+    fetch_all_tickers()
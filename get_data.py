@@ -7,33 +7,127 @@ This file calls the API to retrieve data.
 
 import os
 import requests
-from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from cache import NegativeCache, QuoteCache
+from metrics import upstream_call
+from rate_limiter import BACKFILL, INTERACTIVE, get_rate_limiter, retry_after_seconds
+from single_flight import SingleFlight, SingleFlightTimeout
+from trading_calendar import get_trading_calendar
 
-load_dotenv()
+# pandas is imported by the methods that build frames, so a worker that has not served a
+# chart yet starts without it. Settings from .env are loaded by the entry points
+# (dash_app.main, wsgi.py) before the pipeline is created
 
 #Class that handles the data from the Polygon API
 class StockMarketPipeline():
-    def __init__(self):
+    def __init__(self, cache=None, negative_cache=None):
         self.api_key = os.getenv("polygon_api_key")
-        self.base_url = "https://api.polygon.io/v1/open-close"
+        # Pointed at mock_polygon.py for benchmarks and offline development
+        self.base_url = os.getenv("polygon_base_url", "https://api.polygon.io").rstrip("/")
+
+        # Keep-alive connections are reused across calls and threads instead of a new TLS handshake each time
+        self.max_connections = int(os.getenv("polygon_max_connections", 8))
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections))
+
+        # Past bars never change, so each (symbol, date) only needs to be fetched once
+        self.cache = cache if cache is not None else QuoteCache()
+
+        # Remembers holidays, pre-IPO dates and bad symbols that came back empty
+        self.negative_cache = negative_cache if negative_cache is not None else NegativeCache(self.cache.path)
+
+        # Shared with every other API caller in the process
+        self.limiter = get_rate_limiter()
+        self.max_retries = 3
+
+        self.calendar = get_trading_calendar()
+
+        # Concurrent requests for the same bars share one API call
+        self.flights = SingleFlight()
+
+    #Sends a GET request once the rate limiter allows it, waiting out any 429 responses
+    def request(self, url, params, priority=INTERACTIVE):
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(priority)
+            with upstream_call(url) as call:
+                response = self.session.get(url, params=params, timeout=10)
+                call["status"] = response.status_code
+
+            if response.status_code != 429:
+                return response
+
+            wait = retry_after_seconds(response)
+            print(f"Rate limited, waiting {wait:.0f}s before retrying...")
+            self.limiter.backoff(wait)
+
+        return response
+
+    #Remembers an error reply so it is not repeated
+    #Only a 404 says the ticker does not exist, a 400 can be a bad date or range for a real
+    #ticker, so it is remembered for the dates asked about and only for a short time
+    def remember_error(self, symbol, status_code, dates):
+        if status_code == 404:
+            self.negative_cache.put_invalid_symbol(symbol)
+        elif status_code == 400 and dates:
+            self.negative_cache.put_empty_dates(symbol, dates, self.negative_cache.recent_ttl)
+
+    #Retrieve daily data, from the cache when possible
+    def get_daily_data(self, symbol, date, priority=INTERACTIVE):
+
+        # Exchanges were closed that day, so there is no bar to ask for
+        if not self.calendar.is_trading_day(date):
+            return None
+
+        data = self.cache.get(symbol, date)
+        if data is not None:
+            return data
+
+        if self.negative_cache.is_empty(symbol, date):
+            return None
+
+        try:
+            return self.flights.do(
+                ('daily', symbol.upper(), date),
+                lambda: self.load_daily_data(symbol, date, priority)
+            )
+        except SingleFlightTimeout as e:
+            print(f"Request failed for {symbol} on {date}: {e}")
+            return None
+
+    #Fetches one bar and stores the answer in the right cache
+    def load_daily_data(self, symbol, date, priority=INTERACTIVE):
+
+        data = self.fetch_daily_data(symbol, date, priority)
+
+        # Request failures return None and are retried next time, a reply without a bar is remembered
+        if data is not None:
+            if data.get('open') is not None:
+                self.cache.put(symbol, date, data)
+            else:
+                self.negative_cache.put_empty(symbol, date)
+
+        return data
 
     #Retrieve daily data from API
-    def get_daily_data(self, symbol, date):
+    def fetch_daily_data(self, symbol, date, priority=INTERACTIVE):
 
-        url = f"{self.base_url}/{symbol}/{date}"
+        url = f"{self.base_url}/v1/open-close/{symbol}/{date}"
 
         parameters = {
             "apikey": self.api_key
         }
 
         try:
-            response = requests.get(url, params=parameters, timeout=10)
+            response = self.request(url, parameters, priority)
             response.raise_for_status
                 
             data = response.json()
 
             if data.get('status') == 'ERROR':
                 print(f"API Error: {data.get('error', 'Unknown error')}")
+                self.remember_error(symbol, response.status_code, [date])
                 return None
             
             return data
@@ -44,4 +138,266 @@ class StockMarketPipeline():
         
         except ValueError as e:
             print(f"Invalid JSON response: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    #Retrieve every daily bar between start and end (inclusive) with the aggregates endpoint
+    #Returns a DataFrame with one row per session, or None if the request failed
+    def get_range_data(self, symbol, start, end, priority=INTERACTIVE):
+
+        sessions = self.calendar.sessions_between(start, end)
+        if not sessions or self.negative_cache.is_invalid_symbol(symbol):
+            return self.bars_to_frame([])
+
+        cached = self.cached_range_data(symbol, sessions)
+        if cached is not None:
+            return cached
+
+        try:
+            df = self.flights.do(
+                ('range', symbol.upper(), str(start), str(end)),
+                lambda: self.load_range_data(symbol, start, end, sessions, priority)
+            )
+        except SingleFlightTimeout as e:
+            print(f"Request failed for {symbol} from {start} to {end}: {e}")
+            return None
+
+        # Every caller gets its own copy, the shared frame must not be modified
+        return None if df is None else df.copy()
+
+    #Builds the range from the caches when every session in it is already known, otherwise None
+    def cached_range_data(self, symbol, sessions):
+
+        start = sessions[0].strftime('%Y-%m-%d')
+        end = sessions[-1].strftime('%Y-%m-%d')
+
+        rows = self.cache.get_range(symbol, start, end)
+        known = {row['from'] for row in rows} | self.negative_cache.empty_dates(symbol, start, end)
+
+        if any(day.strftime('%Y-%m-%d') not in known for day in sessions):
+            return None
+
+        import pandas as pd
+
+        return self.bars_to_frame([
+            {
+                't': int(pd.Timestamp(row['from']).value // 10**6),
+                'o': row['open'],
+                'h': row['high'],
+                'l': row['low'],
+                'c': row['close'],
+                'v': row['volume']
+            }
+            for row in rows
+        ])
+
+    #Fetches a range of bars and stores the answer in the caches
+    def load_range_data(self, symbol, start, end, sessions, priority=INTERACTIVE):
+
+        url = f"{self.base_url}/v2/aggs/ticker/{symbol.upper()}/range/1/day/{start}/{end}"
+
+        parameters = {
+            "adjusted": "true",
+            "sort": "asc",
+            "limit": 50000,
+            "apiKey": self.api_key
+        }
+
+        bars = []
+
+        try:
+            while url:
+                response = self.request(url, parameters, priority)
+                data = response.json()
+
+                if data.get('status') == 'ERROR':
+                    print(f"API Error: {data.get('error', 'Unknown error')}")
+                    self.remember_error(symbol, response.status_code, [day.strftime('%Y-%m-%d') for day in sessions])
+                    return None
+
+                bars.extend(data.get('results', []))
+
+                # next_url already carries the cursor and the original query, it only needs the key
+                url = data.get('next_url')
+                parameters = {"apiKey": self.api_key}
+
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed for {symbol} from {start} to {end}: {e}")
+            return None
+
+        except ValueError as e:
+            print(f"Invalid JSON response: {e}")
+            return None
+
+        df = self.bars_to_frame(bars)
+
+        # Seed the single-day cache so later lookups of these dates skip the API
+        self.cache.put_many(symbol, {row['from']: row for row in self.frame_to_records(symbol, df)})
+
+        # Sessions the range skipped have no bar for this symbol
+        returned = set(df['date'].dt.date)
+        missing = [day.strftime('%Y-%m-%d') for day in sessions if day not in returned]
+        if missing:
+            self.negative_cache.put_empty_dates(symbol, missing)
+
+        return df
+
+    #Retrieve every minute bar (or multiplier-minute bar) between start and end (inclusive)
+    #Returns the aggregate results as the API sends them, or None if the request failed
+    def get_intraday_bars(self, symbol, start, end, multiplier=1, priority=BACKFILL):
+
+        if not self.calendar.sessions_between(start, end) or self.negative_cache.is_invalid_symbol(symbol):
+            return []
+
+        url = f"{self.base_url}/v2/aggs/ticker/{symbol.upper()}/range/{multiplier}/minute/{start}/{end}"
+
+        parameters = {
+            "adjusted": "true",
+            "sort": "asc",
+            "limit": 50000,
+            "apiKey": self.api_key
+        }
+
+        bars = []
+
+        try:
+            while url:
+                response = self.request(url, parameters, priority)
+                data = response.json()
+
+                if data.get('status') == 'ERROR':
+                    print(f"API Error: {data.get('error', 'Unknown error')}")
+                    # Empty dates are about daily bars, a rejected minute range is not remembered
+                    self.remember_error(symbol, response.status_code, [])
+                    return None
+
+                bars.extend(data.get('results', []))
+
+                url = data.get('next_url')
+                parameters = {"apiKey": self.api_key}
+
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed for {symbol} minutes from {start} to {end}: {e}")
+            return None
+
+        except ValueError as e:
+            print(f"Invalid JSON response: {e}")
+            return None
+
+        return bars
+
+    #Retrieve the daily bar of every US stock for one session in a single call
+    #Returns a DataFrame like bars_to_frame with a symbol column, or None if the request failed
+    def get_grouped_daily(self, date, priority=INTERACTIVE):
+
+        if not self.calendar.is_trading_day(date):
+            return None
+
+        try:
+            df = self.flights.do(
+                ('grouped', str(date)),
+                lambda: self.load_grouped_daily(date, priority)
+            )
+        except SingleFlightTimeout as e:
+            print(f"Request failed for the market on {date}: {e}")
+            return None
+
+        return None if df is None else df.copy()
+
+    #Fetches the whole market for one session and seeds the single-day cache with it
+    def load_grouped_daily(self, date, priority=INTERACTIVE):
+
+        url = f"{self.base_url}/v2/aggs/grouped/locale/us/market/stocks/{date}"
+
+        parameters = {
+            "adjusted": "true",
+            "apiKey": self.api_key
+        }
+
+        try:
+            response = self.request(url, parameters, priority)
+            data = response.json()
+
+            if data.get('status') == 'ERROR':
+                print(f"API Error: {data.get('error', 'Unknown error')}")
+                return None
+
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed for the market on {date}: {e}")
+            return None
+
+        except ValueError as e:
+            print(f"Invalid JSON response: {e}")
+            return None
+
+        import pandas as pd
+
+        bars = data.get('results') or []
+        df = self.bars_to_frame(bars)
+        df.insert(1, 'symbol', pd.Series([bar['T'] for bar in bars], dtype='object'))
+
+        # One call covers every symbol, so later single-ticker lookups of this date skip the API
+        self.cache.put_entries(
+            (row['symbol'], row['from'], row) for row in self.frame_to_records(None, df)
+        )
+
+        return df
+
+    #Converts aggregate results into columns with proper dtypes
+    def bars_to_frame(self, bars):
+        import pandas as pd
+
+        columns = {'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close', 'v': 'volume', 'vw': 'vwap', 'n': 'transactions'}
+
+        if not bars:
+            df = pd.DataFrame({name: pd.Series(dtype='float64') for name in columns.values()})
+            df.insert(0, 'date', pd.Series(dtype='datetime64[ns]'))
+            return df.astype({'volume': 'int64', 'transactions': 'int64'})
+
+        df = pd.DataFrame.from_records(bars).rename(columns=columns)
+
+        # Daily bars start at midnight New York time, which is still the same calendar day in UTC
+        df.insert(0, 'date', pd.to_datetime(df.pop('t'), unit='ms').dt.normalize())
+
+        # Bars rebuilt from the daily cache have no vwap or trade count
+        for name in columns.values():
+            if name not in df:
+                df[name] = float('nan') if name == 'vwap' else 0
+        df = df[['date'] + list(columns.values())]
+
+        return df.astype({
+            'open': 'float64',
+            'high': 'float64',
+            'low': 'float64',
+            'close': 'float64',
+            'volume': 'int64',
+            'vwap': 'float64',
+            'transactions': 'int64'
+        })
+
+    #Turns range rows into the same dict shape /v1/open-close returns
+    #With symbol None each row's symbol is read from the frame's symbol column
+    def frame_to_records(self, symbol, df):
+
+        symbols = df['symbol'].str.upper() if symbol is None else [symbol.upper()] * len(df)
+
+        records = []
+        for day, row_symbol, open_, high, low, close, volume in zip(
+            df['date'].dt.strftime('%Y-%m-%d'), symbols, df['open'], df['high'], df['low'], df['close'], df['volume']
+        ):
+            records.append({
+                'status': 'OK',
+                'from': day,
+                'symbol': row_symbol,
+                'open': float(open_),
+                'high': float(high),
+                'low': float(low),
+                'close': float(close),
+                'volume': int(volume)
+            })
+        return records
+
+    #Releases pooled connections and cache files, called when the server shuts down
+    def close(self):
+        self.session.close()
+        self.cache.close()
+        self.negative_cache.close()
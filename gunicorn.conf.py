@@ -0,0 +1,41 @@
+# Gunicorn settings for serving the dashboard in production: gunicorn wsgi:server
+# Every value can be overridden with an environment variable.
+
+import multiprocessing
+import os
+
+bind = os.getenv("web_bind", "0.0.0.0:8050")
+
+# Each worker is a separate process, threads let one worker serve several requests at once
+# while it waits on the API
+workers = int(os.getenv("web_workers", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("web_threads", 4))
+worker_class = "gthread"
+
+# Workers get this long to finish in-flight requests after SIGTERM before they are killed
+graceful_timeout = int(os.getenv("web_graceful_timeout", 30))
+
+# Long enough for a lookup that waits for the rate limiter
+timeout = int(os.getenv("web_timeout", 120))
+
+# Workers import the app themselves so each one opens its own SQLite connections
+preload_app = False
+
+
+def on_starting(server):
+    # Polygon allows one feed connection per API key and every worker would open its own, with
+    # its own ring buffers, so the live chart only runs with a single worker
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if os.getenv("stream_channel") and server.cfg.workers > 1:
+        raise RuntimeError(
+            f"stream_channel is set but gunicorn would start {server.cfg.workers} workers, each "
+            "opening its own feed connection. Set web_workers=1 or unset stream_channel."
+        )
+
+
+def worker_exit(server, worker):
+    # Runs in the worker process as it shuts down
+    import wsgi
+    wsgi.shutdown()
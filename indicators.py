@@ -0,0 +1,484 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file computes technical indicators (SMA, EMA, RSI, Bollinger bands, VWAP) over daily bars.
+
+A full series is computed with NumPy in one pass. Each indicator then keeps the small
+state it needs (a running window sum, the last smoothed value), so updating it with the next
+session costs O(1) instead of recomputing the whole window. IndicatorEngine remembers the
+results per (ticker, indicator, params) and only feeds it the sessions it has not seen yet.
+A call still hands back a DataFrame over the whole requested range. It shares the
+remembered arrays instead of copying them, but building it has a fixed pandas overhead, so
+a call that adds one session takes a few tenths of a millisecond, about the same for 5,000
+sessions as for 50,000.
+
+The last remembered session is checked against the bar it was computed from. A bar that
+was still forming when it was first seen, or that was corrected upstream, makes the series
+be computed again instead of keeping the values of the old bar.
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+
+#Sums of the last window values, kept up to date one value at a time
+class RollingWindow():
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.squares = 0.0
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            oldest = self.values[0]
+            self.total -= oldest
+            self.squares -= oldest * oldest
+        self.values.append(value)
+        self.total += value
+        self.squares += value * value
+
+    def full(self):
+        return len(self.values) == self.window
+
+    def mean(self):
+        return self.total / self.window
+
+    # Population standard deviation, as used for Bollinger bands
+    def std(self):
+        mean = self.mean()
+        return np.sqrt(max(self.squares / self.window - mean * mean, 0.0))
+
+    # Restarts from the last values of a series, so a recomputed indicator can keep going
+    def reset(self, values):
+        self.values.clear()
+        self.total = 0.0
+        self.squares = 0.0
+        for value in values[-self.window:]:
+            self.push(float(value))
+
+
+#Mean of every window of a series, NaN until the first window is full
+def rolling_mean(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return out
+
+    sums = np.cumsum(np.insert(values, 0, 0.0))
+    out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+#Population standard deviation of every window, from the running sums of values and squares
+def rolling_std(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    mean = rolling_mean(values, window)
+    mean_of_squares = rolling_mean(values * values, window)
+    return np.sqrt(np.clip(mean_of_squares - mean * mean, 0.0, None))
+
+
+#Exponential smoothing seeded with the mean of the first period values
+#alpha is 2 / (span + 1) for an EMA and 1 / period for Wilder's smoothing (RSI)
+def smoothed(values, alpha, period):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) < period:
+        return out
+
+    # The recursion runs in pandas' compiled ewm, seeded by replacing the first point with the mean
+    seeded = values[period - 1:].copy()
+    seeded[0] = values[:period].mean()
+    out[period - 1:] = pd.Series(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return out
+
+
+#Base class, compute() runs over a whole DataFrame of bars and update() adds one bar
+class Indicator():
+    name = None
+    columns = ()
+    # Bar columns compute() and update() read
+    inputs = ('close',)
+
+    def params(self):
+        return ()
+
+    def key(self):
+        return (self.name,) + tuple(self.params())
+
+    def compute(self, df):
+        raise NotImplementedError
+
+    def update(self, bar):
+        raise NotImplementedError
+
+
+class SMA(Indicator):
+    name = "sma"
+
+    def __init__(self, window=20):
+        self.window = window
+        self.columns = (f"sma_{window}",)
+        self.state = RollingWindow(window)
+
+    def params(self):
+        return (self.window,)
+
+    def compute(self, df):
+        close = df['close'].to_numpy(dtype=np.float64)
+        self.state.reset(close)
+        return {self.columns[0]: rolling_mean(close, self.window)}
+
+    def update(self, bar):
+        self.state.push(float(bar['close']))
+        return {self.columns[0]: self.state.mean() if self.state.full() else np.nan}
+
+
+class EMA(Indicator):
+    name = "ema"
+
+    def __init__(self, span=20):
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self.columns = (f"ema_{span}",)
+
+        # The seed window is only needed until the first value exists
+        self.seed = RollingWindow(span)
+        self.last = np.nan
+
+    def params(self):
+        return (self.span,)
+
+    def compute(self, df):
+        close = df['close'].to_numpy(dtype=np.float64)
+        values = smoothed(close, self.alpha, self.span)
+        self.seed.reset(close)
+        self.last = values[-1] if len(values) else np.nan
+        return {self.columns[0]: values}
+
+    def update(self, bar):
+        close = float(bar['close'])
+        if np.isnan(self.last):
+            self.seed.push(close)
+            if self.seed.full():
+                self.last = self.seed.mean()
+        else:
+            self.last += self.alpha * (close - self.last)
+        return {self.columns[0]: self.last}
+
+
+#Wilder's relative strength index, 0 to 100
+class RSI(Indicator):
+    name = "rsi"
+
+    def __init__(self, period=14):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.columns = (f"rsi_{period}",)
+
+        self.previous_close = np.nan
+        self.gains = RollingWindow(period)
+        self.losses = RollingWindow(period)
+        self.average_gain = np.nan
+        self.average_loss = np.nan
+
+    def params(self):
+        return (self.period,)
+
+    def value(self, average_gain, average_loss):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+        # No losses in the window means the RSI is at its maximum
+        return np.where(average_loss == 0, 100.0, rsi)
+
+    def compute(self, df):
+        close = df['close'].to_numpy(dtype=np.float64)
+        out = np.full(len(close), np.nan)
+        if len(close) < 2:
+            self.previous_close = close[-1] if len(close) else np.nan
+            self.gains.reset(close[:0])
+            self.losses.reset(close[:0])
+            return {self.columns[0]: out}
+
+        change = np.diff(close)
+        gains = np.clip(change, 0.0, None)
+        losses = np.clip(-change, 0.0, None)
+
+        average_gain = smoothed(gains, self.alpha, self.period)
+        average_loss = smoothed(losses, self.alpha, self.period)
+        out[1:] = np.where(np.isnan(average_gain), np.nan, self.value(average_gain, average_loss))
+
+        self.previous_close = close[-1]
+        self.gains.reset(gains)
+        self.losses.reset(losses)
+        self.average_gain = average_gain[-1]
+        self.average_loss = average_loss[-1]
+        return {self.columns[0]: out}
+
+    def update(self, bar):
+        close = float(bar['close'])
+        previous, self.previous_close = self.previous_close, close
+        if np.isnan(previous):
+            return {self.columns[0]: np.nan}
+
+        gain = max(close - previous, 0.0)
+        loss = max(previous - close, 0.0)
+
+        if np.isnan(self.average_gain):
+            self.gains.push(gain)
+            self.losses.push(loss)
+            if not self.gains.full():
+                return {self.columns[0]: np.nan}
+            self.average_gain = self.gains.mean()
+            self.average_loss = self.losses.mean()
+        else:
+            self.average_gain += self.alpha * (gain - self.average_gain)
+            self.average_loss += self.alpha * (loss - self.average_loss)
+
+        return {self.columns[0]: float(self.value(self.average_gain, self.average_loss))}
+
+
+#Moving average with bands width standard deviations above and below it
+class Bollinger(Indicator):
+    name = "bollinger"
+
+    def __init__(self, window=20, width=2.0):
+        self.window = window
+        self.width = width
+        self.columns = (f"bb_mid_{window}", f"bb_upper_{window}", f"bb_lower_{window}")
+        self.state = RollingWindow(window)
+
+    def params(self):
+        return (self.window, self.width)
+
+    def bands(self, mid, std):
+        return {
+            self.columns[0]: mid,
+            self.columns[1]: mid + self.width * std,
+            self.columns[2]: mid - self.width * std,
+        }
+
+    def compute(self, df):
+        close = df['close'].to_numpy(dtype=np.float64)
+        self.state.reset(close)
+        return self.bands(rolling_mean(close, self.window), rolling_std(close, self.window))
+
+    def update(self, bar):
+        self.state.push(float(bar['close']))
+        if not self.state.full():
+            return self.bands(np.nan, np.nan)
+        return self.bands(self.state.mean(), self.state.std())
+
+
+#Volume-weighted average price over the last window sessions
+#Each bar's own VWAP is used when Polygon sent one, otherwise its typical price
+class VWAP(Indicator):
+    name = "vwap"
+    inputs = ('high', 'low', 'close', 'volume', 'vwap')
+
+    def __init__(self, window=20):
+        self.window = window
+        self.columns = (f"vwap_{window}",)
+        self.traded = RollingWindow(window)
+        self.volume = RollingWindow(window)
+
+    def params(self):
+        return (self.window,)
+
+    def prices(self, high, low, close, vwap):
+        typical = (high + low + close) / 3.0
+        return np.where(np.isnan(vwap), typical, vwap)
+
+    def compute(self, df):
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        close = df['close'].to_numpy(dtype=np.float64)
+        vwap = df['vwap'].to_numpy(dtype=np.float64) if 'vwap' in df else np.full(len(df), np.nan)
+        volume = df['volume'].to_numpy(dtype=np.float64)
+
+        traded = self.prices(high, low, close, vwap) * volume
+        self.traded.reset(traded)
+        self.volume.reset(volume)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = rolling_mean(traded, self.window) / rolling_mean(volume, self.window)
+        return {self.columns[0]: values}
+
+    def update(self, bar):
+        vwap = bar.get('vwap', np.nan)
+        price = float(self.prices(
+            float(bar['high']), float(bar['low']), float(bar['close']),
+            np.nan if vwap is None else float(vwap)
+        ))
+        volume = float(bar['volume'])
+
+        self.traded.push(price * volume)
+        self.volume.push(volume)
+        if not self.volume.full() or self.volume.total == 0:
+            return {self.columns[0]: np.nan}
+        return {self.columns[0]: self.traded.total / self.volume.total}
+
+
+INDICATORS = {
+    indicator.name: indicator for indicator in (SMA, EMA, RSI, Bollinger, VWAP)
+}
+
+
+#Builds an indicator from its name and parameters, e.g. make_indicator("sma", 50)
+def make_indicator(name, *params):
+    if name not in INDICATORS:
+        raise ValueError(f"Unknown indicator {name}")
+    return INDICATORS[name](*params)
+
+
+#Columns that grow at the end, stored in NumPy arrays that double in size when they fill up
+class GrowingColumns():
+    def __init__(self, columns):
+        self.length = len(columns['date'])
+        capacity = max(self.length, 16)
+        self.arrays = {}
+        for name, values in columns.items():
+            array = np.empty(capacity, dtype=np.asarray(values).dtype)
+            array[:self.length] = values
+            self.arrays[name] = array
+
+    def append(self, row):
+        if self.length == len(self.arrays['date']):
+            for name, array in self.arrays.items():
+                grown = np.empty(2 * len(array), dtype=array.dtype)
+                grown[:self.length] = array[:self.length]
+                self.arrays[name] = grown
+
+        for name, value in row.items():
+            self.arrays[name][self.length] = value
+        self.length += 1
+
+    def __getitem__(self, name):
+        return self.arrays[name][:self.length]
+
+
+#Values an indicator reads from the bar at position, inputs maps each column to its array
+def bar_inputs(inputs, position):
+    return {column: array[position] for column, array in inputs.items()}
+
+
+#True when two bars have the same values, missing values count as equal
+def same_bar(remembered, current):
+    for column in remembered.keys() | current.keys():
+        a, b = remembered.get(column), current.get(column)
+        if a != b and not (pd.isna(a) and pd.isna(b)):
+            return False
+    return True
+
+
+#Remembers computed indicators per (ticker, indicator, params)
+#A series that only gained new sessions since the last call is extended bar by bar
+class IndicatorEngine():
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "appends": 0, "computes": 0}
+
+    # Values of one indicator for the bars in df (sorted by date), as a DataFrame with a date column
+    def compute(self, ticker, name, df, *params):
+        indicator = make_indicator(name, *params)
+        if df.empty:
+            return pd.DataFrame({column: pd.Series(dtype='float64') for column in ('date',) + indicator.columns})
+
+        key = (ticker.upper(),) + indicator.key()
+
+        # A view of the column when it already holds datetimes, converting a long series on
+        # every call would cost more than the update itself
+        dates = df['date'].to_numpy()
+        if not np.issubdtype(dates.dtype, np.datetime64):
+            dates = dates.astype('datetime64[ns]')
+        inputs = {column: df[column].to_numpy() for column in indicator.inputs if column in df}
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                entry = self.extend(entry, dates, inputs)
+
+            if entry is None:
+                entry = self.build(indicator, df, dates, inputs)
+                self.entries[key] = entry
+                self.counters["computes"] += 1
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+            return self.select(entry, dates)
+
+    # Computes the whole series in one vectorized pass
+    # Caller must hold self.lock
+    def build(self, indicator, df, dates, inputs):
+        columns = {'date': dates.astype('datetime64[ns]')}
+        columns.update(indicator.compute(df))
+        return {"indicator": indicator, "values": GrowingColumns(columns), "last_bar": bar_inputs(inputs, -1)}
+
+    # Serves df from a remembered series, updating it with the sessions that come after it
+    # Returns None when the remembered series cannot be reused and has to be recomputed
+    # Caller must hold self.lock
+    def extend(self, entry, dates, inputs):
+        values = entry["values"]
+        known = values['date']
+        if dates[0] < known[0]:
+            return None
+
+        # In the unit of dates, so the search does not convert the whole column to nanoseconds
+        known_last = known[-1].astype(dates.dtype)
+
+        # The last remembered session has to come from the same bar as before
+        last = int(np.searchsorted(dates, known_last, side='left'))
+        if last < len(dates) and dates[last] == known_last and not same_bar(entry["last_bar"], bar_inputs(inputs, last)):
+            return None
+
+        if dates[-1] <= known[-1]:
+            self.counters["hits"] += 1
+            return entry
+
+        # New sessions may only follow the remembered ones, anything else changes the history
+        position = int(np.searchsorted(dates, known_last, side='right'))
+        if position == 0 or dates[position - 1] != known_last:
+            return None
+
+        # Plain arrays of the new rows, pandas row access costs more than the updates themselves
+        indicator = entry["indicator"]
+        new_rows = {column: array[position:] for column, array in inputs.items()}
+
+        for offset, bar_date in enumerate(dates[position:]):
+            row = indicator.update({column: array[offset] for column, array in new_rows.items()})
+            row['date'] = bar_date
+            values.append(row)
+
+        entry["last_bar"] = bar_inputs(inputs, -1)
+        self.counters["appends"] += 1
+        return entry
+
+    # The part of a remembered series that covers dates
+    def select(self, entry, dates):
+        values = entry["values"]
+        known = values['date']
+        start = np.searchsorted(known, dates[0].astype(known.dtype), side='left')
+        end = np.searchsorted(known, dates[-1].astype(known.dtype), side='right')
+
+        # Remembered rows never change once written, so the result can share their memory
+        return pd.DataFrame({name: values[name][start:end] for name in values.arrays}, copy=False)
+
+    def clear(self, ticker=None):
+        with self.lock:
+            if ticker is None:
+                self.entries.clear()
+            else:
+                for key in [key for key in self.entries if key[0] == ticker.upper()]:
+                    del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self.entries)
+        return stats
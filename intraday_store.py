@@ -0,0 +1,597 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file keeps 1-minute and 5-minute bars in compressed blocks, one set of files per ticker.
+
+Prices are stored as whole ten-thousandths and timestamps as seconds. Within a block each bar
+is kept as its difference from the one before: the gap to the previous bar, the open against
+the previous close, the close against the open, and the high and low against the body. Those
+differences are small numbers, so they are zigzag coded (signs folded into the low bit) and
+written as variable-length integers, a few bytes per bar before zstd. BLOCK_ROWS bars make a
+block and every block is compressed on its own.
+
+Each ticker has three files under intraday_store/<timespan>/:
+    TICKER.bars   full blocks, only ever appended to
+    TICKER.index  first and last time, position and checksum of every block
+    TICKER.tail   the newest bars that do not fill a block yet
+
+A range query looks up the first and last block that can hold it in the index with a binary
+search and reads only those, so a day of minutes is one or two blocks however many years are
+stored. New blocks are written to the end of .bars before the index is swapped to include
+them, and the tail is swapped last, so a reader that reads the tail before the index never
+misses bars (at worst it sees some twice and drops the copy). Bars written out of order
+rewrite the whole ticker, after which a reader holding the old index fails a checksum and
+reads the index again.
+
+Minute bars come to about 8 bytes each, so ten years of the regular session for 10,000
+tickers (about 10 billion bars) is under 100 GB. benchmark.py intraday measures it.
+"""
+
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as clock, timedelta, timezone
+
+import numpy as np
+import pyarrow as pa
+
+from trading_calendar import MARKET_TIMEZONE, get_trading_calendar
+
+FORMAT = 1
+
+# Bar length in minutes of each timespan kept
+TIMESPANS = {'1m': 1, '5m': 5}
+
+# Prices are kept as integers of 1/PRICE_SCALE dollars
+PRICE_SCALE = 10000
+
+# Bars per block, about four sessions of minutes
+BLOCK_ROWS = 1024
+
+COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume', 'vwap', 'transactions']
+
+# One row per block, sorted by time
+INDEX_DTYPE = np.dtype([
+    ('first_t', '<i8'), ('last_t', '<i8'), ('offset', '<i8'),
+    ('length', '<i4'), ('raw_length', '<i4'), ('rows', '<i4'), ('crc', '<u4'),
+])
+INDEX_HEADER = struct.Struct('<4sI')
+# rows, time of the first bar, open of the first bar
+BLOCK_HEADER = struct.Struct('<Iqq')
+# raw length and checksum of the compressed tail block
+TAIL_HEADER = struct.Struct('<II')
+
+
+#Signed integers folded into unsigned ones, small magnitudes stay small
+def zigzag(values):
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def unzigzag(values):
+    values = values.astype(np.uint64)
+    return ((values >> np.uint64(1)).view(np.int64)) ^ -((values & np.uint64(1)).view(np.int64))
+
+
+#Unsigned integers as LEB128 bytes: seven bits per byte, the high bit set on every byte but the last
+def varint_encode(values):
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return b''
+
+    shifts = np.arange(10, dtype=np.uint64) * np.uint64(7)
+    groups = ((values[:, None] >> shifts) & np.uint64(0x7f)).astype(np.uint8)
+
+    # Bytes each value needs, at least one even for zero
+    bits = np.zeros(len(values), dtype=np.int64)
+    remaining = values.copy()
+    while remaining.any():
+        bits += remaining > 0
+        remaining >>= np.uint64(7)
+    sizes = np.maximum(bits, 1)
+
+    used = np.arange(10) < sizes[:, None]
+    groups[np.arange(10) < sizes[:, None] - 1] |= 0x80
+    return groups[used].tobytes()
+
+
+def varint_decode(data, count):
+    data = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) != count:
+        raise ValueError(f"Expected {count} integers, found {len(ends)}")
+    if not count:
+        return np.zeros(0, dtype=np.uint64)
+
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7f).astype(np.uint64) << (position.astype(np.uint64) * np.uint64(7))
+    return np.add.reduceat(parts, starts)
+
+
+#Bars in one block as uncompressed bytes, arrays is a dict of equal-length columns sorted by t
+def encode_block(arrays):
+    t = arrays['t']
+    open_, high, low, close = (arrays[name] for name in ('open', 'high', 'low', 'close'))
+    previous_close = np.concatenate([[open_[0]], close[:-1]])
+    body_top = np.maximum(open_, close)
+    body_bottom = np.minimum(open_, close)
+
+    # vwap is kept against the close, 0 marks a bar without one
+    vwap = zigzag(arrays['vwap'] - close) + np.uint64(1)
+    vwap[arrays['vwap_missing']] = 0
+
+    columns = [
+        zigzag(np.diff(t, prepend=t[0])),
+        zigzag(open_ - previous_close),
+        zigzag(high - body_top),
+        zigzag(body_bottom - low),
+        zigzag(close - open_),
+        zigzag(arrays['volume']),
+        vwap,
+        zigzag(arrays['transactions']),
+    ]
+    header = BLOCK_HEADER.pack(len(t), int(t[0]), int(open_[0]))
+    return header + varint_encode(np.concatenate(columns))
+
+
+def decode_block(raw):
+    rows, first_t, first_open = BLOCK_HEADER.unpack_from(raw)
+    values = varint_decode(raw[BLOCK_HEADER.size:], rows * 8).reshape(8, rows)
+    dt, open_delta, high_delta, low_delta, body, volume, vwap, transactions = (
+        unzigzag(column) if i != 6 else column for i, column in enumerate(values)
+    )
+
+    # Every close is the first open plus all the moves since, the open is the close less its body
+    close = first_open + np.cumsum(open_delta + body)
+    open_ = close - body
+    missing = vwap == 0
+    return {
+        't': first_t + np.cumsum(dt),
+        'open': open_,
+        'high': np.maximum(open_, close) + high_delta,
+        'low': np.minimum(open_, close) - low_delta,
+        'close': close,
+        'volume': volume,
+        'vwap': close + unzigzag(np.where(missing, np.uint64(1), vwap) - np.uint64(1)),
+        'vwap_missing': missing,
+        'transactions': transactions,
+    }
+
+
+def compress(raw):
+    return pa.compress(raw, codec='zstd', asbytes=True)
+
+
+def decompress(data, raw_length):
+    return pa.decompress(data, decompressed_size=raw_length, codec='zstd', asbytes=True)
+
+
+def empty_arrays():
+    arrays = {name: np.zeros(0, dtype=np.int64) for name in ('t', 'open', 'high', 'low', 'close', 'volume', 'vwap', 'transactions')}
+    arrays['vwap_missing'] = np.zeros(0, dtype=bool)
+    return arrays
+
+
+def take(arrays, rows):
+    return {name: values[rows] for name, values in arrays.items()}
+
+
+def concat(parts):
+    parts = [part for part in parts if len(part['t'])]
+    if not parts:
+        return empty_arrays()
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+#Sorted by time with one bar per time, the last one given wins
+def deduplicate(arrays):
+    t = arrays['t']
+    order = np.argsort(t, kind='stable')
+    sorted_t = t[order]
+    last = np.append(sorted_t[1:] != sorted_t[:-1], True)
+    return take(arrays, order[last])
+
+
+#Integer columns from aggregate results as the API returns them ({'t': ms, 'o': ..., 'vw': ...})
+def results_to_arrays(results):
+    if not results:
+        return empty_arrays()
+
+    def column(key, default=np.nan):
+        return np.array([bar.get(key, default) for bar in results], dtype=np.float64)
+
+    vwap = column('vw')
+    return {
+        't': np.array([bar['t'] for bar in results], dtype=np.int64) // 1000,
+        'open': np.round(column('o') * PRICE_SCALE).astype(np.int64),
+        'high': np.round(column('h') * PRICE_SCALE).astype(np.int64),
+        'low': np.round(column('l') * PRICE_SCALE).astype(np.int64),
+        'close': np.round(column('c') * PRICE_SCALE).astype(np.int64),
+        'volume': np.round(column('v', 0)).astype(np.int64),
+        'vwap': np.round(np.nan_to_num(vwap) * PRICE_SCALE).astype(np.int64),
+        'vwap_missing': np.isnan(vwap),
+        'transactions': column('n', 0).astype(np.int64),
+    }
+
+
+#Integer columns from a DataFrame with the COLUMNS of read()
+def frame_to_arrays(df):
+    import pandas as pd
+
+    if df.empty:
+        return empty_arrays()
+
+    times = pd.to_datetime(df['time'])
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+
+    def prices(name):
+        return np.round(df[name].to_numpy(dtype=np.float64) * PRICE_SCALE).astype(np.int64)
+
+    vwap = df['vwap'].to_numpy(dtype=np.float64) if 'vwap' in df else np.full(len(df), np.nan)
+    return {
+        't': times.to_numpy(dtype='datetime64[s]').astype(np.int64),
+        'open': prices('open'),
+        'high': prices('high'),
+        'low': prices('low'),
+        'close': prices('close'),
+        'volume': np.round(df['volume'].to_numpy(dtype=np.float64)).astype(np.int64),
+        'vwap': np.round(np.nan_to_num(vwap) * PRICE_SCALE).astype(np.int64),
+        'vwap_missing': np.isnan(vwap),
+        'transactions': df['transactions'].to_numpy(dtype=np.int64) if 'transactions' in df else np.zeros(len(df), dtype=np.int64),
+    }
+
+
+#Seconds since the epoch for a query bound
+# A date (or 'YYYY-MM-DD') is a New York trading day, the end bound covers the whole of it
+# A datetime without a timezone is taken as UTC, like the times read() returns
+def to_seconds(value, end=False):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value) if len(value) > 10 else date.fromisoformat(value)
+
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+
+    if hasattr(value, 'to_pydatetime'):
+        return to_seconds(value.to_pydatetime(), end)
+
+    day = datetime.combine(value, clock(0), MARKET_TIMEZONE)
+    if end:
+        return int((day + timedelta(days=1)).timestamp()) - 1
+    return int(day.timestamp())
+
+
+#Stamp of a file to notice when it is replaced, None if it does not exist
+def stamp_of(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+#Writes bytes so readers only ever see the old or the new file
+def write_atomic(path, data):
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+#Class that stores intraday bars in compressed blocks with a block index per ticker
+class IntradayStore():
+    def __init__(self, root=None):
+        self.root = root or os.getenv("intraday_store_path", "intraday_store")
+        for timespan in TIMESPANS:
+            os.makedirs(os.path.join(self.root, timespan), exist_ok=True)
+
+        # (timespan, ticker) -> (stamp, index rows), so a repeated query does not parse the index again
+        self.indexes = {}
+        # One writer per ticker at a time within the process
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def path(self, ticker, timespan, kind):
+        if timespan not in TIMESPANS:
+            raise ValueError(f"Unknown timespan {timespan}, expected one of {', '.join(TIMESPANS)}")
+        return os.path.join(self.root, timespan, f"{ticker.upper()}.{kind}")
+
+    def writer_lock(self, ticker, timespan):
+        with self.lock:
+            return self.locks.setdefault((timespan, ticker.upper()), threading.Lock())
+
+    def load_index(self, ticker, timespan, cached=True):
+        path = self.path(ticker, timespan, 'index')
+        key = (timespan, ticker.upper())
+        stamp = stamp_of(path)
+        if stamp is None:
+            return np.zeros(0, dtype=INDEX_DTYPE)
+
+        found = self.indexes.get(key)
+        if cached and found is not None and found[0] == stamp:
+            return found[1]
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version = INDEX_HEADER.unpack_from(data)
+        if magic != b'IBAR' or version != FORMAT:
+            raise ValueError(f"Unsupported intraday index {path}")
+
+        index = np.frombuffer(data, dtype=INDEX_DTYPE, offset=INDEX_HEADER.size)
+        self.indexes[key] = (stamp, index)
+        return index
+
+    def write_index(self, ticker, timespan, index):
+        path = self.path(ticker, timespan, 'index')
+        write_atomic(path, INDEX_HEADER.pack(b'IBAR', FORMAT) + index.tobytes())
+
+    def read_tail(self, ticker, timespan):
+        try:
+            with open(self.path(ticker, timespan, 'tail'), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return empty_arrays()
+        if not data:
+            return empty_arrays()
+
+        raw_length, crc = TAIL_HEADER.unpack_from(data)
+        payload = data[TAIL_HEADER.size:]
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"Corrupt tail for {ticker} {timespan}")
+        return decode_block(decompress(payload, raw_length))
+
+    def write_tail(self, ticker, timespan, arrays):
+        if not len(arrays['t']):
+            write_atomic(self.path(ticker, timespan, 'tail'), b'')
+            return
+        raw = encode_block(arrays)
+        payload = compress(raw)
+        write_atomic(self.path(ticker, timespan, 'tail'), TAIL_HEADER.pack(len(raw), zlib.crc32(payload)) + payload)
+
+    # Compressed blocks of BLOCK_ROWS bars and the index rows describing them, offsets from offset
+    def make_blocks(self, arrays, offset):
+        blocks, rows = [], []
+        for first in range(0, len(arrays['t']), BLOCK_ROWS):
+            block = take(arrays, slice(first, first + BLOCK_ROWS))
+            raw = encode_block(block)
+            payload = compress(raw)
+            rows.append((block['t'][0], block['t'][-1], offset, len(payload), len(raw), len(block['t']), zlib.crc32(payload)))
+            blocks.append(payload)
+            offset += len(payload)
+        return blocks, np.array(rows, dtype=INDEX_DTYPE)
+
+    # Adds bars for one ticker, returns how many were given
+    # Bars after the last stored one are appended, anything else rewrites the ticker's files
+    def write_arrays(self, ticker, arrays, timespan='1m'):
+        if not len(arrays['t']):
+            return 0
+        arrays = deduplicate(arrays)
+
+        with self.writer_lock(ticker, timespan):
+            index = self.load_index(ticker, timespan, cached=False)
+            tail = self.read_tail(ticker, timespan)
+            last_t = tail['t'][-1] if len(tail['t']) else (index['last_t'][-1] if len(index) else None)
+
+            if last_t is not None and arrays['t'][0] <= last_t:
+                everything = concat([self.read_blocks(ticker, timespan, index, 0, len(index)), tail, arrays])
+                self.rewrite(ticker, timespan, deduplicate(everything))
+                return len(arrays['t'])
+
+            pending = concat([tail, arrays])
+            full = len(pending['t']) // BLOCK_ROWS * BLOCK_ROWS
+
+            if full:
+                bars_path = self.path(ticker, timespan, 'bars')
+                offset = int(index['offset'][-1] + index['length'][-1]) if len(index) else 0
+                blocks, rows = self.make_blocks(take(pending, slice(0, full)), offset)
+
+                # A crash after a previous append can leave bytes the index does not point to
+                with open(bars_path, 'ab') as f:
+                    f.truncate(offset)
+                    f.seek(offset)
+                    f.write(b''.join(blocks))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.write_index(ticker, timespan, np.concatenate([index, rows]))
+
+            self.write_tail(ticker, timespan, take(pending, slice(full, None)))
+        return len(arrays['t'])
+
+    # Replaces every file of a ticker with the bars given
+    def rewrite(self, ticker, timespan, arrays):
+        full = len(arrays['t']) // BLOCK_ROWS * BLOCK_ROWS
+        blocks, rows = self.make_blocks(take(arrays, slice(0, full)), 0)
+        write_atomic(self.path(ticker, timespan, 'bars'), b''.join(blocks))
+        self.write_index(ticker, timespan, rows if len(rows) else np.zeros(0, dtype=INDEX_DTYPE))
+        self.write_tail(ticker, timespan, take(arrays, slice(full, None)))
+
+    # Bars of a DataFrame with the COLUMNS of read()
+    def write(self, ticker, df, timespan='1m'):
+        return self.write_arrays(ticker, frame_to_arrays(df), timespan)
+
+    # Bars as the aggregates endpoint returns them
+    def write_results(self, ticker, results, timespan='1m'):
+        return self.write_arrays(ticker, results_to_arrays(results), timespan)
+
+    # Decoded bars of blocks first..last-1 of index, in a single read of the .bars file
+    def read_blocks(self, ticker, timespan, index, first, last):
+        if first >= last:
+            return empty_arrays()
+
+        start = int(index['offset'][first])
+        end = int(index['offset'][last - 1] + index['length'][last - 1])
+        with open(self.path(ticker, timespan, 'bars'), 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+
+        parts = []
+        for row in index[first:last]:
+            payload = data[row['offset'] - start:row['offset'] - start + row['length']]
+            if zlib.crc32(payload) != row['crc']:
+                raise ValueError(f"Corrupt block at {row['offset']} for {ticker} {timespan}")
+            parts.append(decode_block(decompress(payload, int(row['raw_length']))))
+        return concat(parts)
+
+    # Integer columns of one ticker's bars between start and end (both inclusive), with the blocks read
+    def read_arrays(self, ticker, start=None, end=None, timespan='1m'):
+        low = to_seconds(start) if start is not None else np.iinfo(np.int64).min
+        high = to_seconds(end, end=True) if end is not None else np.iinfo(np.int64).max
+
+        for attempt in range(3):
+            try:
+                # The tail is read before the index, see the module docstring
+                tail = self.read_tail(ticker, timespan)
+                index = self.load_index(ticker, timespan, cached=attempt == 0)
+
+                # Blocks are sorted and do not overlap, so the range is a contiguous run of them
+                first = int(np.searchsorted(index['last_t'], low, side='left'))
+                last = int(np.searchsorted(index['first_t'], high, side='right'))
+                blocks = self.read_blocks(ticker, timespan, index, first, last)
+                break
+            except (ValueError, OSError):
+                # The ticker was rewritten between reading the index and the blocks
+                if attempt == 2:
+                    raise
+
+        arrays = concat([blocks, tail])
+        if len(tail['t']) and len(blocks['t']) and tail['t'][0] <= blocks['t'][-1]:
+            arrays = deduplicate(arrays)
+
+        keep = (arrays['t'] >= low) & (arrays['t'] <= high)
+        return take(arrays, keep), max(last - first, 0)
+
+    # Bars for one ticker between start and end (both optional and inclusive), oldest first
+    # time is the start of the bar in UTC without a timezone
+    def read(self, ticker, start=None, end=None, timespan='1m', columns=None):
+        import pandas as pd
+
+        columns = list(columns or COLUMNS)
+        unknown = [name for name in columns if name not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {unknown}")
+        if 'time' not in columns:
+            columns = ['time'] + columns
+
+        arrays, _ = self.read_arrays(ticker, start, end, timespan)
+        values = {
+            'time': arrays['t'].astype('datetime64[s]').astype('datetime64[ns]'),
+            'volume': arrays['volume'],
+            'transactions': arrays['transactions'],
+            'vwap': np.where(arrays['vwap_missing'], np.nan, arrays['vwap'] / PRICE_SCALE),
+        }
+        for name in ('open', 'high', 'low', 'close'):
+            values[name] = arrays[name] / PRICE_SCALE
+
+        return pd.DataFrame({name: values[name] for name in columns})
+
+    def tickers(self, timespan='1m'):
+        # A ticker with fewer bars than a block only has a tail
+        directory = os.path.join(self.root, timespan)
+        return sorted({
+            os.path.splitext(name)[0] for name in os.listdir(directory)
+            if name.endswith(('.index', '.tail'))
+        })
+
+    # Time of the last bar stored for a ticker, None if there is none
+    def last_time(self, ticker, timespan='1m'):
+        tail = self.read_tail(ticker, timespan)
+        if len(tail['t']):
+            return int(tail['t'][-1])
+        index = self.load_index(ticker, timespan)
+        return int(index['last_t'][-1]) if len(index) else None
+
+    def delete(self, ticker, timespan=None):
+        for name in [timespan] if timespan else TIMESPANS:
+            for kind in ('index', 'tail', 'bars'):
+                try:
+                    os.remove(self.path(ticker, name, kind))
+                except FileNotFoundError:
+                    pass
+            self.indexes.pop((name, ticker.upper()), None)
+
+    # Bars, blocks and bytes on disk for every timespan
+    def stats(self):
+        stats = {}
+        for timespan in TIMESPANS:
+            directory = os.path.join(self.root, timespan)
+            bars = blocks = size = 0
+            tickers = self.tickers(timespan)
+            for ticker in tickers:
+                index = self.load_index(ticker, timespan)
+                blocks += len(index)
+                bars += int(index['rows'].sum()) + len(self.read_tail(ticker, timespan)['t'])
+            for name in os.listdir(directory):
+                size += os.path.getsize(os.path.join(directory, name))
+            stats[timespan] = {
+                "tickers": len(tickers),
+                "bars": bars,
+                "blocks": blocks,
+                "bytes": size,
+                "bytes_per_bar": size / bars if bars else 0.0,
+            }
+        return stats
+
+    # Loads intraday bars from the API for many tickers between start and end (both inclusive)
+    # Each ticker is requested chunk_days at a time and written chunk by chunk, and a rerun
+    # starts after the last bar already stored
+    def backfill(self, pipeline, tickers, start, end, timespan='1m', chunk_days=30, max_workers=None):
+        from rate_limiter import BACKFILL
+
+        calendar = get_trading_calendar()
+        start, end = to_seconds(start), to_seconds(end, end=True)
+
+        def load(ticker):
+            # The day of the last stored bar is asked for again in case it was cut short
+            last = self.last_time(ticker, timespan)
+            after = max(start, last + 1 if last is not None else start)
+            first_day = datetime.fromtimestamp(after, MARKET_TIMEZONE).date()
+            last_day = datetime.fromtimestamp(end, MARKET_TIMEZONE).date()
+
+            written = 0
+            chunk_start = first_day
+            while chunk_start <= last_day:
+                chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), last_day)
+                if calendar.sessions_between(chunk_start, chunk_end):
+                    results = pipeline.get_intraday_bars(
+                        ticker, chunk_start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d'),
+                        TIMESPANS[timespan], BACKFILL
+                    )
+                    if results is None:
+                        print(f"Intraday backfill of {ticker} stopped at {chunk_start}, rerun to resume")
+                        break
+                    arrays = results_to_arrays(results)
+                    written += self.write_arrays(ticker, take(arrays, (arrays['t'] >= after) & (arrays['t'] <= end)), timespan)
+                chunk_start = chunk_end + timedelta(days=1)
+            return written
+
+        workers = max_workers or getattr(pipeline, 'max_connections', 4)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            total = sum(pool.map(load, tickers))
+
+        print(f"Intraday bars added successfully ({total} bars)")
+        return total
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+#Returns the store shared by the whole process
+def get_intraday_store():
+    global _shared_store
+
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = IntradayStore()
+        return _shared_store
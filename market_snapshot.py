@@ -0,0 +1,201 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file builds whole-market snapshots from the grouped daily endpoint.
+
+One call returns the bar of every US stock for a session. Each session is kept as a small
+Parquet table (market_snapshots/2024-05-01.parquet) sorted by symbol, and a snapshot joins
+it with the session before to get daily changes. Movers and breadth are computed with
+NumPy over the whole table at once.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from rate_limiter import INTERACTIVE
+
+COLUMNS = ['symbol', 'open', 'high', 'low', 'close', 'volume', 'vwap', 'transactions']
+
+SCHEMA = pa.schema([
+    ('symbol', pa.string()),
+    ('open', pa.float64()),
+    ('high', pa.float64()),
+    ('low', pa.float64()),
+    ('close', pa.float64()),
+    ('volume', pa.int64()),
+    ('vwap', pa.float64()),
+    ('transactions', pa.int64()),
+])
+
+
+#Every symbol's bar for one session next to its previous close, one NumPy array per column
+class MarketSnapshot():
+    def __init__(self, session, table, previous=None):
+        self.session = session
+
+        table = table.sort_values('symbol')
+        self.symbols = table['symbol'].to_numpy(dtype=str)
+        self.open = table['open'].to_numpy(dtype=np.float64)
+        self.high = table['high'].to_numpy(dtype=np.float64)
+        self.low = table['low'].to_numpy(dtype=np.float64)
+        self.close = table['close'].to_numpy(dtype=np.float64)
+        self.volume = table['volume'].to_numpy(dtype=np.int64)
+
+        # Both tables are sorted by symbol, so the join is one binary search per symbol
+        self.previous_close = np.full(len(self.symbols), np.nan)
+        if previous is not None and len(previous):
+            previous = previous.sort_values('symbol')
+            previous_symbols = previous['symbol'].to_numpy(dtype=str)
+            position = np.searchsorted(previous_symbols, self.symbols).clip(0, len(previous_symbols) - 1)
+            found = previous_symbols[position] == self.symbols
+            self.previous_close[found] = previous['close'].to_numpy(dtype=np.float64)[position[found]]
+
+        # Symbols new to the market today have no previous close and no change
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.change = self.close - self.previous_close
+            self.change_pct = self.change / self.previous_close * 100.0
+        self.change_pct[~np.isfinite(self.change_pct)] = np.nan
+
+    def __len__(self):
+        return len(self.symbols)
+
+    # Rows at the given positions as a DataFrame for display
+    def rows(self, positions):
+        return pd.DataFrame({
+            'symbol': self.symbols[positions],
+            'close': self.close[positions],
+            'change': self.change[positions],
+            'change_pct': self.change_pct[positions],
+            'volume': self.volume[positions],
+        })
+
+    # Positions of the k largest values among the eligible rows, largest first
+    def top(self, values, eligible, k):
+        candidates = np.flatnonzero(eligible)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-values[candidates], k - 1)[:k]]
+        return candidates[np.argsort(-values[candidates], kind='stable')]
+
+    # Rows that are liquid enough for their change to mean something
+    # Without the floor the list is all sub-penny warrants and one-lot trades
+    def tradable(self, min_price, min_volume):
+        return (
+            ~np.isnan(self.change_pct)
+            & (self.close >= min_price)
+            & (self.volume >= min_volume)
+        )
+
+    def top_gainers(self, k=10, min_price=1.0, min_volume=100000):
+        eligible = self.tradable(min_price, min_volume)
+        return self.rows(self.top(self.change_pct, eligible, k))
+
+    def top_losers(self, k=10, min_price=1.0, min_volume=100000):
+        eligible = self.tradable(min_price, min_volume)
+        return self.rows(self.top(-self.change_pct, eligible, k))
+
+    def volume_leaders(self, k=10):
+        return self.rows(self.top(self.volume.astype(np.float64), np.ones(len(self), dtype=bool), k))
+
+    # Advancing and declining symbols and the volume behind each side
+    # groups maps symbols to a label (a sector, a listing type) to break breadth down by it,
+    # symbols without a label are counted under "Other"
+    def breadth(self, groups=None):
+        if groups:
+            labels = np.array([groups.get(symbol, "Other") for symbol in self.symbols], dtype=object)
+        else:
+            labels = np.full(len(self), "Market", dtype=object)
+
+        names, group = np.unique(labels.astype(str), return_inverse=True)
+        known = ~np.isnan(self.change)
+        up = known & (self.change > 0)
+        down = known & (self.change < 0)
+        volume = self.volume.astype(np.float64)
+
+        def per_group(mask, weights=None):
+            return np.bincount(group[mask], weights=None if weights is None else weights[mask], minlength=len(names))
+
+        result = pd.DataFrame({
+            'group': names,
+            'advancers': per_group(up).astype(np.int64),
+            'decliners': per_group(down).astype(np.int64),
+            'unchanged': per_group(known & (self.change == 0)).astype(np.int64),
+            'up_volume': per_group(up, volume).astype(np.int64),
+            'down_volume': per_group(down, volume).astype(np.int64),
+        })
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['advance_decline_ratio'] = result['advancers'] / result['decliners']
+        return result
+
+
+#Keeps one Parquet table per session and builds snapshots from them
+class SnapshotStore():
+    def __init__(self, pipeline, root=None, max_sessions=8):
+        self.pipeline = pipeline
+        self.root = root or os.getenv("snapshot_path", "market_snapshots")
+        os.makedirs(self.root, exist_ok=True)
+
+        # Recently used session tables, most recent last
+        self.max_sessions = max_sessions
+        self.tables = OrderedDict()
+        self.lock = threading.Lock()
+
+    def path_for(self, session):
+        return os.path.join(self.root, f"{session.isoformat()}.parquet")
+
+    # Latest session whose bars are final, a session still trading has partial grouped bars
+    def latest_session(self):
+        return self.pipeline.calendar.latest_settled_session()
+
+    # Every symbol's bar for one session, from memory, disk or a single API call
+    def table(self, session, priority=INTERACTIVE):
+        with self.lock:
+            if session in self.tables:
+                self.tables.move_to_end(session)
+                return self.tables[session]
+
+        path = self.path_for(session)
+        if os.path.exists(path):
+            table = pq.read_table(path).to_pandas()
+        else:
+            df = self.pipeline.get_grouped_daily(session.isoformat(), priority)
+            if df is None:
+                return None
+            table = df[COLUMNS].sort_values('symbol').reset_index(drop=True)
+
+            # Only settled sessions go to disk, a session still trading would be stale tomorrow
+            if self.pipeline.calendar.is_settled(session) and len(table):
+                temporary = path + ".tmp"
+                pq.write_table(pa.Table.from_pandas(table, schema=SCHEMA, preserve_index=False), temporary, compression="zstd")
+                os.replace(temporary, path)
+
+            if not self.pipeline.calendar.is_settled(session):
+                return table
+
+        with self.lock:
+            self.tables[session] = table
+            while len(self.tables) > self.max_sessions:
+                self.tables.popitem(last=False)
+        return table
+
+    # Snapshot of one session (default: the latest finished one), None if it could not be loaded
+    def snapshot(self, session=None, priority=INTERACTIVE):
+        calendar = self.pipeline.calendar
+        session = calendar.previous_session(session) if session is not None else self.latest_session()
+        if session is None:
+            return None
+
+        table = self.table(session, priority)
+        if table is None:
+            return None
+
+        previous_session = calendar.previous_session(session - timedelta(days=1))
+        previous = self.table(previous_session, priority) if previous_session is not None else None
+        return MarketSnapshot(session, table, previous)
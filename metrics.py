@@ -0,0 +1,396 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file counts and times what the project does, for the /metrics page in Prometheus format.
+
+Recording a value is a dict update under a lock, cheap enough to leave on in production.
+Each worker process keeps its own numbers. When metrics_path is set they are also written to
+that SQLite file every few seconds, and /metrics adds up every worker's numbers, so it does
+not matter which worker answers the scrape.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+# Seconds, from a cache hit to an API call stuck behind the rate limiter
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+#Base class, values are kept per tuple of label values
+class Metric():
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    # {label values: value} copied for rendering or sharing
+    def collect(self):
+        with self.lock:
+            return dict(self.values)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+
+#Counts of observations per bucket plus their sum, like Prometheus histograms
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+
+            # Counts are stored per bucket and made cumulative when rendered
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][position] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    # Times the block and observes how long it took
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self):
+        with self.lock:
+            return {
+                key: {"buckets": list(entry["buckets"]), "sum": entry["sum"], "count": entry["count"]}
+                for key, entry in self.values.items()
+            }
+
+
+#Counter or gauge read from another object when metrics are collected, e.g. cache stats
+#fn returns a number, or {label values tuple: number} when the metric has labels
+class CallbackMetric(Metric):
+    def __init__(self, name, help_text, kind, fn, labels=()):
+        super().__init__(name, help_text, labels)
+        self.kind = kind
+        self.fn = fn
+
+    def collect(self):
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Metric {self.name} could not be read: {e}")
+            return {}
+        return values if isinstance(values, dict) else {(): values}
+
+
+#Every metric of the process, by name
+class Registry():
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+        # Shared with other worker processes when metrics_path is set
+        self.store = None
+        self.flusher = None
+        self.stopping = threading.Event()
+
+    def add(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            # Metrics defined at import time are returned again, callbacks are replaced by the newest owner
+            if existing is not None and not isinstance(metric, CallbackMetric):
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self.add(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.add(Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name, help_text, kind, fn, labels=()):
+        return self.add(CallbackMetric(name, help_text, kind, fn, labels))
+
+    # Plain-data copy of every metric, the format stored for other workers
+    def snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+
+        snapshot = {}
+        for metric in metrics:
+            snapshot[metric.name] = {
+                "kind": metric.kind,
+                "help": metric.help,
+                "labels": list(metric.labels),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "values": [[list(key), value] for key, value in metric.collect().items()],
+            }
+        return snapshot
+
+    # Starts writing this process's numbers to a SQLite file shared with the other workers
+    def share(self, path, interval=10):
+        if self.store is not None:
+            return
+        self.store = SharedSnapshots(path, interval)
+        self.flusher = threading.Thread(target=self.flush_periodically, args=(interval,), name="metrics", daemon=True)
+        self.flusher.start()
+
+    def flush_periodically(self, interval):
+        while not self.stopping.wait(interval):
+            store = self.store
+            if store is None:
+                break
+            try:
+                store.write(self.snapshot())
+            except sqlite3.Error as e:
+                print(f"Metrics could not be saved: {e}")
+
+    # Text for the /metrics route, added up over every worker when they share a file
+    def render(self):
+        if self.store is None:
+            return render_snapshots([self.snapshot()])
+
+        self.store.write(self.snapshot())
+        return render_snapshots(self.store.read())
+
+    def close(self):
+        self.stopping.set()
+        if self.store is not None:
+            try:
+                self.store.write(self.snapshot())
+            finally:
+                self.store.close()
+            self.store = None
+
+
+#One row per worker process with its latest snapshot
+class SharedSnapshots():
+    def __init__(self, path, interval):
+        # Unique per process start, a recycled pid must not overwrite a finished worker's counters
+        self.worker = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.interval = interval
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS metrics_snapshots (
+                worker TEXT PRIMARY KEY,
+                updated REAL NOT NULL,
+                payload TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def write(self, snapshot):
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO metrics_snapshots (worker, updated, payload) VALUES (?, ?, ?)
+                ON CONFLICT (worker) DO UPDATE SET updated = excluded.updated, payload = excluded.payload;
+            """, (self.worker, time.time(), json.dumps(snapshot)))
+            self.conn.commit()
+
+    # Snapshots of every worker. Counters of workers that exited still count, their gauges do not
+    def read(self, keep_days=7):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("DELETE FROM metrics_snapshots WHERE updated < ?;", (now - keep_days * 86400,))
+            self.conn.commit()
+            rows = self.conn.execute("SELECT updated, payload FROM metrics_snapshots;").fetchall()
+
+        snapshots = []
+        for updated, payload in rows:
+            snapshot = json.loads(payload)
+            if updated < now - 3 * self.interval:
+                snapshot = {name: metric for name, metric in snapshot.items() if metric["kind"] != "gauge"}
+            snapshots.append(snapshot)
+        return snapshots
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def label_text(names, values, extra=None):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+#Adds up the snapshots of several processes and writes them in the Prometheus text format
+def render_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "values": {}})
+            for key, value in metric["values"]:
+                key = tuple(key)
+                current = target["values"].get(key)
+                if metric["kind"] == "histogram":
+                    if current is None:
+                        target["values"][key] = {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+                    else:
+                        current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                        current["sum"] += value["sum"]
+                        current["count"] += value["count"]
+                else:
+                    target["values"][key] = (current or 0) + value
+
+    infinity = 'le="+Inf"'
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+
+        for key, value in sorted(metric["values"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{label_text(metric['labels'], key)} {format_number(value)}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip(metric["buckets"], value["buckets"]):
+                cumulative += count
+                le = f'le="{format_number(float(bound))}"'
+                lines.append(f"{name}_bucket{label_text(metric['labels'], key, le)} {cumulative}")
+            lines.append(f"{name}_bucket{label_text(metric['labels'], key, infinity)} {value['count']}")
+            lines.append(f"{name}_sum{label_text(metric['labels'], key)} {format_number(float(value['sum']))}")
+            lines.append(f"{name}_count{label_text(metric['labels'], key)} {value['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+_shared_registry = None
+_shared_lock = threading.Lock()
+
+
+#Returns the registry shared by the whole process
+#When metrics_path is set the numbers are also shared with other processes through that file
+def get_registry():
+    global _shared_registry
+
+    with _shared_lock:
+        if _shared_registry is None:
+            _shared_registry = Registry()
+
+        # Read on every call, not once at import: this module is imported before main() loads .env,
+        # the Dashboard asks again when it adds the /metrics route
+        path = os.getenv("metrics_path")
+        if path and _shared_registry.store is None and not _shared_registry.stopping.is_set():
+            _shared_registry.share(path)
+        return _shared_registry
+
+
+#Times every call of fn in histogram, with fixed labels
+def timed(histogram, **labels):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+#Short endpoint name of a Polygon URL, so labels do not contain every symbol and date
+def endpoint_name(url):
+    if "/v1/open-close/" in url:
+        return "open-close"
+    if "/v2/aggs/grouped/" in url:
+        return "grouped"
+    if "/v2/aggs/ticker/" in url:
+        return "aggregates"
+    if "/v3/reference/tickers" in url:
+        return "tickers"
+    return "other"
+
+
+registry = get_registry()
+
+CALLBACK_SECONDS = registry.histogram(
+    "dashboard_callback_seconds", "Time spent in each Dash callback", ["callback"]
+)
+FALLBACK_PROBES = registry.counter(
+    "dashboard_fallback_probes_total",
+    "Lookups that fell back to an earlier session, by where the bar was found",
+    ["result"]
+)
+UPSTREAM_REQUESTS = registry.counter(
+    "polygon_requests_total", "Calls to the Polygon API by endpoint and HTTP status", ["endpoint", "status"]
+)
+UPSTREAM_SECONDS = registry.histogram(
+    "polygon_request_seconds", "Polygon API response time by endpoint", ["endpoint"]
+)
+RATE_LIMIT_WAIT_SECONDS = registry.histogram(
+    "rate_limiter_wait_seconds", "Time callers waited for a rate limiter token", ["priority"]
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_seconds", "Database statement time by kind of statement", ["statement"]
+)
+DB_TRANSACTION_SECONDS = registry.histogram(
+    "db_transaction_seconds", "Database transaction time including the wait for a pooled connection"
+)
+STREAM_EVENTS = registry.counter(
+    "stream_events_total", "Websocket feed events by channel and whether they were kept", ["channel", "result"]
+)
+
+
+#Times one API call and counts it under its endpoint and status
+@contextmanager
+def upstream_call(url):
+    endpoint = endpoint_name(url)
+    call = {"status": "error"}
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=call["status"])
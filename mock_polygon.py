@@ -0,0 +1,475 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file is a local stand-in for the Polygon API, for benchmarks and offline development.
+
+It serves the endpoints the project calls (open-close, aggregates, grouped daily and
+reference tickers). A request is answered from a recorded fixture when one exists under
+the fixtures directory (fixtures/v1/open-close/AAPL/2024-05-01.json mirrors the URL path),
+otherwise from synthetic bars that are the same on every run. Latency, 429s and server
+errors can be injected to see how the client copes.
+
+Run it and point the project at it:
+
+    python mock_polygon.py --port 8090 --latency-ms 80 --throttle-rate 0.05
+    polygon_base_url=http://127.0.0.1:8090 python dash_app.py
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import date, datetime, time as clock, timezone
+
+import numpy as np
+from flask import Flask, jsonify, request
+
+from trading_calendar import MARKET_TIMEZONE, get_trading_calendar
+
+# Synthetic histories start here, symbols list on a date derived from their name
+FIRST_SESSION = date(2000, 1, 3)
+
+TICKER_TYPES = ["CS", "CS", "CS", "ETF"]
+
+EXCHANGES = ["XNAS", "XNYS", "ARCX", "BATS", "XASE"]
+
+
+#Settings that can be changed while the server runs (POST /mock/config)
+class MockConfig():
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, throttle_rate=0.0, error_rate=0.0,
+                 retry_after=1, calls_per_minute=0, fixtures=None, page_size=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+        # Share of requests answered with a 429 or a 500 regardless of the rate
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+
+        # Enforced like the real plan limit when set, 0 means unlimited
+        self.calls_per_minute = calls_per_minute
+
+        self.fixtures = fixtures
+
+        # Forces pagination of aggregates and tickers, like limit= would
+        self.page_size = page_size
+
+    def update(self, values):
+        for name, value in values.items():
+            if not hasattr(self, name):
+                raise ValueError(f"Unknown setting {name}")
+            setattr(self, name, value)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+#Deterministic pseudo-random numbers in [0, 1) for each (seed, index), vectorized over both
+def unit_noise(seeds, index):
+    # splitmix64 finalizer, the multiplications are meant to wrap around
+    with np.errstate(over='ignore'):
+        x = (np.asarray(seeds, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+             + np.asarray(index, dtype=np.uint64) * np.uint64(0xBF58476D1CE4E5B9))
+        x = np.asarray(x)
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+#Synthetic daily bars, each one computed straight from (symbol, session number)
+class SyntheticMarket():
+    def __init__(self, tickers):
+        self.calendar = get_trading_calendar()
+        self.tickers = sorted(set(tickers))
+        self.seeds = np.array([zlib.crc32(ticker.encode()) for ticker in self.tickers], dtype=np.uint64)
+        self.index = {ticker: position for position, ticker in enumerate(self.tickers)}
+
+        self.first_ordinal = FIRST_SESSION.toordinal()
+
+    def session_number(self, days):
+        ordinals = np.array([day.toordinal() for day in days], dtype=np.int64)
+        return ordinals - self.first_ordinal
+
+    def listed(self, seeds):
+        # Listing dates are spread over the first twenty years so some lookups hit pre-IPO dates
+        return (unit_noise(seeds, 0) * 20 * 365).astype(np.int64)
+
+    # Bars for every (seed, day) pair, seeds and numbers are broadcast against each other
+    def bars(self, seeds, numbers):
+        seeds = np.asarray(seeds, dtype=np.uint64)
+        numbers = np.asarray(numbers, dtype=np.int64)
+
+        base = 5 + unit_noise(seeds, 1) * 400
+        period = 200 + unit_noise(seeds, 2) * 800
+        phase = unit_noise(seeds, 3) * 2 * np.pi
+
+        # A slow wave plus day-to-day noise, no running sum so any single day is O(1)
+        close = base * np.exp(0.4 * np.sin(2 * np.pi * numbers / period + phase)
+                              + 0.03 * (unit_noise(seeds, numbers + 10) - 0.5))
+        open_ = close * (1 + 0.02 * (unit_noise(seeds, numbers + 20000) - 0.5))
+        high = np.maximum(open_, close) * (1 + 0.015 * unit_noise(seeds, numbers + 40000))
+        low = np.minimum(open_, close) * (1 - 0.015 * unit_noise(seeds, numbers + 60000))
+        volume = (1e5 + 5e6 * unit_noise(seeds, numbers + 80000) ** 3).astype(np.int64)
+
+        return {
+            'o': np.round(open_, 4), 'h': np.round(high, 4), 'l': np.round(low, 4),
+            'c': np.round(close, 4), 'v': volume,
+            'vw': np.round((high + low + close) / 3, 4),
+            'n': (volume // 150).astype(np.int64),
+        }
+
+    def has_symbol(self, symbol):
+        return symbol in self.index
+
+    # Aggregate results for one symbol between two dates
+    def range_results(self, symbol, start, end):
+        seed = self.seeds[self.index[symbol]]
+        days = self.calendar.sessions_between(start, end)
+        numbers = self.session_number(days)
+        keep = numbers >= self.listed(seed)
+        days = [day for day, kept in zip(days, keep) if kept]
+        if not days:
+            return []
+
+        bars = self.bars(seed, numbers[keep])
+        return [
+            {
+                'o': float(bars['o'][i]), 'h': float(bars['h'][i]), 'l': float(bars['l'][i]),
+                'c': float(bars['c'][i]), 'v': int(bars['v'][i]), 'vw': float(bars['vw'][i]),
+                'n': int(bars['n'][i]), 't': millis(day),
+            }
+            for i, day in enumerate(days)
+        ]
+
+    # Regular-session bars of multiplier minutes, drawn inside each day's synthetic daily bar
+    def minute_results(self, symbol, start, end, multiplier=1):
+        seed = self.seeds[self.index[symbol]]
+        days = self.calendar.sessions_between(start, end)
+        numbers = self.session_number(days)
+        keep = numbers >= self.listed(seed)
+
+        results = []
+        for day, number in zip([day for day, kept in zip(days, keep) if kept], numbers[keep]):
+            daily = self.bars(seed, number)
+            opened = datetime.combine(day, clock(9, 30), MARKET_TIMEZONE)
+            closed = datetime.combine(day, self.calendar.close_time(day), MARKET_TIMEZONE)
+            count = int((closed - opened).total_seconds() // 60 // multiplier)
+
+            # A path from the open to the close that wanders inside the day's range
+            step = np.arange(count + 1)
+            drift = daily['o'] + (daily['c'] - daily['o']) * step / count
+            wander = (unit_noise(seed, number * 1000 + step + 100000000) - 0.5) * (daily['h'] - daily['l']) * 0.6
+            path = np.clip(drift + wander * np.sin(np.pi * step / count), daily['l'], daily['h'])
+            # Stocks over a dollar trade in whole cents
+            decimals = 2 if daily['l'] >= 1 else 4
+            path = np.round(path, decimals)
+
+            open_, close = path[:-1], path[1:]
+            spread = unit_noise(seed, number * 1000 + step[:-1] + 200000000) * (daily['h'] - daily['l']) * 0.05
+            high = np.maximum(np.round(np.maximum(open_, close) + spread, decimals), np.maximum(open_, close))
+            low = np.minimum(np.round(np.minimum(open_, close) - spread, decimals), np.minimum(open_, close))
+            volume = (daily['v'] / count * 2 * unit_noise(seed, number * 1000 + step[:-1] + 300000000)).astype(np.int64) + 1
+            start_ms = int(opened.timestamp() * 1000)
+
+            results.extend(
+                {
+                    'o': float(open_[i]), 'h': float(high[i]), 'l': float(low[i]), 'c': float(close[i]),
+                    'v': int(volume[i]), 'vw': float(round((high[i] + low[i] + close[i]) / 3, 4)),
+                    'n': int(volume[i] // 150) + 1, 't': start_ms + i * multiplier * 60000,
+                }
+                for i in range(count)
+            )
+        return results
+
+    # Grouped daily results, every listed symbol for one session
+    def grouped_results(self, day):
+        if not self.calendar.is_trading_day(day):
+            return []
+
+        number = self.session_number([day])[0]
+        listed = self.listed(self.seeds) <= number
+        bars = self.bars(self.seeds[listed], number)
+        tickers = [ticker for ticker, kept in zip(self.tickers, listed) if kept]
+
+        timestamp = millis(day)
+        return [
+            {
+                'T': ticker,
+                'o': float(bars['o'][i]), 'h': float(bars['h'][i]), 'l': float(bars['l'][i]),
+                'c': float(bars['c'][i]), 'v': int(bars['v'][i]), 'vw': float(bars['vw'][i]),
+                'n': int(bars['n'][i]), 't': timestamp,
+            }
+            for i, ticker in enumerate(tickers)
+        ]
+
+    def ticker_type(self, ticker):
+        return TICKER_TYPES[self.seeds[self.index[ticker]] % len(TICKER_TYPES)]
+
+    # Reference data that stays the same for a ticker from run to run
+    def ticker_details(self, ticker):
+        seed = int(self.seeds[self.index[ticker]])
+        return {
+            "ticker": ticker, "name": f"{ticker} Inc.", "market": "stocks", "locale": "us",
+            "primary_exchange": EXCHANGES[seed // 7 % len(EXCHANGES)],
+            "type": self.ticker_type(ticker), "active": True, "currency_name": "usd",
+            "composite_figi": f"BBG{seed % 16 ** 9:09X}",
+        }
+
+
+#Midnight New York time is still the same calendar day in UTC, like Polygon's own timestamps
+def millis(day):
+    return int(datetime(day.year, day.month, day.day, 4, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def load_tickers(path="tickers.json", count=2000):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    # Without a ticker list, made-up symbols AAAA, AAAB, ...
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return [
+        letters[i // 17576 % 26] + letters[i // 676 % 26] + letters[i // 26 % 26] + letters[i % 26]
+        for i in range(count)
+    ]
+
+
+#Flask app that answers like Polygon
+def create_app(config=None, tickers=None):
+    config = config or MockConfig()
+    market = SyntheticMarket(tickers if tickers is not None else load_tickers())
+    app = Flask(__name__)
+
+    lock = threading.Lock()
+    stats = {"requests": 0, "throttled": 0, "errors": 0, "by_endpoint": {}}
+    bucket = {"tokens": 0.0, "updated": time.monotonic()}
+
+    app.config["mock"] = config
+    app.config["mock_stats"] = stats
+
+    # Fault injection and the plan limit, returns a response to send instead or None
+    def inject(endpoint):
+        with lock:
+            stats["requests"] += 1
+            stats["by_endpoint"][endpoint] = stats["by_endpoint"].get(endpoint, 0) + 1
+
+        delay = config.latency_ms + random.uniform(-1, 1) * config.jitter_ms
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        throttled = random.random() < config.throttle_rate
+        if config.calls_per_minute and not throttled:
+            with lock:
+                now = time.monotonic()
+                rate = config.calls_per_minute / 60
+                bucket["tokens"] = min(config.calls_per_minute, bucket["tokens"] + (now - bucket["updated"]) * rate)
+                bucket["updated"] = now
+                if bucket["tokens"] >= 1:
+                    bucket["tokens"] -= 1
+                else:
+                    throttled = True
+
+        if throttled:
+            with lock:
+                stats["throttled"] += 1
+            response = jsonify({"status": "ERROR", "error": "You've exceeded the maximum requests per minute"})
+            response.status_code = 429
+            response.headers["Retry-After"] = str(config.retry_after)
+            return response
+
+        if random.random() < config.error_rate:
+            with lock:
+                stats["errors"] += 1
+            response = jsonify({"status": "ERROR", "error": "Internal server error"})
+            response.status_code = 500
+            return response
+
+        return None
+
+    # Recorded answer for this URL path, if there is one
+    def fixture():
+        if not config.fixtures:
+            return None
+        path = os.path.join(config.fixtures, request.path.strip("/") + ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return jsonify(json.load(f))
+
+    def not_found(message):
+        response = jsonify({"status": "NOT_FOUND", "request_id": "mock", "message": message})
+        response.status_code = 404
+        return response
+
+    def unknown_symbol(symbol):
+        response = jsonify({"status": "ERROR", "request_id": "mock", "error": f"Unknown ticker {symbol}"})
+        response.status_code = 404
+        return response
+
+    def page_size(default):
+        limit = int(request.args.get("limit", default))
+        return min(limit, config.page_size) if config.page_size else limit
+
+    @app.route("/v1/open-close/<symbol>/<day>")
+    def open_close(symbol, day):
+        fault = inject("open-close")
+        if fault is not None:
+            return fault
+        recorded = fixture()
+        if recorded is not None:
+            return recorded
+
+        symbol = symbol.upper()
+        if not market.has_symbol(symbol):
+            return unknown_symbol(symbol)
+
+        results = market.range_results(symbol, day, day)
+        if not results:
+            return not_found("Data not found.")
+
+        bar = results[0]
+        return jsonify({
+            "status": "OK", "from": day, "symbol": symbol,
+            "open": bar['o'], "high": bar['h'], "low": bar['l'], "close": bar['c'],
+            "volume": bar['v'], "afterHours": bar['c'], "preMarket": bar['o'],
+        })
+
+    @app.route("/v2/aggs/ticker/<symbol>/range/<int:multiplier>/<timespan>/<start>/<end>")
+    def aggregates(symbol, multiplier, timespan, start, end):
+        fault = inject("aggregates")
+        if fault is not None:
+            return fault
+        recorded = fixture()
+        if recorded is not None:
+            return recorded
+
+        symbol = symbol.upper()
+        if not market.has_symbol(symbol):
+            return unknown_symbol(symbol)
+
+        if timespan == "minute":
+            results = market.minute_results(symbol, start, end, multiplier)
+        else:
+            results = market.range_results(symbol, start, end)
+        limit = page_size(5000)
+        offset = int(request.args.get("cursor", 0))
+        page = results[offset:offset + limit]
+
+        body = {
+            "ticker": symbol, "status": "OK", "adjusted": True,
+            "queryCount": len(page), "resultsCount": len(page), "results": page,
+            "request_id": "mock",
+        }
+        if offset + limit < len(results):
+            body["next_url"] = f"{request.base_url}?cursor={offset + limit}&limit={limit}"
+        return jsonify(body)
+
+    @app.route("/v2/aggs/grouped/locale/us/market/stocks/<day>")
+    def grouped(day):
+        fault = inject("grouped")
+        if fault is not None:
+            return fault
+        recorded = fixture()
+        if recorded is not None:
+            return recorded
+
+        results = market.grouped_results(date.fromisoformat(day))
+        return jsonify({
+            "status": "OK", "adjusted": True, "queryCount": len(results),
+            "resultsCount": len(results), "results": results, "request_id": "mock",
+        })
+
+    @app.route("/v3/reference/tickers")
+    def reference_tickers():
+        fault = inject("tickers")
+        if fault is not None:
+            return fault
+        recorded = fixture()
+        if recorded is not None:
+            return recorded
+
+        ticker_type = request.args.get("type")
+        tickers = [
+            ticker for ticker in market.tickers
+            if ticker_type is None or market.ticker_type(ticker) == ticker_type
+        ]
+
+        limit = page_size(100)
+        offset = int(request.args.get("cursor", 0))
+        page = tickers[offset:offset + limit]
+
+        body = {
+            "status": "OK", "count": len(page), "request_id": "mock",
+            "results": [market.ticker_details(ticker) for ticker in page],
+        }
+        if offset + limit < len(tickers):
+            query = f"cursor={offset + limit}&limit={limit}"
+            if ticker_type:
+                query += f"&type={ticker_type}"
+            body["next_url"] = f"{request.base_url}?{query}"
+        return jsonify(body)
+
+    @app.route("/mock/config", methods=["GET", "POST"])
+    def mock_config():
+        if request.method == "POST":
+            try:
+                config.update(request.get_json(force=True))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        return jsonify(config.as_dict())
+
+    @app.route("/mock/stats")
+    def mock_stats():
+        with lock:
+            return jsonify(stats)
+
+    return app
+
+
+#Runs the mock in a background thread, returns (server, base_url)
+def serve_in_thread(config=None, tickers=None, host="127.0.0.1", port=0):
+    import logging
+    from werkzeug.serving import make_server
+
+    # One log line per request would drown out whatever is being measured
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    server = make_server(host, port, create_app(config, tickers), threaded=True)
+    threading.Thread(target=server.serve_forever, name="mock-polygon", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Polygon API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--calls-per-minute", type=int, default=0, help="plan limit to enforce, 0 for none")
+    parser.add_argument("--page-size", type=int, default=None)
+    parser.add_argument("--fixtures", default=None, help="directory of recorded responses")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        calls_per_minute=args.calls_per_minute,
+        fixtures=args.fixtures,
+        page_size=args.page_size,
+    )
+    create_app(config).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file is a local stand-in for Polygon's websocket feed, for development and load tests.
+
+It answers the same auth and subscribe messages as wss://socket.polygon.io/stocks. It then
+replays events recorded by the stream client (set stream_record_path while connected to the
+real feed), with their original spacing scaled by --speed and looping with timestamps moved
+forward. Without a recording it makes up a random walk for every subscribed ticker, --rate
+messages a second.
+
+Run it and point the dashboard at it:
+
+    python mock_stream.py --port 8091 --rate 5
+    polygon_stream_url=ws://127.0.0.1:8091 stream_channel=AM python dash_app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+
+from streaming import CHANNELS
+
+
+#Events of one channel read back from a recording, one websocket message per line
+class Replay():
+    def __init__(self, path, speed=1.0):
+        self.speed = speed
+        self.messages = []
+        with open(path) as f:
+            for line in f:
+                events = json.loads(line)
+                events = [events] if isinstance(events, dict) else events
+                events = [event for event in events if event.get('ev') in CHANNELS]
+                if events:
+                    self.messages.append(events)
+        if not self.messages:
+            raise ValueError(f"No feed events in {path}")
+
+        self.position = 0
+        # Added to every timestamp, grows by the recording's length on each loop
+        self.offset = 0
+        self.span = self.time_of(self.messages[-1]) - self.time_of(self.messages[0]) + 1000
+
+    def time_of(self, events):
+        return max(event.get('t', event.get('s', 0)) for event in events)
+
+    def next(self, wanted, subscriptions):
+        events = []
+        for event in self.messages[self.position]:
+            if wanted(event['ev'], event['sym']):
+                event = dict(event)
+                for key in ('t', 's', 'e'):
+                    if key in event:
+                        event[key] += self.offset
+                events.append(event)
+        return events
+
+    # Seconds until the next message, then moves on to it
+    def delay(self):
+        current = self.time_of(self.messages[self.position])
+        self.position += 1
+        if self.position == len(self.messages):
+            self.position = 0
+            self.offset += self.span
+            return 1.0 / self.speed
+        return min(max(self.time_of(self.messages[self.position]) - current, 0) / 1000 / self.speed, 5.0)
+
+
+#Random-walk bars or trades for every subscribed ticker
+class Synthetic():
+    def __init__(self, tickers, rate=5.0, seed=None):
+        self.tickers = tickers
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.prices = {}
+        self.sequence = 0
+
+        # Bars are stamped on a clock that moves one bar length per message, so a load test at
+        # a high rate is not a thousand bars for the same minute
+        self.clock = int(time.time()) // 60 * 60000
+
+    def price(self, symbol):
+        if symbol not in self.prices:
+            self.prices[symbol] = 20 + zlib.crc32(symbol.encode()) % 400
+        self.prices[symbol] *= 1 + self.random.gauss(0, 0.001)
+        return round(self.prices[symbol], 4)
+
+    def next(self, wanted, subscriptions):
+        events = []
+        # wanted is not needed, every subscribed ticker gets an event
+        for channel in CHANNELS:
+            symbols = {symbol for kind, symbol in subscriptions if kind == channel}
+            if '*' in symbols:
+                symbols = set(self.tickers)
+
+            length = 60000 if channel == 'AM' else 1000
+            for symbol in sorted(symbols):
+                if channel == 'T':
+                    self.sequence += 1
+                    events.append({
+                        'ev': 'T', 'sym': symbol, 'x': 4, 'p': self.price(symbol),
+                        's': self.random.randint(1, 500), 't': int(time.time() * 1000), 'q': self.sequence,
+                    })
+                    continue
+
+                prices = [self.price(symbol) for _ in range(4)]
+                events.append({
+                    'ev': channel, 'sym': symbol, 'o': prices[0], 'h': max(prices), 'l': min(prices),
+                    'c': prices[-1], 'v': self.random.randint(100, 50000), 'vw': round(sum(prices) / 4, 4),
+                    's': self.clock, 'e': self.clock + length,
+                })
+        self.clock += 60000 if any(kind == 'AM' for kind, _ in subscriptions) else 1000
+        return events
+
+    def delay(self):
+        return 1.0 / self.rate
+
+
+#Websocket server speaking Polygon's feed protocol
+class MockStream():
+    def __init__(self, tickers=(), rate=5.0, recording=None, speed=1.0, api_key=None):
+        self.tickers = list(tickers)
+        self.rate = rate
+        self.recording = recording
+        self.speed = speed
+        # Checked against the auth message when set, any key is accepted otherwise
+        self.api_key = api_key
+
+        self.lock = threading.Lock()
+        self.counters = {"connections": 0, "messages": 0, "events": 0}
+
+    def source(self):
+        if self.recording:
+            return Replay(self.recording, self.speed)
+        return Synthetic(self.tickers, self.rate)
+
+    def status(self, status, message):
+        return json.dumps([{'ev': 'status', 'status': status, 'message': message}])
+
+    # One client connection, until it disconnects
+    def handler(self, connection):
+        from websockets.exceptions import ConnectionClosed
+
+        with self.lock:
+            self.counters["connections"] += 1
+
+        source = self.source()
+        subscriptions = set()
+        authenticated = False
+
+        def wanted(channel, symbol):
+            return (channel, symbol) in subscriptions or (channel, '*') in subscriptions
+
+        try:
+            connection.send(self.status('connected', 'Connected Successfully'))
+            next_at = time.monotonic()
+
+            while True:
+                try:
+                    message = connection.recv(timeout=max(next_at - time.monotonic(), 0))
+                except TimeoutError:
+                    if authenticated and subscriptions:
+                        events = source.next(wanted, subscriptions)
+                        if events:
+                            connection.send(json.dumps(events))
+                            with self.lock:
+                                self.counters["messages"] += 1
+                                self.counters["events"] += len(events)
+
+                    # A client that fell behind gets the next message now, not a burst of them
+                    next_at = max(next_at + source.delay(), time.monotonic() - 1.0)
+                    continue
+
+                request = json.loads(message)
+                action, params = request.get('action'), request.get('params', '')
+
+                if action == 'auth':
+                    if self.api_key and params != self.api_key:
+                        connection.send(self.status('auth_failed', 'authentication failed'))
+                        return
+                    authenticated = True
+                    connection.send(self.status('auth_success', 'authenticated'))
+
+                elif action in ('subscribe', 'unsubscribe'):
+                    for name in filter(None, params.split(',')):
+                        channel, _, symbol = name.strip().partition('.')
+                        if action == 'subscribe':
+                            subscriptions.add((channel, symbol.upper()))
+                        else:
+                            subscriptions.discard((channel, symbol.upper()))
+                    connection.send(self.status('success', f"{action}d to: {params}"))
+
+        except ConnectionClosed:
+            return
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+#Serves the mock on a background thread, returns (server, ws:// URL)
+def serve_in_thread(mock, host="127.0.0.1", port=0):
+    from websockets.sync.server import serve
+
+    server = serve(mock.handler, host, port)
+    threading.Thread(target=server.serve_forever, name="mock-stream", daemon=True).start()
+    return server, f"ws://{host}:{server.socket.getsockname()[1]}"
+
+
+def main():
+    from mock_polygon import load_tickers
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Polygon websocket feed")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--rate", type=float, default=5.0, help="synthetic messages per second")
+    parser.add_argument("--recording", default=None, help="file written with stream_record_path to replay")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 10 is ten times as fast")
+    parser.add_argument("--api-key", default=None)
+    args = parser.parse_args()
+
+    mock = MockStream(load_tickers(), args.rate, args.recording, args.speed, args.api_key)
+    server, url = serve_in_thread(mock, args.host, args.port)
+    print(f"Mock stream at {url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
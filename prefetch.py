@@ -0,0 +1,337 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file warms the quote cache with the tickers users look up most.
+
+Every lookup adds to a ticker's popularity score, and older lookups count for less and less
+(each one halves in weight every half_life seconds). A background thread loads the newest
+session and some recent history for the top tickers, at the lowest rate limiter priority so
+it only ever spends calls nobody else is waiting for. Scores live in the cache file, so every
+worker process contributes to the same ranking.
+
+Only one process prefetches at a time, whichever holds the lease in the cache file, so adding
+workers does not repeat the same calls. The lease is renewed before every ticker and expires
+when its holder stops renewing it, then the next worker to look takes over. The tickers
+prefetched for the newest session are kept in the cache file too, so every worker counts a
+lookup of one as a hit and a new lease holder does not load them again.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+
+from rate_limiter import PREFETCH
+
+# Scores are stored relative to an epoch and rebased before exp() could overflow a float
+MAX_EXPONENT = 500
+
+
+#Decayed lookup counts per ticker, kept in SQLite
+class PopularityTracker():
+    def __init__(self, path=None, half_life=3 * 24 * 3600):
+        self.path = path or os.getenv("cache_path", "quote_cache.db")
+        self.decay = math.log(2) / half_life
+
+        # Lookups are counted in memory and written out by flush(), off the request path
+        self.pending = Counter()
+        self.lock = threading.Lock()
+
+        # A lookup at time t adds exp(decay * (t - epoch)) to the stored score. Every score
+        # shrinks by the same factor as time passes, so ranking by the stored value is the
+        # same as ranking by the decayed count
+        self.conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS popularity (
+                symbol TEXT PRIMARY KEY,
+                score REAL NOT NULL
+            );
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS popularity_epoch (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                epoch REAL NOT NULL
+            );
+        """)
+        self.conn.execute("INSERT OR IGNORE INTO popularity_epoch (id, epoch) VALUES (1, ?);", (time.time(),))
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS prefetch_lease (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                owner TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+        """)
+        # Tickers prefetched for a session, used is set once somebody looks one up
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS prefetched (
+                session TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                used INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (session, symbol)
+            );
+        """)
+        self.conn.commit()
+
+    def record(self, symbol):
+        with self.lock:
+            self.pending[symbol.upper()] += 1
+
+    # Writes the lookups counted since the last flush
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            if not pending:
+                return
+
+            now = time.time()
+            epoch = self.conn.execute("SELECT epoch FROM popularity_epoch WHERE id = 1;").fetchone()[0]
+
+            if self.decay * (now - epoch) > MAX_EXPONENT:
+                factor = math.exp(-self.decay * (now - epoch))
+                self.conn.execute("UPDATE popularity SET score = score * ?;", (factor,))
+                self.conn.execute("UPDATE popularity_epoch SET epoch = ? WHERE id = 1;", (now,))
+                epoch = now
+
+            weight = math.exp(self.decay * (now - epoch))
+            self.conn.executemany("""
+                INSERT INTO popularity (symbol, score) VALUES (?, ?)
+                ON CONFLICT (symbol) DO UPDATE SET score = score + excluded.score;
+            """, [(symbol, count * weight) for symbol, count in pending.items()])
+            self.conn.commit()
+
+    # The n most looked-up tickers with their decayed lookup counts, most popular first
+    def top(self, n):
+        with self.lock:
+            epoch = self.conn.execute("SELECT epoch FROM popularity_epoch WHERE id = 1;").fetchone()[0]
+            rows = self.conn.execute(
+                "SELECT symbol, score FROM popularity ORDER BY score DESC LIMIT ?;", (n,)
+            ).fetchall()
+
+        factor = math.exp(-self.decay * (time.time() - epoch))
+        return [(symbol, score * factor) for symbol, score in rows]
+
+    # Takes or renews the prefetch lease for seconds, True if owner holds it now
+    def claim(self, owner, seconds):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO prefetch_lease (id, owner, expires) VALUES (1, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+                WHERE prefetch_lease.owner = excluded.owner OR prefetch_lease.expires < ?;
+            """, (owner, now + seconds, now))
+            self.conn.commit()
+            row = self.conn.execute("SELECT owner FROM prefetch_lease WHERE id = 1;").fetchone()
+        return row is not None and row[0] == owner
+
+    # Tickers prefetched for session, by any worker
+    def prefetched(self, session):
+        with self.lock:
+            rows = self.conn.execute("SELECT symbol FROM prefetched WHERE session = ?;", (session,)).fetchall()
+        return {symbol for symbol, in rows}
+
+    # Forgets the tickers of older sessions, their newest bar has to be loaded again
+    def start_session(self, session):
+        with self.lock:
+            self.conn.execute("DELETE FROM prefetched WHERE session != ?;", (session,))
+            self.conn.commit()
+
+    def mark_prefetched(self, session, symbol):
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO prefetched (session, symbol) VALUES (?, ?);", (session, symbol))
+            self.conn.commit()
+
+    # True if symbol was prefetched for the newest session, marking it used
+    # Only the first lookup of each ticker writes, the rest are a read of the primary key
+    def prefetch_hit(self, symbol):
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT session, used FROM prefetched
+                WHERE symbol = ? AND session = (SELECT MAX(session) FROM prefetched);
+            """, (symbol,)).fetchone()
+            if row is None:
+                return False
+            if not row[1]:
+                self.conn.execute("UPDATE prefetched SET used = 1 WHERE session = ? AND symbol = ?;", (row[0], symbol))
+                self.conn.commit()
+        return True
+
+    # (session, tickers prefetched, tickers of them looked up) for the newest session
+    def prefetch_summary(self):
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT session, COUNT(*), COALESCE(SUM(used), 0) FROM prefetched
+                WHERE session = (SELECT MAX(session) FROM prefetched);
+            """).fetchone()
+        return row if row[0] is not None else (None, 0, 0)
+
+    # Gives the lease up so another worker can take over without waiting for it to expire
+    def release(self, owner):
+        with self.lock:
+            self.conn.execute("DELETE FROM prefetch_lease WHERE id = 1 AND owner = ?;", (owner,))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+#Background thread that keeps the most popular tickers cached
+class PrefetchScheduler():
+    def __init__(self, pipeline, tracker=None, top_n=None, history_sessions=None, interval=60):
+        self.pipeline = pipeline
+        self.tracker = tracker if tracker is not None else PopularityTracker(pipeline.cache.path)
+
+        self.top_n = top_n if top_n is not None else int(os.getenv("prefetch_top_n", 50))
+        self.history_sessions = history_sessions if history_sessions is not None else int(os.getenv("prefetch_history_sessions", 30))
+        self.interval = interval
+
+        self.stopping = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+        # Identifies this scheduler in the shared lease, which lasts a few rounds without renewal
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = max(3 * interval, 30)
+        self.leader = False
+
+        # Target session of this worker's last round, the tickers prefetched for it are in the tracker
+        self.session = None
+
+        # Counted by this worker, /metrics adds up every worker's counts
+        self.counters = {
+            "prefetched": 0,
+            "failed": 0,
+            "lookups": 0,
+            "prefetch_hits": 0,
+        }
+
+    # Called for every dashboard lookup
+    # Checked against the shared list, the ticker may have been prefetched by another worker
+    def record_lookup(self, symbol):
+        symbol = symbol.upper()
+        self.tracker.record(symbol)
+
+        try:
+            hit = self.tracker.prefetch_hit(symbol)
+        except sqlite3.Error as e:
+            print(f"Could not check whether {symbol} was prefetched: {e}")
+            hit = False
+
+        with self.lock:
+            self.counters["lookups"] += 1
+            if hit:
+                self.counters["prefetch_hits"] += 1
+
+    # Spare quota means nobody is queued on the limiter
+    def quota_idle(self):
+        return self.pipeline.limiter.queue_depth() == 0
+
+    # Takes or renews the lease, only the holder prefetches
+    def claim(self):
+        try:
+            self.leader = self.tracker.claim(self.owner, self.lease_seconds)
+        except sqlite3.Error as e:
+            print(f"Could not claim the prefetch lease: {e}")
+            self.leader = False
+        return self.leader
+
+    # One round: rank tickers and prefetch those not yet loaded for the target session
+    def run_once(self):
+        self.tracker.flush()
+
+        # Another worker is prefetching, this one only counts its lookups
+        if not self.claim():
+            return 0
+
+        # Today once its close has settled, otherwise the session before
+        session = self.pipeline.calendar.latest_settled_session()
+        if session is None:
+            return 0
+
+        if session != self.session:
+            # A new session closed, every popular ticker needs its newest bar again
+            self.tracker.start_session(session.isoformat())
+            self.session = session
+
+        # Including those a previous lease holder loaded
+        prefetched = self.tracker.prefetched(session.isoformat())
+        start = self.pipeline.calendar.sessions_back(session, self.history_sessions)
+        loaded = 0
+
+        for symbol, score in self.tracker.top(self.top_n):
+            if self.stopping.is_set() or not self.quota_idle():
+                break
+            if symbol in prefetched:
+                continue
+            # A round waiting on the limiter can outlast the lease, it is renewed before every call
+            if not self.claim():
+                break
+
+            try:
+                df = self.pipeline.get_range_data(symbol, start.isoformat(), session.isoformat(), PREFETCH)
+            except Exception as e:
+                df = None
+                print(f"Prefetch failed for {symbol}: {e}")
+
+            with self.lock:
+                if df is None:
+                    self.counters["failed"] += 1
+                else:
+                    self.counters["prefetched"] += 1
+                    loaded += 1
+            # Failed tickers are retried when the next session closes, not every round
+            self.tracker.mark_prefetched(session.isoformat(), symbol)
+
+        return loaded
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Prefetch round failed: {e}")
+            self.stopping.wait(self.interval)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="prefetch", daemon=True)
+            self.thread.start()
+        return self
+
+    # Stops after the ticker being fetched, then saves the lookups counted since the last round
+    def stop(self, timeout=10):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        self.tracker.flush()
+        if self.leader:
+            self.tracker.release(self.owner)
+            self.leader = False
+
+    # Hit rate is the share of this worker's lookups that found their ticker prefetched,
+    # used is the share of prefetched tickers somebody looked up in any worker
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["leader"] = self.leader
+
+        try:
+            session, tickers, used = self.tracker.prefetch_summary()
+        except sqlite3.Error as e:
+            print(f"Could not read the prefetched tickers: {e}")
+            session, tickers, used = None, 0, 0
+
+        stats["session"] = session
+        stats["tickers"] = tickers
+        stats["used"] = used / tickers if tickers else 0.0
+        stats["hit_rate"] = stats["prefetch_hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+
+    def close(self):
+        self.stop()
+        self.tracker.close()
@@ -0,0 +1,241 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file limits how fast every part of the project calls the API.
+
+All callers share one token bucket sized from the plan's calls per minute. The bucket is kept
+in the quote cache file (rate_limit_path overrides it), so the dashboard, its workers, a backfill
+and a ticker refresh running side by side draw from the same quota. Waiting callers are served by
+priority, so a dashboard lookup never queues behind a backfill or a ticker refresh.
+"""
+
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from metrics import RATE_LIMIT_WAIT_SECONDS
+
+# Lower numbers are served first
+INTERACTIVE = 0
+BACKFILL = 1
+REFRESH = 2
+PREFETCH = 3
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKFILL: "backfill", REFRESH: "refresh", PREFETCH: "prefetch"}
+
+# Used when a 429 response has no usable Retry-After header
+DEFAULT_RETRY_AFTER = 60
+
+
+#Token bucket with a priority queue of waiting callers
+class RateLimiter():
+    def __init__(self, calls_per_minute=None, burst=None, reserve=None):
+        if calls_per_minute is None:
+            calls_per_minute = float(os.getenv("polygon_calls_per_minute", 5))
+
+        self.rate = calls_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1, calls_per_minute)
+
+        # Tokens that background work may not use, so another process's dashboard lookup
+        # never finds the bucket empty because of a backfill
+        self.reserve = reserve if reserve is not None else (1 if self.capacity > 1 else 0)
+
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+        # Set after a 429, nothing is sent before this time
+        self.blocked_until = 0.0
+
+        self.cond = threading.Condition()
+        self.waiting = []
+        self.counter = itertools.count()
+
+    # Adds the tokens earned since the last update
+    # Caller must hold self.cond
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Tokens that have to be in the bucket before a caller of this priority may take one
+    def needed(self, priority):
+        return 1 + (self.reserve if priority > INTERACTIVE else 0)
+
+    # Takes a token if one is available. Returns 0 on success, otherwise the seconds to wait
+    # Caller must hold self.cond
+    def take(self, priority):
+        now = time.monotonic()
+        self.refill(now)
+
+        needed = self.needed(priority)
+        if self.tokens >= needed and now >= self.blocked_until:
+            self.tokens -= 1
+            return 0
+
+        return max(self.blocked_until - now, (needed - self.tokens) / self.rate, 0.001)
+
+    # Blocks until a call may be made. Returns False if the timeout ran out first
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        with RATE_LIMIT_WAIT_SECONDS.time(priority=PRIORITY_NAMES.get(priority, priority)):
+            return self.wait_for_token(priority, timeout)
+
+    def wait_for_token(self, priority, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.cond:
+            ticket = (priority, next(self.counter))
+            heapq.heappush(self.waiting, ticket)
+
+            try:
+                while True:
+                    if self.waiting[0] == ticket:
+                        wait = self.take(priority)
+                        if wait == 0:
+                            heapq.heappop(self.waiting)
+                            # Wake the next caller in line so it can start its own wait
+                            self.cond.notify_all()
+                            return True
+                    else:
+                        # Only the head of the queue watches the clock, everyone else waits for a turn
+                        wait = None
+
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.leave(ticket)
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+
+                    self.cond.wait(wait)
+
+            except BaseException:
+                # A failed take (the shared bucket's database was locked) or an interrupted wait
+                # must not leave the ticket at the head of the queue, where nobody would remove it
+                self.leave(ticket)
+                raise
+
+    # Removes a ticket that gave up waiting and lets the callers behind it move up
+    # Caller must hold self.cond
+    def leave(self, ticket):
+        if ticket in self.waiting:
+            self.waiting.remove(ticket)
+            heapq.heapify(self.waiting)
+        self.cond.notify_all()
+
+    # Called after a 429 so that nobody calls again until the server allows it
+    def backoff(self, seconds):
+        with self.cond:
+            now = time.monotonic()
+            self.refill(now)
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.cond.notify_all()
+
+    def queue_depth(self):
+        with self.cond:
+            return len(self.waiting)
+
+
+#Token bucket kept in a SQLite file so every worker process draws from the same quota
+#Priority ordering still applies between the threads of one process
+class SharedRateLimiter(RateLimiter):
+    def __init__(self, path, calls_per_minute=None, burst=None, reserve=None):
+        super().__init__(calls_per_minute, burst, reserve)
+        self.path = path
+
+        # Transactions are opened by hand with BEGIN IMMEDIATE, which locks the bucket row
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limiter (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                blocked_until REAL NOT NULL
+            );
+        """)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO rate_limiter (id, tokens, updated, blocked_until) VALUES (1, ?, ?, 0);",
+            (self.capacity, time.time())
+        )
+
+    # Runs fn(tokens, blocked_until, now) on the stored bucket and saves what it returns
+    # Wall-clock time is used because monotonic clocks are not shared between processes
+    def update_bucket(self, fn):
+        self.conn.execute("BEGIN IMMEDIATE;")
+        try:
+            tokens, updated, blocked_until = self.conn.execute(
+                "SELECT tokens, updated, blocked_until FROM rate_limiter WHERE id = 1;"
+            ).fetchone()
+
+            now = time.time()
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+
+            tokens, blocked_until, result = fn(tokens, blocked_until, now)
+
+            self.conn.execute(
+                "UPDATE rate_limiter SET tokens = ?, updated = ?, blocked_until = ? WHERE id = 1;",
+                (tokens, now, blocked_until)
+            )
+            self.conn.execute("COMMIT;")
+            return result
+        except Exception:
+            self.conn.execute("ROLLBACK;")
+            raise
+
+    def take(self, priority):
+        needed = self.needed(priority)
+
+        def take_token(tokens, blocked_until, now):
+            if tokens >= needed and now >= blocked_until:
+                return tokens - 1, blocked_until, 0
+            wait = max(blocked_until - now, (needed - tokens) / self.rate, 0.001)
+            return tokens, blocked_until, wait
+
+        return self.update_bucket(take_token)
+
+    def backoff(self, seconds):
+        with self.cond:
+            self.update_bucket(lambda tokens, blocked_until, now: (0, max(blocked_until, now + seconds), None))
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.conn.close()
+
+
+#Reads the Retry-After header of a 429 response, in seconds
+def retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return DEFAULT_RETRY_AFTER
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+#Returns the limiter shared by every caller in this process
+#The bucket is shared with other processes through rate_limit_path, by default the quote cache file
+#An empty rate_limit_path keeps the bucket inside the process, which benchmark.py uses
+def get_rate_limiter():
+    global _shared_limiter
+
+    with _shared_lock:
+        if _shared_limiter is None:
+            path = os.getenv("rate_limit_path", os.getenv("cache_path", "quote_cache.db"))
+            _shared_limiter = SharedRateLimiter(path) if path else RateLimiter()
+        return _shared_limiter
@@ -0,0 +1,87 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file merges identical requests that are made at the same time.
+
+When several dashboard users ask for the same (symbol, date) at once, only the first one
+calls the API. The others wait for that call and get the same result, or a copy of the same
+error with the original as its cause.
+"""
+
+import copy
+import threading
+
+
+#Raised when a caller gave up waiting for a call made by another thread
+class SingleFlightTimeout(Exception):
+    pass
+
+
+#A copy of the leader's error for one waiter
+#Raising the one exception object in several threads would add every thread's frames to its traceback
+def copy_error(error):
+    try:
+        return copy.copy(error)
+    except Exception:
+        return error.with_traceback(None)
+
+
+#One in-progress call and everyone waiting on it
+class Call():
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+#Class that makes sure only one call per key is running at a time
+class SingleFlight():
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.calls = {}
+        self.lock = threading.Lock()
+
+        self.counters = {"calls": 0, "shared": 0}
+
+    # Runs fn() unless a call for the same key is already running, in which case its result is shared
+    def do(self, key, fn, timeout=None):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.counters["shared"] += 1
+                leader = False
+            else:
+                call = Call()
+                self.calls[key] = call
+                self.counters["calls"] += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(self.timeout if timeout is None else timeout):
+                raise SingleFlightTimeout(f"Timed out waiting for {key}")
+            if call.error is not None:
+                raise copy_error(call.error) from call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # Later callers start a fresh call, the caches behind fn() take it from here
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        return call.result
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.calls)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
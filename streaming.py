@@ -0,0 +1,264 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file streams live minute bars or trades from Polygon's websocket feed.
+
+A background thread keeps one connection open, subscribes to the tickers the dashboard asks
+for and appends every event to that ticker's ring buffer: NumPy arrays of a fixed size where
+row n is stored at position n % capacity, so memory stays the same however long the feed
+runs. Every row gets a sequence number, and a reader passing the last number it saw gets only
+the rows after it, so the dashboard's polls carry the new points instead of the whole series.
+
+Polygon allows one websocket connection per API key, so streaming runs in one process: the
+development server or a single gunicorn worker. mock_stream.py replays recorded events for
+development and load tests.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import STREAM_EVENTS
+
+# Event types of each channel and the columns kept for them, the first column is the sequence number
+BAR_DTYPE = np.dtype([
+    ('seq', np.int64), ('t', np.int64),
+    ('open', np.float64), ('high', np.float64), ('low', np.float64), ('close', np.float64),
+    ('volume', np.float64), ('vwap', np.float64),
+])
+TRADE_DTYPE = np.dtype([('seq', np.int64), ('t', np.int64), ('price', np.float64), ('size', np.float64)])
+
+# AM is minute bars, A second bars and T trades
+CHANNELS = {
+    'AM': (BAR_DTYPE, 'close'),
+    'A': (BAR_DTYPE, 'close'),
+    'T': (TRADE_DTYPE, 'price'),
+}
+
+# Reconnect delays after the feed drops, doubling up to the last one
+RECONNECT_DELAYS = (1, 2, 4, 8, 15, 30)
+
+
+#Row values of one feed event, in the column order of its channel's dtype without seq
+def event_values(event):
+    if event['ev'] == 'T':
+        return (event['t'], event['p'], event.get('s', 0))
+    return (event['s'], event['o'], event['h'], event['l'], event['c'], event.get('v', 0), event.get('vw', np.nan))
+
+
+#Fixed number of the latest rows in one NumPy structured array
+class RingBuffer():
+    def __init__(self, capacity, dtype):
+        self.capacity = capacity
+        self.rows = np.zeros(capacity, dtype=dtype)
+        # sequence number the next row gets, also the number of rows ever appended
+        self.next_seq = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.next_seq, self.capacity)
+
+    def append(self, values):
+        with self.lock:
+            seq = self.next_seq
+            self.rows[seq % self.capacity] = (seq,) + values
+            self.next_seq = seq + 1
+        return seq
+
+    # Rows after seq, oldest first, with the last sequence number and whether the reader has to
+    # start over: rows after seq were already overwritten (it fell too far behind), or seq is
+    # past the last row (the cursor came from a buffer that was dropped and made again, or
+    # from another process). Starting over returns every row still kept, like seq -1
+    def since(self, seq):
+        with self.lock:
+            end = self.next_seq
+            kept = max(end - self.capacity, 0)
+            missed = seq >= 0 and (seq + 1 < kept or seq >= end)
+            start = kept if seq >= end else max(seq + 1, kept)
+
+            # At most two slices: up to the end of the array, then from its start
+            first, count = start % self.capacity, end - start
+            if first + count <= self.capacity:
+                rows = self.rows[first:first + count].copy()
+            else:
+                rows = np.concatenate([self.rows[first:], self.rows[:first + count - self.capacity]])
+
+        return rows, end - 1, missed
+
+
+#Ring buffers of every subscribed ticker for one channel
+class StreamStore():
+    def __init__(self, channel='AM', capacity=None):
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown channel {channel}, expected one of {', '.join(CHANNELS)}")
+
+        self.channel = channel
+        self.dtype, self.price_field = CHANNELS[channel]
+        self.capacity = capacity or int(os.getenv("stream_buffer_size", 2048))
+
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    def buffer(self, symbol):
+        return self.buffers.get(symbol.upper())
+
+    def add(self, symbol):
+        symbol = symbol.upper()
+        with self.lock:
+            if symbol not in self.buffers:
+                self.buffers[symbol] = RingBuffer(self.capacity, self.dtype)
+            return self.buffers[symbol]
+
+    def remove(self, symbol):
+        with self.lock:
+            self.buffers.pop(symbol.upper(), None)
+
+    # Appends the events of one message, returns how many were kept
+    def ingest(self, events):
+        kept = 0
+        for event in events:
+            if event.get('ev') != self.channel:
+                continue
+            buffer = self.buffers.get(event.get('sym'))
+            if buffer is not None:
+                buffer.append(event_values(event))
+                kept += 1
+        return kept
+
+
+#Background thread reading the websocket feed into a StreamStore
+class StreamClient():
+    def __init__(self, store=None, url=None, api_key=None, max_symbols=None, record_path=None):
+        self.store = store if store is not None else StreamStore(os.getenv("stream_channel", "AM"))
+        self.url = url or os.getenv("polygon_stream_url", "wss://socket.polygon.io/stocks")
+        self.api_key = api_key or os.getenv("polygon_api_key")
+
+        # Tickers subscribed, least recently asked for first
+        self.max_symbols = max_symbols or int(os.getenv("stream_max_symbols", 100))
+        self.symbols = OrderedDict()
+        # Subscription changes waiting to be sent by the reader thread
+        self.pending = []
+        self.lock = threading.Lock()
+
+        # Raw messages are appended here when set, for mock_stream.py to replay
+        self.record_path = record_path or os.getenv("stream_record_path")
+
+        self.stopping = threading.Event()
+        self.connected = threading.Event()
+        self.thread = None
+        self.counters = {"messages": 0, "events": 0, "kept": 0, "reconnects": 0}
+
+    def param(self, symbols):
+        return ",".join(f"{self.store.channel}.{symbol}" for symbol in symbols)
+
+    # Subscribes to the ticker if needed, returns its ring buffer
+    def subscribe(self, symbol):
+        symbol = symbol.upper()
+        with self.lock:
+            if symbol in self.symbols:
+                self.symbols.move_to_end(symbol)
+                return self.store.buffer(symbol)
+
+            self.symbols[symbol] = True
+            self.pending.append(("subscribe", symbol))
+            while len(self.symbols) > self.max_symbols:
+                dropped, _ = self.symbols.popitem(last=False)
+                self.pending.append(("unsubscribe", dropped))
+                self.store.remove(dropped)
+
+            return self.store.add(symbol)
+
+    def send_pending(self, connection):
+        with self.lock:
+            pending, self.pending = self.pending, []
+
+        for action in ("unsubscribe", "subscribe"):
+            symbols = [symbol for kind, symbol in pending if kind == action]
+            if symbols:
+                connection.send(json.dumps({"action": action, "params": self.param(symbols)}))
+
+    def handle(self, message, recording):
+        events = json.loads(message)
+        if isinstance(events, dict):
+            events = [events]
+
+        for event in events:
+            if event.get('ev') == 'status' and event.get('status') in ('auth_failed', 'error'):
+                raise ConnectionError(event.get('message', event.get('status')))
+
+        kept = self.store.ingest(events)
+        if recording is not None:
+            recording.write(message.rstrip("\n") + "\n")
+
+        self.counters["messages"] += 1
+        self.counters["events"] += len(events)
+        self.counters["kept"] += kept
+        STREAM_EVENTS.inc(kept, channel=self.store.channel, result="kept")
+        if len(events) > kept:
+            STREAM_EVENTS.inc(len(events) - kept, channel=self.store.channel, result="ignored")
+
+    # One connection: authenticate, subscribe to every ticker, then read until it drops
+    def session(self):
+        from websockets.sync.client import connect
+
+        with connect(self.url, open_timeout=10, max_size=None) as connection:
+            connection.send(json.dumps({"action": "auth", "params": self.api_key}))
+            with self.lock:
+                self.pending = [("subscribe", symbol) for symbol in self.symbols]
+            self.connected.set()
+
+            recording = open(self.record_path, 'a') if self.record_path else None
+            try:
+                while not self.stopping.is_set():
+                    self.send_pending(connection)
+                    try:
+                        message = connection.recv(timeout=0.25)
+                    except TimeoutError:
+                        continue
+                    self.handle(message, recording)
+            finally:
+                self.connected.clear()
+                if recording is not None:
+                    recording.close()
+
+    def run(self):
+        failures = 0
+        while not self.stopping.is_set():
+            began = time.monotonic()
+            try:
+                self.session()
+            except Exception as e:
+                print(f"Stream disconnected: {e}")
+
+            if self.stopping.is_set():
+                break
+
+            # A connection that lasted a while starts the delays over
+            failures = 0 if time.monotonic() - began > 60 else failures + 1
+            self.counters["reconnects"] += 1
+            self.stopping.wait(RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)])
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="stream", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats["symbols"] = len(self.symbols)
+        stats["connected"] = self.connected.is_set()
+        return stats
+
+    def close(self):
+        self.stop()
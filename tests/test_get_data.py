@@ -0,0 +1,71 @@
+import pytest
+
+from cache import NegativeCache, QuoteCache
+from get_data import StockMarketPipeline
+
+
+class Response():
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    path = str(tmp_path / "cache.db")
+    pipeline = StockMarketPipeline(QuoteCache(path), NegativeCache(path))
+    yield pipeline
+    pipeline.close()
+
+
+def reply(pipeline, status_code, body):
+    pipeline.request = lambda url, params, priority=None: Response(status_code, body)
+
+
+def test_unknown_ticker_is_remembered_for_the_symbol(pipeline):
+    reply(pipeline, 404, {"status": "ERROR", "error": "Unknown ticker ZZZZ"})
+
+    assert pipeline.get_daily_data("ZZZZ", "2024-12-02") is None
+    assert pipeline.negative_cache.is_invalid_symbol("ZZZZ")
+
+
+def test_bad_request_is_remembered_only_for_its_date(pipeline):
+    reply(pipeline, 400, {"status": "ERROR", "error": "Invalid date"})
+
+    assert pipeline.get_daily_data("AAPL", "2024-12-02") is None
+    assert not pipeline.negative_cache.is_invalid_symbol("AAPL")
+    assert pipeline.negative_cache.is_empty("AAPL", "2024-12-02")
+    assert not pipeline.negative_cache.is_empty("AAPL", "2024-12-03")
+
+
+def test_bad_range_request_leaves_the_symbol_usable(pipeline):
+    reply(pipeline, 400, {"status": "ERROR", "error": "Invalid range"})
+
+    assert pipeline.get_range_data("AAPL", "2024-12-02", "2024-12-06") is None
+    assert not pipeline.negative_cache.is_invalid_symbol("AAPL")
+    assert pipeline.negative_cache.empty_dates("AAPL", "2024-12-01", "2024-12-31") == {
+        "2024-12-02", "2024-12-03", "2024-12-04", "2024-12-05", "2024-12-06",
+    }
+
+
+def test_server_errors_are_not_remembered(pipeline):
+    reply(pipeline, 500, {"status": "ERROR", "error": "Internal error"})
+
+    assert pipeline.get_daily_data("AAPL", "2024-12-02") is None
+    assert not pipeline.negative_cache.is_invalid_symbol("AAPL")
+    assert not pipeline.negative_cache.is_empty("AAPL", "2024-12-02")
+
+
+def test_bad_minute_request_is_not_remembered(pipeline):
+    reply(pipeline, 400, {"status": "ERROR", "error": "Invalid range"})
+
+    assert pipeline.get_intraday_bars("AAPL", "2024-12-02", "2024-12-06") is None
+    assert not pipeline.negative_cache.is_invalid_symbol("AAPL")
+    assert pipeline.negative_cache.empty_dates("AAPL", "2024-12-01", "2024-12-31") == set()
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import IndicatorEngine, make_indicator
+
+INDICATORS = [('sma', 20), ('ema', 20), ('rsi', 14), ('bollinger', 20), ('vwap', 20)]
+
+
+def bars(sessions, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, sessions)))
+    spread = np.abs(rng.normal(0, 0.01, sessions))
+    vwap = close * (1 + rng.normal(0, 0.002, sessions))
+    vwap[::7] = np.nan
+    return pd.DataFrame({
+        'date': pd.bdate_range('2020-01-01', periods=sessions),
+        'open': close * (1 + rng.normal(0, 0.003, sessions)),
+        'high': close * (1 + spread),
+        'low': close * (1 - spread),
+        'close': close,
+        'volume': rng.integers(1000, 100000, sessions),
+        'vwap': vwap,
+    })
+
+
+def assert_same(a, b):
+    assert list(a['date']) == list(b['date'])
+    for column in a.columns:
+        if column != 'date':
+            np.testing.assert_allclose(a[column], b[column], rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("name, period", INDICATORS)
+def test_appended_sessions_match_a_full_computation(name, period):
+    df = bars(300)
+    engine = IndicatorEngine()
+    engine.compute("TEST", name, df.iloc[:200], period)
+    for end in range(201, 301):
+        engine.compute("TEST", name, df.iloc[:end], period)
+
+    assert_same(engine.compute("TEST", name, df, period), IndicatorEngine().compute("TEST", name, df, period))
+    assert engine.stats()["computes"] == 1
+
+
+@pytest.mark.parametrize("name, period", INDICATORS)
+def test_update_matches_compute(name, period):
+    df = bars(120)
+    indicator = make_indicator(name, period)
+    indicator.compute(df.iloc[:100])
+    rows = [indicator.update(bar) for bar in df.iloc[100:].to_dict('records')]
+
+    full = make_indicator(name, period).compute(df)
+    for column in indicator.columns:
+        np.testing.assert_allclose([row[column] for row in rows], full[column][100:], rtol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("name, period", INDICATORS)
+def test_changed_last_bar_is_computed_again(name, period):
+    df = bars(100)
+    engine = IndicatorEngine()
+
+    # The day's bar while the session is still trading, then the settled one
+    forming = df.copy()
+    forming.loc[forming.index[-1], ['close', 'high', 'volume']] = [1.0, 500.0, 10]
+    engine.compute("TEST", name, forming, period)
+
+    assert_same(engine.compute("TEST", name, df, period), IndicatorEngine().compute("TEST", name, df, period))
+
+
+def test_changed_last_bar_before_new_sessions():
+    df = bars(100)
+    engine = IndicatorEngine()
+    forming = df.iloc[:90].copy()
+    forming.loc[forming.index[-1], 'close'] = 1.0
+    engine.compute("TEST", 'sma', forming, 5)
+
+    assert_same(engine.compute("TEST", 'sma', df, 5), IndicatorEngine().compute("TEST", 'sma', df, 5))
+
+
+def test_unchanged_ranges_are_served_from_memory():
+    df = bars(100)
+    engine = IndicatorEngine()
+    engine.compute("TEST", 'ema', df, 10)
+    engine.compute("TEST", 'ema', df, 10)
+    part = engine.compute("TEST", 'ema', df.iloc[20:50], 10)
+
+    assert engine.stats() == {"hits": 2, "appends": 0, "computes": 1, "entries": 1}
+    assert list(part['date']) == list(df['date'].iloc[20:50])
+
+
+def test_earlier_start_is_computed_again():
+    df = bars(100)
+    engine = IndicatorEngine()
+    engine.compute("TEST", 'sma', df.iloc[50:], 5)
+    result = engine.compute("TEST", 'sma', df, 5)
+
+    assert engine.stats()["computes"] == 2
+    assert len(result) == 100
+
+
+def test_empty_frame():
+    result = IndicatorEngine().compute("TEST", 'bollinger', bars(0), 20)
+    assert result.empty
+    assert list(result.columns)[0] == 'date'
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from intraday_store import (BLOCK_ROWS, IntradayStore, decode_block, encode_block, frame_to_arrays,
+                            results_to_arrays, unzigzag, varint_decode, varint_encode, zigzag)
+from mock_polygon import SyntheticMarket
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IntradayStore(str(tmp_path / "store"))
+
+
+@pytest.fixture(scope="module")
+def results():
+    # Ten sessions of minute bars, a few blocks and a partial one
+    return SyntheticMarket(["AAPL"]).minute_results("AAPL", "2024-03-04", "2024-03-15")
+
+
+def assert_same_arrays(actual, expected):
+    assert set(actual) == set(expected)
+    for name in expected:
+        np.testing.assert_array_equal(actual[name], expected[name], err_msg=name)
+
+
+def test_zigzag_round_trip():
+    values = np.array([0, -1, 1, -2, 2, 123456789, -123456789, np.iinfo(np.int64).max, np.iinfo(np.int64).min])
+    coded = zigzag(values)
+    assert list(coded[:5]) == [0, 1, 2, 3, 4]
+    np.testing.assert_array_equal(unzigzag(coded), values)
+
+
+def test_varint_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 2 ** 32, 2 ** 64 - 1], dtype=np.uint64)
+    data = varint_encode(values)
+    assert varint_encode(np.array([127], dtype=np.uint64)) == b'\x7f'
+    assert varint_encode(np.array([300], dtype=np.uint64)) == b'\xac\x02'
+    np.testing.assert_array_equal(varint_decode(data, len(values)), values)
+
+    with pytest.raises(ValueError):
+        varint_decode(data, len(values) + 1)
+
+
+def test_block_round_trip(results):
+    arrays = results_to_arrays(results[:500])
+    assert_same_arrays(decode_block(encode_block(arrays)), arrays)
+
+
+def test_write_results_and_read_back(store, results):
+    assert store.write_results("AAPL", results) == len(results)
+
+    expected = results_to_arrays(results)
+    arrays, _ = store.read_arrays("AAPL")
+    assert_same_arrays(arrays, expected)
+
+    index = store.load_index("AAPL", "1m")
+    assert len(index) == len(results) // BLOCK_ROWS
+    assert store.last_time("AAPL") == results[-1]['t'] // 1000
+
+
+def test_frame_round_trip(store, results, tmp_path):
+    store.write_results("AAPL", results)
+    df = store.read("AAPL")
+
+    assert list(df.columns) == ['time', 'open', 'high', 'low', 'close', 'volume', 'vwap', 'transactions']
+    assert len(df) == len(results)
+    assert df['time'].iloc[0] == pd.Timestamp(results[0]['t'], unit='ms')
+    assert df['close'].iloc[-1] == pytest.approx(results[-1]['c'])
+
+    # Written again from the frame, the bars are the same
+    other = IntradayStore(str(tmp_path / "copy"))
+    other.write("AAPL", df)
+    assert_same_arrays(other.read_arrays("AAPL")[0], store.read_arrays("AAPL")[0])
+
+
+def test_appends_across_blocks_and_tail(store, results):
+    # Written a session at a time, full blocks move out of the tail as they fill
+    for first in range(0, len(results), 390):
+        store.write_results("AAPL", results[first:first + 390])
+
+    assert_same_arrays(store.read_arrays("AAPL")[0], results_to_arrays(results))
+    assert len(store.load_index("AAPL", "1m")) == len(results) // BLOCK_ROWS
+    assert len(store.read_tail("AAPL", "1m")['t']) == len(results) % BLOCK_ROWS
+
+
+def test_out_of_order_write_rewrites(store, results):
+    half = len(results) // 2
+    store.write_results("AAPL", results[half:])
+    store.write_results("AAPL", results[:half + 10])
+
+    assert_same_arrays(store.read_arrays("AAPL")[0], results_to_arrays(results))
+
+
+def test_later_write_replaces_a_bar(store, results):
+    store.write_results("AAPL", results)
+    changed = dict(results[100], c=results[100]['c'] + 1)
+    store.write_results("AAPL", [changed])
+
+    df = store.read("AAPL")
+    assert len(df) == len(results)
+    assert df['close'].iloc[100] == pytest.approx(changed['c'])
+
+
+def test_day_range_reads_few_blocks(store, results):
+    store.write_results("AAPL", results)
+
+    arrays, blocks = store.read_arrays("AAPL", "2024-03-06", "2024-03-06")
+    assert blocks <= 2
+    assert len(arrays['t']) == 390
+
+    df = store.read("AAPL", "2024-03-06", "2024-03-06")
+    # 9:30 to 16:00 New York time, UTC in the frame
+    assert df['time'].iloc[0] == pd.Timestamp("2024-03-06 14:30")
+    assert df['time'].iloc[-1] == pd.Timestamp("2024-03-06 20:59")
+
+    assert store.read("AAPL", "2024-03-09", "2024-03-10").empty
+
+
+def test_missing_vwap(store, results):
+    bars = [dict(bar) for bar in results[:20]]
+    for bar in bars[::2]:
+        del bar['vw']
+    store.write_results("AAPL", bars)
+
+    vwap = store.read("AAPL")['vwap']
+    assert vwap.iloc[::2].isna().all()
+    assert vwap.iloc[1::2].notna().all()
+
+    arrays = frame_to_arrays(store.read("AAPL").drop(columns=['vwap']))
+    assert arrays['vwap_missing'].all()
+
+
+def test_tickers_include_tail_only(store, results):
+    store.write_results("AAPL", results)
+    store.write_results("MSFT", results[:10])
+
+    assert store.tickers() == ["AAPL", "MSFT"]
+    assert store.stats()['1m']['bars'] == len(results) + 10
+
+    store.delete("MSFT")
+    assert store.tickers() == ["AAPL"]
+    assert store.last_time("MSFT") is None
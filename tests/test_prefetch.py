@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+from prefetch import PopularityTracker, PrefetchScheduler
+from trading_calendar import TradingCalendar
+
+
+class FakePipeline():
+    def __init__(self, path):
+        self.cache = SimpleNamespace(path=path)
+        self.limiter = SimpleNamespace(queue_depth=lambda: 0)
+        self.calendar = TradingCalendar(first_year=2020)
+        self.calls = []
+
+    def get_range_data(self, symbol, start, end, priority):
+        self.calls.append(symbol)
+        return object()
+
+
+@pytest.fixture
+def schedulers(tmp_path):
+    path = str(tmp_path / "quote_cache.db")
+    first = PrefetchScheduler(FakePipeline(path), PopularityTracker(path), top_n=2)
+    second = PrefetchScheduler(FakePipeline(path), PopularityTracker(path), top_n=2)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_only_the_lease_holder_prefetches(schedulers):
+    first, second = schedulers
+    for symbol in ["AAPL", "AAPL", "MSFT", "TSLA"]:
+        first.record_lookup(symbol)
+
+    assert first.run_once() == 2
+    assert second.run_once() == 0
+    assert sorted(first.pipeline.calls) == ["AAPL", "MSFT"]
+    assert second.pipeline.calls == []
+    assert first.stats()["leader"] and not second.stats()["leader"]
+
+
+def test_every_worker_counts_prefetch_hits(schedulers):
+    first, second = schedulers
+    first.record_lookup("AAPL")
+    first.record_lookup("MSFT")
+    first.run_once()
+    second.run_once()
+
+    # Lookups served by the worker that did not prefetch
+    second.record_lookup("AAPL")
+    second.record_lookup("TSLA")
+
+    stats = second.stats()
+    assert stats["lookups"] == 2
+    assert stats["prefetch_hits"] == 1
+    assert stats["tickers"] == 2
+    assert stats["used"] == 0.5
+    assert first.stats()["used"] == 0.5
+
+
+def test_new_lease_holder_skips_prefetched_tickers(schedulers):
+    first, second = schedulers
+    first.record_lookup("AAPL")
+    first.run_once()
+    first.stop()
+
+    second.record_lookup("MSFT")
+    assert second.run_once() == 1
+    assert second.pipeline.calls == ["MSFT"]
+    assert second.stats()["tickers"] == 2
@@ -0,0 +1,106 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from rate_limiter import BACKFILL, INTERACTIVE, RateLimiter, SharedRateLimiter, retry_after_seconds
+
+
+class Response():
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def test_burst_is_served_at_once_then_limited():
+    limiter = RateLimiter(calls_per_minute=60, burst=3, reserve=0)
+
+    assert all(limiter.acquire(timeout=0.01) for _ in range(3))
+    assert not limiter.acquire(timeout=0.05)
+    assert limiter.queue_depth() == 0
+
+
+def test_background_work_leaves_the_reserve():
+    limiter = RateLimiter(calls_per_minute=60, burst=2, reserve=1)
+
+    assert limiter.acquire(BACKFILL, timeout=0.01)
+    assert not limiter.acquire(BACKFILL, timeout=0.05)
+    assert limiter.acquire(INTERACTIVE, timeout=0.01)
+
+
+def test_interactive_callers_go_first():
+    limiter = RateLimiter(calls_per_minute=600, burst=1, reserve=0)
+    assert limiter.acquire(timeout=0.01)
+
+    served = []
+
+    def call(name, priority):
+        limiter.acquire(priority)
+        served.append(name)
+
+    # Both queue while the bucket is empty, the backfill one first
+    background = threading.Thread(target=call, args=("backfill", BACKFILL))
+    background.start()
+    while limiter.queue_depth() < 1:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=call, args=("interactive", INTERACTIVE))
+    interactive.start()
+    while limiter.queue_depth() < 2:
+        time.sleep(0.001)
+
+    background.join(5)
+    interactive.join(5)
+    assert served == ["interactive", "backfill"]
+
+
+def test_backoff_blocks_every_caller():
+    limiter = RateLimiter(calls_per_minute=6000, burst=5, reserve=0)
+    limiter.backoff(0.2)
+
+    began = time.monotonic()
+    assert limiter.acquire(timeout=2)
+    assert time.monotonic() - began >= 0.15
+
+
+#Limiter whose bucket fails the first time, like a shared bucket whose database is locked
+class FailingLimiter(RateLimiter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = 1
+
+    def take(self, priority):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return super().take(priority)
+
+
+def test_failed_take_does_not_block_the_queue():
+    limiter = FailingLimiter(calls_per_minute=60, burst=2, reserve=0)
+
+    with pytest.raises(sqlite3.OperationalError):
+        limiter.acquire()
+
+    assert limiter.queue_depth() == 0
+    assert limiter.acquire(timeout=0.5)
+
+
+def test_shared_limiter_shares_tokens_between_instances(tmp_path):
+    path = str(tmp_path / "limiter.db")
+    first = SharedRateLimiter(path, calls_per_minute=60, burst=2, reserve=0)
+    second = SharedRateLimiter(path, calls_per_minute=60, burst=2, reserve=0)
+
+    assert first.acquire(timeout=0.01)
+    assert second.acquire(timeout=0.01)
+    assert not first.acquire(timeout=0.05)
+    assert not second.acquire(timeout=0.05)
+
+    first.close()
+    second.close()
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(Response({"Retry-After": "12"})) == 12
+    assert retry_after_seconds(Response({})) == 60
+    assert retry_after_seconds(Response({"Retry-After": "soon"})) == 60
+    assert retry_after_seconds(Response({"Retry-After": "Thu, 01 Jan 1970 00:00:00 GMT"})) == 0
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, SingleFlightTimeout
+
+
+def test_waiters_share_the_result():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 42
+
+    leader = threading.Thread(target=lambda: results.append(flight.do("AAPL", slow)))
+    leader.start()
+    started.wait(5)
+
+    waiters = [threading.Thread(target=lambda: results.append(flight.do("AAPL", lambda: 0))) for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    while flight.calls["AAPL"].waiters < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + waiters:
+        thread.join()
+
+    assert results == [42] * 4
+    assert flight.stats() == {"calls": 1, "shared": 3}
+
+
+def test_each_waiter_raises_its_own_copy_of_the_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("bad symbol", 404)
+
+    def call(fn):
+        try:
+            flight.do("AAPL", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call, args=(failing,))
+    leader.start()
+    started.wait(5)
+
+    waiters = [threading.Thread(target=call, args=(lambda: None,)) for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    while flight.calls["AAPL"].waiters < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + waiters:
+        thread.join()
+
+    original = next(e for e in errors if e.__cause__ is None)
+    copies = [e for e in errors if e is not original]
+    assert len(copies) == 3
+    assert len({id(e) for e in copies}) == 3
+    for error in copies:
+        assert error.args == ("bad symbol", 404)
+        assert error.__cause__ is original
+
+
+def test_timeout_when_the_leader_takes_too_long():
+    flight = SingleFlight(timeout=0.05)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    leader = threading.Thread(target=flight.do, args=("AAPL", slow))
+    leader.start()
+    started.wait(5)
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("AAPL", lambda: None)
+    release.set()
+    leader.join()
@@ -0,0 +1,99 @@
+import numpy as np
+
+from streaming import BAR_DTYPE, TRADE_DTYPE, RingBuffer, StreamStore
+
+
+def trade(t, price=10.0, size=100):
+    return (t, price, size)
+
+
+def fill(buffer, count, first=0):
+    for i in range(first, first + count):
+        buffer.append(trade(i, 10.0 + i))
+
+
+def test_since_returns_only_newer_rows():
+    buffer = RingBuffer(8, TRADE_DTYPE)
+    fill(buffer, 5)
+
+    rows, seq, missed = buffer.since(2)
+    assert list(rows['seq']) == [3, 4]
+    assert seq == 4
+    assert not missed
+
+
+def test_since_up_to_date_cursor_returns_nothing():
+    buffer = RingBuffer(8, TRADE_DTYPE)
+    fill(buffer, 3)
+
+    rows, seq, missed = buffer.since(2)
+    assert len(rows) == 0
+    assert seq == 2
+    assert not missed
+
+
+def test_since_minus_one_returns_everything_kept():
+    buffer = RingBuffer(4, TRADE_DTYPE)
+    fill(buffer, 10)
+
+    rows, seq, missed = buffer.since(-1)
+    assert list(rows['seq']) == [6, 7, 8, 9]
+    assert list(rows['t']) == [6, 7, 8, 9]
+    assert seq == 9
+    assert not missed
+
+
+def test_since_wraps_around_the_array():
+    buffer = RingBuffer(4, TRADE_DTYPE)
+    fill(buffer, 6)
+
+    rows, _, missed = buffer.since(3)
+    assert list(rows['seq']) == [4, 5]
+    assert not missed
+
+
+def test_since_overwritten_cursor_starts_over():
+    buffer = RingBuffer(4, TRADE_DTYPE)
+    fill(buffer, 10)
+
+    rows, seq, missed = buffer.since(2)
+    assert missed
+    assert list(rows['seq']) == [6, 7, 8, 9]
+    assert seq == 9
+
+
+def test_since_future_cursor_starts_over():
+    # A cursor from a buffer that was dropped and made again, or from another process
+    buffer = RingBuffer(8, TRADE_DTYPE)
+    fill(buffer, 3)
+
+    rows, seq, missed = buffer.since(50)
+    assert missed
+    assert list(rows['seq']) == [0, 1, 2]
+    assert seq == 2
+
+
+def test_since_future_cursor_on_empty_buffer():
+    buffer = RingBuffer(8, TRADE_DTYPE)
+
+    rows, seq, missed = buffer.since(5)
+    assert missed
+    assert len(rows) == 0
+    assert seq == -1
+
+
+def test_store_ingests_only_its_channel_and_tickers():
+    store = StreamStore('AM', capacity=16)
+    store.add('aapl')
+
+    kept = store.ingest([
+        {'ev': 'AM', 'sym': 'AAPL', 's': 1000, 'o': 1, 'h': 2, 'l': 0.5, 'c': 1.5, 'v': 10, 'vw': 1.2},
+        {'ev': 'AM', 'sym': 'MSFT', 's': 1000, 'o': 1, 'h': 2, 'l': 0.5, 'c': 1.5},
+        {'ev': 'T', 'sym': 'AAPL', 't': 1000, 'p': 1.5, 's': 100},
+    ])
+
+    assert kept == 1
+    rows, _, _ = store.buffer('AAPL').since(-1)
+    assert rows.dtype == BAR_DTYPE
+    assert rows['close'][0] == 1.5
+    assert np.isclose(rows['vwap'][0], 1.2)
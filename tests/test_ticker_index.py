@@ -0,0 +1,41 @@
+import threading
+import time
+
+import ticker_index
+from ticker_index import TickerUniverse, write_index
+
+
+def test_first_load_is_shared_by_concurrent_callers(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "ticker_index.json")
+    write_index({"AAPL": {"name": "Apple Inc."}, "MSFT": {"name": "Microsoft Corp"}}, 1, path=path)
+
+    loads = []
+    original = ticker_index.load_index
+
+    def slow_load(path):
+        loads.append(path)
+        time.sleep(0.2)
+        return original(path)
+
+    monkeypatch.setattr(ticker_index, "load_index", slow_load)
+    universe = TickerUniverse(path, legacy_path=str(tmp_path / "tickers.json"))
+
+    found = []
+    threads = [threading.Thread(target=lambda: found.append(universe.index().tickers)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert found == [["AAPL", "MSFT"]] * 8
+    assert "No ticker list found" not in capsys.readouterr().out
+
+
+def test_missing_file_is_not_cached_as_empty(tmp_path):
+    path = str(tmp_path / "ticker_index.json")
+    universe = TickerUniverse(path, legacy_path=str(tmp_path / "tickers.json"), check_interval=0)
+    assert universe.index().tickers == []
+
+    write_index({"AAPL": {"name": "Apple Inc."}}, 1, path=path)
+    assert universe.index().tickers == ["AAPL"]
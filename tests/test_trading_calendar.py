@@ -0,0 +1,119 @@
+from datetime import date, datetime
+
+import pytest
+
+from trading_calendar import (EARLY_CLOSE, MARKET_TIMEZONE, REGULAR_CLOSE, TradingCalendar,
+                              easter, holidays)
+
+
+@pytest.fixture(scope="module")
+def calendar():
+    return TradingCalendar(first_year=2020, last_year=2026)
+
+
+def market_time(*args):
+    return datetime(*args, tzinfo=MARKET_TIMEZONE)
+
+
+@pytest.mark.parametrize("year, expected", [
+    (2024, date(2024, 3, 31)),
+    (2025, date(2025, 4, 20)),
+    (2000, date(2000, 4, 23)),
+])
+def test_easter(year, expected):
+    assert easter(year) == expected
+
+
+def test_holidays_2024():
+    assert holidays(2024) == {
+        date(2024, 1, 1),    # New Year's Day
+        date(2024, 1, 15),   # Martin Luther King Jr. Day
+        date(2024, 2, 19),   # Washington's Birthday
+        date(2024, 3, 29),   # Good Friday
+        date(2024, 5, 27),   # Memorial Day
+        date(2024, 6, 19),   # Juneteenth
+        date(2024, 7, 4),    # Independence Day
+        date(2024, 9, 2),    # Labor Day
+        date(2024, 11, 28),  # Thanksgiving
+        date(2024, 12, 25),  # Christmas
+    }
+
+
+def test_new_year_on_saturday_is_not_moved_back():
+    # 2022-01-01 was a Saturday, the exchange stayed open on Friday 2021-12-31
+    assert date(2021, 12, 31) not in holidays(2021)
+    assert date(2021, 12, 31) not in holidays(2022)
+
+
+@pytest.mark.parametrize("day, expected", [
+    ("2024-07-04", False),   # holiday
+    ("2024-07-06", False),   # Saturday
+    ("2024-07-05", True),
+    ("2025-01-09", False),   # special closure
+    ("2022-06-20", False),   # Juneteenth observed on Monday
+    ("2021-06-18", True),    # before Juneteenth was a market holiday
+])
+def test_is_trading_day(calendar, day, expected):
+    assert calendar.is_trading_day(day) is expected
+
+
+def test_close_time(calendar):
+    assert calendar.close_time("2024-11-29") == EARLY_CLOSE      # day after Thanksgiving
+    assert calendar.close_time("2024-12-24") == EARLY_CLOSE      # Christmas Eve
+    assert calendar.close_time("2024-07-03") == EARLY_CLOSE
+    assert calendar.close_time("2024-11-27") == REGULAR_CLOSE
+    assert calendar.close_time("2024-11-28") is None
+    # Christmas Eve on a Saturday is not an early close
+    assert not calendar.is_early_close("2022-12-24")
+
+
+def test_previous_and_next_session(calendar):
+    # Good Friday 2024 and the weekend after it
+    assert calendar.previous_session("2024-03-31") == date(2024, 3, 28)
+    assert calendar.next_session("2024-03-29") == date(2024, 4, 1)
+
+    assert calendar.previous_session("2024-04-01") == date(2024, 4, 1)
+    assert calendar.next_session("2024-04-01") == date(2024, 4, 1)
+    assert calendar.sessions_back("2024-04-02", 2) == date(2024, 3, 28)
+
+
+def test_previous_session_before_the_calendar_starts(calendar):
+    assert calendar.previous_session("2019-12-31") is None
+
+
+def test_sessions_between(calendar):
+    sessions = calendar.sessions_between("2024-12-23", "2025-01-03")
+    assert sessions == [
+        date(2024, 12, 23), date(2024, 12, 24), date(2024, 12, 26), date(2024, 12, 27),
+        date(2024, 12, 30), date(2024, 12, 31), date(2025, 1, 2), date(2025, 1, 3),
+    ]
+    assert calendar.sessions_between("2024-12-25", "2024-12-25") == []
+
+
+def test_extends_past_the_last_year():
+    calendar = TradingCalendar(first_year=2024, last_year=2024)
+    assert calendar.is_early_close("2025-11-28")
+    assert calendar.is_trading_day("2026-01-02")
+    assert calendar.next_session("2024-12-31") == date(2024, 12, 31)
+    assert calendar.next_session("2025-01-01") == date(2025, 1, 2)
+
+
+def test_is_settled(calendar):
+    # Regular day: settled 15 minutes after the 16:00 close
+    assert not calendar.is_settled("2024-11-27", market_time(2024, 11, 27, 16, 10))
+    assert calendar.is_settled("2024-11-27", market_time(2024, 11, 27, 16, 15))
+
+    # Early close at 13:00
+    assert not calendar.is_settled("2024-11-29", market_time(2024, 11, 29, 13, 10))
+    assert calendar.is_settled("2024-11-29", market_time(2024, 11, 29, 13, 15))
+
+    # Past dates are settled, future dates and holidays today are not
+    assert calendar.is_settled("2024-11-26", market_time(2024, 11, 27, 9, 0))
+    assert not calendar.is_settled("2024-11-28", market_time(2024, 11, 27, 20, 0))
+    assert not calendar.is_settled("2024-11-28", market_time(2024, 11, 28, 20, 0))
+
+
+def test_latest_settled_session(calendar):
+    assert calendar.latest_settled_session(market_time(2024, 11, 29, 12, 0)) == date(2024, 11, 27)
+    assert calendar.latest_settled_session(market_time(2024, 11, 29, 13, 30)) == date(2024, 11, 29)
+    assert calendar.latest_settled_session(market_time(2024, 12, 1, 10, 0)) == date(2024, 11, 29)
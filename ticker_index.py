@@ -0,0 +1,280 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file keeps the ticker universe as a small versioned index with each ticker's metadata.
+
+fetch_tickers.py writes ticker_index.json with one list per field instead of one object per
+ticker, and types and exchanges stored as positions in a short list of their values. Every
+refresh bumps the version and records what changed since the refresh before. The new file is
+written next to the old one and swapped in with os.replace, so a reader sees the old index or
+the new one, never half of one. The dashboard checks the file now and then and reloads it
+without a restart.
+
+Parsing the JSON and building the search index is most of the work of loading it, so the
+result is also kept as a binary snapshot next to the file (ticker_index.snapshot) that a new
+worker loads in a few milliseconds instead. A snapshot only counts for the exact file it was
+made from and the Python version that wrote it, anything else is rebuilt from the JSON.
+"""
+
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+
+from ticker_search import TickerIndex
+
+FORMAT = 1
+
+# Metadata kept for every ticker, as returned by /v3/reference/tickers
+FIELDS = ['name', 'type', 'primary_exchange', 'composite_figi']
+
+# Fields with only a handful of distinct values, stored as positions in a list of them
+CODED = ['type', 'primary_exchange']
+
+
+def index_path():
+    return os.getenv("ticker_index_path", "ticker_index.json")
+
+
+#Writes a file so readers only ever see the old or the new contents
+def write_atomic(path, text):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+#Index document for records, a dict of ticker -> metadata dict
+def encode(records, version, changes=None):
+    tickers = sorted(records)
+    document = {
+        'format': FORMAT,
+        'version': version,
+        'generated_at': int(time.time()),
+        'count': len(tickers),
+        'tickers': tickers,
+    }
+
+    for field in FIELDS:
+        values = [records[ticker].get(field) for ticker in tickers]
+        if field in CODED:
+            names = sorted({value for value in values if value is not None})
+            position = {value: i for i, value in enumerate(names)}
+            document[field] = {
+                'values': names,
+                'codes': [position[value] if value is not None else -1 for value in values],
+            }
+        else:
+            document[field] = values
+
+    document['changes'] = changes or {'added': [], 'delisted': [], 'renamed': []}
+    return document
+
+
+#Back from an index document to a dict of ticker -> metadata dict
+def decode(document):
+    if document.get('format') != FORMAT:
+        raise ValueError(f"Unsupported ticker index format {document.get('format')}")
+
+    tickers = document['tickers']
+    columns = {}
+    for field in FIELDS:
+        column = document.get(field)
+        if column is None:
+            columns[field] = [None] * len(tickers)
+        elif field in CODED:
+            names = column['values']
+            columns[field] = [names[code] if code >= 0 else None for code in column['codes']]
+        else:
+            columns[field] = column
+
+    return {
+        ticker: {field: columns[field][i] for field in FIELDS}
+        for i, ticker in enumerate(tickers)
+    }
+
+
+# Version and records of the index at path, None when there is none yet
+def load_index(path=None):
+    path = path or index_path()
+    try:
+        with open(path) as f:
+            document = json.load(f)
+    except FileNotFoundError:
+        return None
+    return document['version'], decode(document), document.get('changes')
+
+
+def write_index(records, version, changes=None, path=None):
+    path = path or index_path()
+    write_atomic(path, json.dumps(encode(records, version, changes), separators=(',', ':')))
+
+
+def snapshot_path(path):
+    return os.path.splitext(path)[0] + ".snapshot"
+
+
+#Saves what loading the file at stamp produced, a failed write only costs the next worker a rebuild
+def write_snapshot(stamp, version, records, search_index):
+    state = {
+        'python': list(sys.version_info[:2]),
+        'source': list(stamp),
+        'version': version,
+        'records': records,
+        'tickers': search_index.tickers,
+        'fuzzy': search_index.fuzzy,
+    }
+    try:
+        path = snapshot_path(stamp[0])
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(marshal.dumps(state))
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Could not write the ticker snapshot: {e}")
+
+
+# Version, records and search index saved for the file at stamp, None if there is no such snapshot
+def load_snapshot(stamp):
+    try:
+        with open(snapshot_path(stamp[0]), 'rb') as f:
+            state = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if state.get('python') != list(sys.version_info[:2]) or state.get('source') != list(stamp):
+        return None
+    return state['version'], state['records'], TickerIndex.from_state(state['tickers'], state['fuzzy'])
+
+
+#Tickers added, delisted and renamed between two universes
+# A rename is a ticker that disappeared and one that appeared for the same security: the same
+# FIGI when both have one, otherwise the same company name when only one ticker has that name
+def diff_universe(previous, current):
+    added = sorted(set(current) - set(previous))
+    delisted = sorted(set(previous) - set(current))
+
+    def keyed(tickers, records, field):
+        keys = {}
+        for ticker in tickers:
+            value = records[ticker].get(field)
+            if value:
+                keys.setdefault(value.casefold(), []).append(ticker)
+        return {key: found[0] for key, found in keys.items() if len(found) == 1}
+
+    renamed = []
+    for field in ['composite_figi', 'name']:
+        old = keyed(delisted, previous, field)
+        new = keyed(added, current, field)
+        for key in sorted(old.keys() & new.keys()):
+            renamed.append([old[key], new[key]])
+
+        matched_old = {pair[0] for pair in renamed}
+        matched_new = {pair[1] for pair in renamed}
+        delisted = [ticker for ticker in delisted if ticker not in matched_old]
+        added = [ticker for ticker in added if ticker not in matched_new]
+
+    return {'added': added, 'delisted': delisted, 'renamed': sorted(renamed)}
+
+
+#Ticker list and metadata the dashboard searches, reloaded when the index file changes
+class TickerUniverse():
+    def __init__(self, path=None, legacy_path="tickers.json", check_interval=5):
+        self.path = path or index_path()
+        # a plain list of symbols, read when there is no index yet
+        self.legacy_path = legacy_path
+        self.check_interval = check_interval
+
+        self.version = None
+        self.records = {}
+        self.tickers = []
+        self.search_index = None
+
+        # (path, mtime, size) of the file loaded, to notice when it is replaced
+        self.stamp = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+        self.reloading = threading.Lock()
+
+    def stamp_of(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    # Loads the index again if the file on disk is not the one loaded, True if it did
+    # With wait a thread that finds another one loading waits for it instead of returning
+    def reload(self, wait=False):
+        stamp = self.stamp_of(self.path) or self.stamp_of(self.legacy_path)
+        if stamp is None or stamp == self.stamp:
+            return False
+
+        # One thread reloads, the others keep answering from the current index meanwhile
+        if not self.reloading.acquire(blocking=wait):
+            return False
+        try:
+            # Loaded by the thread this one waited for
+            if stamp == self.stamp:
+                return False
+
+            loaded = load_snapshot(stamp)
+            if loaded is not None:
+                version, records, search_index = loaded
+            else:
+                try:
+                    if stamp[0] == self.path:
+                        version, records, _ = load_index(self.path)
+                    else:
+                        with open(self.legacy_path) as f:
+                            version, records = None, {ticker: {} for ticker in json.load(f)}
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Could not load the ticker index {stamp[0]}: {e}")
+                    return False
+
+                search_index = TickerIndex(records)
+                write_snapshot(stamp, version, records, search_index)
+
+            with self.lock:
+                self.version = version
+                self.records = records
+                self.tickers = search_index.tickers
+                self.search_index = search_index
+                self.stamp = stamp
+            return True
+        finally:
+            self.reloading.release()
+
+    # The universe, looking at the file at most once every check_interval seconds
+    def current(self):
+        now = time.monotonic()
+        if self.stamp is None or now - self.checked >= self.check_interval:
+            self.checked = now
+            # Nothing to answer from before the first load, so callers wait for it
+            self.reload(wait=self.stamp is None)
+            if self.stamp is None:
+                print("No ticker list found. Make sure to run fetch_tickers.py first.")
+        return self
+
+    def index(self):
+        current = self.current()
+        with self.lock:
+            # Not kept, the next call looks for the file again
+            if current.search_index is None:
+                return TickerIndex([])
+            return current.search_index
+
+    def metadata(self, ticker):
+        with self.lock:
+            return self.records.get(ticker.upper(), {})
+
+    def name(self, ticker):
+        return self.metadata(ticker).get('name')
@@ -0,0 +1,112 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file searches the ticker list on the server.
+
+The index is built once from tickers.json: a sorted list for prefix lookups with bisect, and a
+table of every ticker with one letter removed for typo-tolerant matching. Only the best few
+matches are sent to the browser instead of the full list of symbols.
+"""
+
+import bisect
+
+
+#Edit distance where swapping two neighbouring letters also counts as one edit
+def edit_distance(a, b):
+    previous2 = None
+    previous = list(range(len(b) + 1))
+
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+
+    return previous[len(b)]
+
+
+#Every string that is the word with one letter removed, plus the word itself
+def deletions(word):
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+#Class that finds tickers by prefix or by a close spelling
+class TickerIndex():
+    def __init__(self, tickers):
+        self.tickers = sorted({ticker.upper() for ticker in tickers})
+        self.ticker_set = set(self.tickers)
+
+        # "AAPL" is stored under "AAPL", "APL", "AAL" and "AAP" so a typo is found with a few lookups
+        self.fuzzy = {}
+        for ticker in self.tickers:
+            for key in deletions(ticker):
+                self.fuzzy.setdefault(key, []).append(ticker)
+
+    # Index from the sorted tickers and fuzzy table of an earlier one, without building them again
+    @classmethod
+    def from_state(cls, tickers, fuzzy):
+        index = cls.__new__(cls)
+        index.tickers = tickers
+        index.ticker_set = set(tickers)
+        index.fuzzy = fuzzy
+        return index
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker.upper() in self.ticker_set
+
+    # Every ticker starting with the prefix, shortest first, at most limit of them
+    def prefix_matches(self, prefix, limit):
+        start = bisect.bisect_left(self.tickers, prefix)
+        matches = []
+
+        for ticker in self.tickers[start:]:
+            if not ticker.startswith(prefix):
+                break
+            matches.append(ticker)
+
+        matches.sort(key=lambda ticker: (len(ticker), ticker))
+        return matches[:limit]
+
+    # Tickers one edit away from the query, closest first
+    def fuzzy_matches(self, query, limit):
+        candidates = set()
+        for key in deletions(query):
+            candidates.update(self.fuzzy.get(key, ()))
+        candidates.discard(query)
+
+        scored = []
+        for ticker in candidates:
+            distance = edit_distance(query, ticker)
+            if distance <= 1:
+                scored.append((distance, len(ticker), ticker))
+
+        scored.sort()
+        return [ticker for _, _, ticker in scored[:limit]]
+
+    # Best k tickers for what the user typed: the exact symbol, then prefixes, then typos
+    def search(self, query, k=20):
+        query = (query or "").strip().upper()
+        if not query:
+            return []
+
+        results = []
+        if query in self.ticker_set:
+            results.append(query)
+
+        for ticker in self.prefix_matches(query, k + 1):
+            if ticker != query:
+                results.append(ticker)
+
+        if len(results) < k and len(query) > 1:
+            seen = set(results)
+            for ticker in self.fuzzy_matches(query, k):
+                if ticker not in seen:
+                    results.append(ticker)
+
+        return results[:k]
@@ -0,0 +1,244 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file knows which days NYSE and Nasdaq are open.
+
+The sessions are computed once from the exchange holiday rules and kept as a sorted list,
+so "the last session on or before this date" is a binary search instead of asking the API
+about one day after another.
+"""
+
+import bisect
+import threading
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+
+# Polygon needs a few minutes after the close to publish the final daily bar
+SETTLE_DELAY = timedelta(minutes=15)
+
+FIRST_YEAR = 1990
+
+# Closures that do not follow the usual holiday rules
+SPECIAL_CLOSURES = {
+    date(1994, 4, 27),   # Nixon funeral
+    date(2001, 9, 11),   # September 11
+    date(2001, 9, 12),
+    date(2001, 9, 13),
+    date(2001, 9, 14),
+    date(2004, 6, 11),   # Reagan funeral
+    date(2007, 1, 2),    # Ford funeral
+    date(2012, 10, 29),  # Hurricane Sandy
+    date(2012, 10, 30),
+    date(2018, 12, 5),   # George H. W. Bush funeral
+    date(2025, 1, 9),    # Carter funeral
+}
+
+
+#Turns a date, datetime or 'YYYY-MM-DD' string into a date
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+#Returns the nth given weekday (0 = Monday) of a month, or the last one when n is -1
+def nth_weekday(year, month, weekday, n):
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+#Easter Sunday (anonymous Gregorian algorithm)
+def easter(year):
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+#Moves a fixed-date holiday that falls on a weekend to the weekday the exchange observes it
+def observed(day):
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def holidays(year):
+    days = set()
+
+    # New Year's Day moves to Monday when it falls on Sunday, but is not moved back to a Friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() == 6:
+        days.add(new_year + timedelta(days=1))
+    elif new_year.weekday() != 5:
+        days.add(new_year)
+
+    if year >= 1998:
+        days.add(nth_weekday(year, 1, 0, 3))   # Martin Luther King Jr. Day
+    days.add(nth_weekday(year, 2, 0, 3))       # Washington's Birthday
+    days.add(easter(year) - timedelta(days=2)) # Good Friday
+    days.add(nth_weekday(year, 5, 0, -1))      # Memorial Day
+    if year >= 2022:
+        days.add(observed(date(year, 6, 19)))  # Juneteenth
+    days.add(observed(date(year, 7, 4)))       # Independence Day
+    days.add(nth_weekday(year, 9, 0, 1))       # Labor Day
+    days.add(nth_weekday(year, 11, 3, 4))      # Thanksgiving
+    days.add(observed(date(year, 12, 25)))     # Christmas
+
+    return days
+
+
+def early_closes(year, closed):
+    days = set()
+
+    candidates = [
+        date(year, 7, 3),                                   # Day before Independence Day
+        nth_weekday(year, 11, 3, 4) + timedelta(days=1),    # Day after Thanksgiving
+        date(year, 12, 24),                                 # Christmas Eve
+    ]
+
+    for day in candidates:
+        if day.weekday() < 5 and day not in closed:
+            days.add(day)
+
+    return days
+
+
+#Class that answers questions about exchange sessions
+class TradingCalendar():
+    def __init__(self, first_year=FIRST_YEAR, last_year=None):
+        self.first_year = first_year
+        self.last_year = first_year - 1
+        self.lock = threading.Lock()
+
+        # Sorted ordinals of every session, plus the same as a set for membership tests
+        self.sessions = []
+        self.session_set = set()
+        self.early = set()
+
+        self.extend_to(last_year if last_year is not None else date.today().year + 2)
+
+    # Adds sessions for every year up to and including last_year
+    def extend_to(self, last_year):
+        with self.lock:
+            for year in range(self.last_year + 1, last_year + 1):
+                closed = holidays(year) | {day for day in SPECIAL_CLOSURES if day.year == year}
+                self.early |= {day.toordinal() for day in early_closes(year, closed)}
+
+                day = date(year, 1, 1)
+                while day.year == year:
+                    if day.weekday() < 5 and day not in closed:
+                        self.sessions.append(day.toordinal())
+                        self.session_set.add(day.toordinal())
+                    day += timedelta(days=1)
+
+            self.last_year = max(self.last_year, last_year)
+
+    def ensure_covered(self, day):
+        if day.year > self.last_year:
+            self.extend_to(day.year)
+
+    def is_trading_day(self, value):
+        day = to_date(value)
+        self.ensure_covered(day)
+        return day.toordinal() in self.session_set
+
+    def is_early_close(self, value):
+        day = to_date(value)
+        self.ensure_covered(day)
+        return day.toordinal() in self.early
+
+    def close_time(self, value):
+        day = to_date(value)
+        if not self.is_trading_day(day):
+            return None
+        return EARLY_CLOSE if day.toordinal() in self.early else REGULAR_CLOSE
+
+    # True once the day's bar can no longer change: the session closed and settled, or it is a past date
+    def is_settled(self, value, now=None):
+        day = to_date(value)
+        now = now or datetime.now(MARKET_TIMEZONE)
+        if day < now.date():
+            return True
+
+        close = self.close_time(day)
+        if close is None or day > now.date():
+            return False
+        return now >= datetime.combine(day, close, MARKET_TIMEZONE) + SETTLE_DELAY
+
+    # Newest session whose bar is final
+    def latest_settled_session(self, now=None):
+        now = now or datetime.now(MARKET_TIMEZONE)
+        if self.is_settled(now.date(), now):
+            return self.previous_session(now.date())
+        return self.previous_session(now.date() - timedelta(days=1))
+
+    # Last session on or before the given date, or None before the calendar starts
+    def previous_session(self, value):
+        day = to_date(value)
+        self.ensure_covered(day)
+
+        index = bisect.bisect_right(self.sessions, day.toordinal()) - 1
+        if index < 0:
+            return None
+        return date.fromordinal(self.sessions[index])
+
+    # First session on or after the given date
+    def next_session(self, value):
+        day = to_date(value)
+        self.ensure_covered(day + timedelta(days=14))
+
+        index = bisect.bisect_left(self.sessions, day.toordinal())
+        return date.fromordinal(self.sessions[index])
+
+    # Session that is count sessions before the given one
+    def sessions_back(self, value, count):
+        day = to_date(value)
+        self.ensure_covered(day)
+
+        index = bisect.bisect_right(self.sessions, day.toordinal()) - 1 - count
+        return date.fromordinal(self.sessions[max(index, 0)])
+
+    # Every session between start and end, both inclusive
+    def sessions_between(self, start, end):
+        start = to_date(start)
+        end = to_date(end)
+        self.ensure_covered(end)
+
+        low = bisect.bisect_left(self.sessions, start.toordinal())
+        high = bisect.bisect_right(self.sessions, end.toordinal())
+        return [date.fromordinal(ordinal) for ordinal in self.sessions[low:high]]
+
+
+_shared_calendar = None
+_shared_lock = threading.Lock()
+
+
+#Returns the calendar shared by the whole process
+def get_trading_calendar():
+    global _shared_calendar
+
+    with _shared_lock:
+        if _shared_calendar is None:
+            _shared_calendar = TradingCalendar()
+        return _shared_calendar
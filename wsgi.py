@@ -0,0 +1,67 @@
+"""
+This is a basic online dashboard to extract and load stock market data from the Polygon API.
+
+This file exposes the dashboard as a WSGI app for production servers.
+
+Run it with gunicorn (settings are in gunicorn.conf.py):
+
+    gunicorn wsgi:server
+
+Every worker process builds its own dashboard, but the quote cache and the rate limiter live
+in SQLite files shared by all workers, so adding workers does not add API calls.
+"""
+
+import atexit
+import os
+
+from dotenv import load_dotenv
+
+# Settings from .env first, so the defaults below see a cache_path set there
+load_dotenv()
+
+# Share the /metrics numbers between worker processes unless a different file was configured
+# The API quota is shared through the quote cache file by default, see rate_limiter.py
+os.environ.setdefault("metrics_path", os.getenv("cache_path", "quote_cache.db"))
+
+from dash_app import Dashboard
+from get_data import StockMarketPipeline
+from metrics import get_registry
+from prefetch import PrefetchScheduler
+
+pipeline = StockMarketPipeline()
+
+# Every worker counts lookups into the shared ranking, one of them at a time holds the lease and prefetches
+prefetcher = PrefetchScheduler(pipeline).start()
+
+# Live chart from the websocket feed. Polygon allows one feed connection per API key, so
+# gunicorn.conf.py refuses to start with stream_channel set and more than one worker
+stream = None
+if os.getenv("stream_channel"):
+    from streaming import StreamClient
+    stream = StreamClient().start()
+
+dashboard = Dashboard(pipeline, prefetcher, stream)
+
+# The Flask app behind Dash, this is what the WSGI server calls
+server = dashboard.app.server
+
+
+closed = False
+
+
+#Stops prefetching and the feed, then closes pooled connections and cache files when the worker exits
+# Called by gunicorn's worker_exit hook and again by atexit, only the first call does anything
+def shutdown():
+    global closed
+    if closed:
+        return
+    closed = True
+
+    prefetcher.close()
+    if stream is not None:
+        stream.close()
+    print(f"Prefetch stats: {prefetcher.stats()}")
+    get_registry().close()
+    pipeline.close()
+
+atexit.register(shutdown)